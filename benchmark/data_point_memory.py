@@ -0,0 +1,42 @@
+# Measures memory per data point and construction time of the data point
+# classes, compared with the old layout that kept a __dict__ and the value bytes.
+import timeit
+import tracemalloc
+from mindwavemobile.MindwaveDataPoints import RawDataPoint, EEGPowersDataPoint
+
+NUMBER_OF_DATA_POINTS = 100000
+
+
+class DictRawDataPoint:
+    def __init__(self, dataValueBytes):
+        self._dataValueBytes = dataValueBytes
+        rawValue = dataValueBytes[0] * 256 + dataValueBytes[1]
+        if rawValue >= 32768:
+            rawValue -= 65536
+        self.rawValue = rawValue
+
+
+def measureBytesPerDataPoint(dataPointClass, dataValueBytes):
+    # value bytes are sliced per data point, as the parser does with the payload
+    tracemalloc.start()
+    dataPoints = [dataPointClass(list(dataValueBytes)) for _ in range(NUMBER_OF_DATA_POINTS)]
+    usedBytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return usedBytes / len(dataPoints)
+
+
+def measureConstructionTime(dataPointClass, dataValueBytes):
+    timer = timeit.Timer(lambda: dataPointClass(dataValueBytes))
+    return min(timer.repeat(5, NUMBER_OF_DATA_POINTS)) / NUMBER_OF_DATA_POINTS
+
+
+if __name__ == '__main__':
+    rawValueBytes = memoryview(bytes([0xff, 0xfe]))
+    eegValueBytes = memoryview(bytes(range(24)))
+    for name, dataPointClass, dataValueBytes in [
+            ("old RawDataPoint", DictRawDataPoint, rawValueBytes),
+            ("RawDataPoint", RawDataPoint, rawValueBytes),
+            ("EEGPowersDataPoint", EEGPowersDataPoint, eegValueBytes)]:
+        print("{:20s} {:6.1f} bytes per data point, {:6.3f} us per construction".format(
+            name, measureBytesPerDataPoint(dataPointClass, dataValueBytes),
+            measureConstructionTime(dataPointClass, dataValueBytes) * 1e6))
@@ -0,0 +1,647 @@
+# Benchmarks framing, payload parsing and end-to-end decoding on a generated
+# ThinkGear stream and optionally writes the results as JSON, so runs on
+# different commits can be compared:
+#   python benchmark/run_benchmarks.py --output before.json
+#   python benchmark/run_benchmarks.py --compare before.json
+import argparse
+import collections
+import json
+import multiprocessing
+import os
+import platform
+import socket
+import subprocess
+import tempfile
+import threading
+import time
+import tracemalloc
+import numpy as np
+
+from mindwavemobile.MindwaveBandPowerEstimator import MindwaveBandPowerEstimator
+from mindwavemobile.MindwaveByteSources import BytesByteSource, SocketByteSource,\
+    CAPTURE_FILE_HEADER, CAPTURE_RECORD_HEADER
+from mindwavemobile.MindwaveCaptureDecoder import decodeCapture
+from mindwavemobile.MindwaveDataPointReader import MindwaveDataPointReader
+from mindwavemobile.MindwaveFanOutServer import MindwaveFanOutServer, FORMAT_RAW, FORMAT_BATCHES
+from mindwavemobile.MindwaveDataPoints import RawDataPoint, AttentionDataPoint,\
+    MeditationDataPoint, BlinkDataPoint, SAMPLING_RATE
+from mindwavemobile.MindwaveHeadsetEmulator import MindwaveHeadsetEmulator
+from mindwavemobile.MindwaveHistory import MindwaveHistory
+from mindwavemobile.MindwaveHub import MindwaveHub
+from mindwavemobile.MindwaveMetrics import MindwaveMetrics
+from mindwavemobile.MindwavePacketFramer import MindwavePacketFramer
+from mindwavemobile.MindwavePacketPayloadParser import MindwavePacketPayloadParser
+from mindwavemobile.MindwaveRollingStatistics import MindwaveRollingStatistics
+from mindwavemobile.MindwaveSharedMemoryPipeline import MindwaveSharedMemoryPipeline
+from mindwavemobile.MindwaveStreamGenerator import MindwaveStreamGenerator, createPacket, corruptStream
+
+CHUNK_SIZE = 4096
+# bluetooth delivers about 64 bytes at a time
+CAPTURE_RECORD_LENGTH = 64
+CAPTURE_DIRECTORY = tempfile.TemporaryDirectory()
+# the paced latency benchmark takes this long whatever the stream length
+PACED_SECONDS = 2
+
+
+def chunksOf(stream):
+    streamView = memoryview(stream)
+    return [streamView[start:start + CHUNK_SIZE] for start in range(0, len(stream), CHUNK_SIZE)]
+
+
+def framePayloads(stream):
+    framer = MindwavePacketFramer()
+    payloads, unframedBytes = framer.framePackets(stream)
+    return payloads
+
+
+# Every benchmark gets the stream, does its setup and returns the function
+# to measure. That function returns the amounts of processed items.
+
+def setUpFramePackets(stream):
+    chunks = chunksOf(stream)
+    def framePackets():
+        framer = MindwavePacketFramer()
+        unframedBytes = b''
+        for chunk in chunks:
+            payloads, unframedBytes = framer.framePackets(bytes(unframedBytes) + chunk)
+        return {"packets": framer.framedPackets, "bytes": len(stream),
+                "resyncs": framer.resyncs}
+    return framePackets
+
+
+def setUpRecoverCorruptedStream(stream):
+    # framing a stream with about 15% damaged packets
+    corruptedStream = corruptStream(stream)
+    framePackets = setUpFramePackets(corruptedStream)
+    def recoverCorruptedStream():
+        amounts = framePackets()
+        amounts["bytes"] = len(corruptedStream)
+        return amounts
+    return recoverCorruptedStream
+
+
+def setUpParsePayloads(stream):
+    payloads = framePayloads(stream)
+    def parsePayloads():
+        payloadParser = MindwavePacketPayloadParser()
+        dataPoints = 0
+        for payload in payloads:
+            dataPoints += len(payloadParser.parseDataPoints(payload))
+        return {"packets": len(payloads), "dataPoints": dataPoints}
+    return parsePayloads
+
+
+def setUpReadNextDataPoint(stream, createMetrics=lambda: None):
+    def readNextDataPoint():
+        mindwaveDataPointReader = MindwaveDataPointReader(byteSource=BytesByteSource(stream),
+                                                          metrics=createMetrics())
+        mindwaveDataPointReader.start()
+        dataPoints = 0
+        samples = 0
+        try:
+            while (True):
+                dataPoint = mindwaveDataPointReader.readNextDataPoint()
+                dataPoints += 1
+                if (dataPoint.__class__ is RawDataPoint):
+                    samples += 1
+        except EOFError:
+            pass
+        return {"dataPoints": dataPoints, "samples": samples, "bytes": len(stream)}
+    return readNextDataPoint
+
+
+# attention, meditation and blinks only, once read and filtered like the
+# example did before and once subscribed, skipping the raw values
+
+ESENSE_DATA_POINT_CLASSES = (AttentionDataPoint, MeditationDataPoint, BlinkDataPoint)
+
+
+def setUpReadESenseDataPoints(stream):
+    def readESenseDataPoints():
+        mindwaveDataPointReader = MindwaveDataPointReader(byteSource=BytesByteSource(stream))
+        mindwaveDataPointReader.start()
+        dataPoints = 0
+        try:
+            while (True):
+                dataPoint = mindwaveDataPointReader.readNextDataPoint()
+                if (dataPoint.__class__ in ESENSE_DATA_POINT_CLASSES):
+                    dataPoints += 1
+        except EOFError:
+            pass
+        return {"dataPoints": dataPoints, "bytes": len(stream)}
+    return readESenseDataPoints
+
+
+def setUpDispatchESenseDataPoints(stream):
+    def dispatchESenseDataPoints():
+        mindwaveDataPointReader = MindwaveDataPointReader(byteSource=BytesByteSource(stream))
+        mindwaveDataPointReader.start()
+        dispatchedDataPoints = []
+        mindwaveDataPointReader.subscribe(dispatchedDataPoints.append, ESENSE_DATA_POINT_CLASSES)
+        mindwaveDataPointReader.dispatchDataPoints()
+        return {"dataPoints": len(dispatchedDataPoints), "bytes": len(stream)}
+    return dispatchESenseDataPoints
+
+
+def setUpReadRawBatches(stream, createMetrics=lambda: None):
+    def readRawBatches():
+        mindwaveDataPointReader = MindwaveDataPointReader(byteSource=BytesByteSource(stream),
+                                                          metrics=createMetrics())
+        mindwaveDataPointReader.start()
+        samples = 0
+        for rawBatch in mindwaveDataPointReader.iterRawBatches(512):
+            samples += len(rawBatch.samples)
+        return {"samples": samples, "bytes": len(stream)}
+    return readRawBatches
+
+
+# the same with all stages measured, compared to the above this is the
+# cost of metrics, without them the readers run unchanged code
+
+def setUpReadNextDataPointWithMetrics(stream):
+    return setUpReadNextDataPoint(stream, MindwaveMetrics)
+
+
+def setUpReadRawBatchesWithMetrics(stream):
+    return setUpReadRawBatches(stream, MindwaveMetrics)
+
+
+# 128 Hz raw values, once downsampled from every raw data point like
+# consumers did before and once read decimated, samples counts the 128 Hz
+# values
+
+def setUpDownsampleDataPoints(stream):
+    def downsampleDataPoints():
+        mindwaveDataPointReader = MindwaveDataPointReader(byteSource=BytesByteSource(stream))
+        mindwaveDataPointReader.start()
+        rawValues = []
+        downsampledValues = []
+        try:
+            while (True):
+                dataPoint = mindwaveDataPointReader.readNextDataPoint()
+                if (dataPoint.__class__ is RawDataPoint):
+                    rawValues.append(dataPoint.rawValue)
+                    if (len(rawValues) == 4):
+                        downsampledValues.append(sum(rawValues) / 4)
+                        rawValues = []
+        except EOFError:
+            pass
+        return {"samples": len(downsampledValues), "bytes": len(stream)}
+    return downsampleDataPoints
+
+
+def setUpReadDecimatedRawBatches(stream):
+    def readDecimatedRawBatches():
+        mindwaveDataPointReader = MindwaveDataPointReader(byteSource=BytesByteSource(stream))
+        mindwaveDataPointReader.start()
+        samples = 0
+        for rawBatch in mindwaveDataPointReader.iterRawBatches(128, decimationFactor=4):
+            samples += len(rawBatch.samples)
+        return {"samples": samples, "bytes": len(stream)}
+    return readDecimatedRawBatches
+
+
+def readAllRawSamples(stream, decimationFactor=1):
+    mindwaveDataPointReader = MindwaveDataPointReader(byteSource=BytesByteSource(stream))
+    mindwaveDataPointReader.start()
+    return [rawBatch.samples for rawBatch
+            in mindwaveDataPointReader.iterRawBatches(512 // decimationFactor, decimationFactor)]
+
+
+def writeCapture(stream):
+    capturePath = os.path.join(CAPTURE_DIRECTORY.name, "benchmark.mwc")
+    with open(capturePath, "wb") as captureFile:
+        captureFile.write(CAPTURE_FILE_HEADER)
+        for start in range(0, len(stream), CAPTURE_RECORD_LENGTH):
+            chunk = stream[start:start + CAPTURE_RECORD_LENGTH]
+            captureFile.write(CAPTURE_RECORD_HEADER.pack(start / 8192.0, len(chunk)))
+            captureFile.write(chunk)
+    return capturePath
+
+
+def setUpDecodeCapture(stream, processes=1):
+    # regions of 64 KiB, so a 60 second stream of about 0.24 MiB is split into four
+    capturePath = writeCapture(stream)
+    def decodeCaptureFile():
+        columns = decodeCapture(capturePath, processes=processes, regionLength=64 * 1024)
+        return {"samples": len(columns["raw"]), "bytes": len(stream)}
+    return decodeCaptureFile
+
+
+def setUpDecodeCaptureParallel(stream):
+    return setUpDecodeCapture(stream, processes=os.cpu_count())
+
+
+def setUpBandPowers(stream, decimationFactor=1):
+    # raw values arrive in blocks of 62.5 ms, headsetSecondsPerSecond
+    # is the amount of headsets one core can keep up with
+    samplingRate = SAMPLING_RATE // decimationFactor
+    blockLength = 32 // decimationFactor
+    rawSamples = readAllRawSamples(stream, decimationFactor)
+    blocks = [samples[start:start + blockLength] for samples in rawSamples
+              for start in range(0, len(samples), blockLength)]
+    def estimateBandPowers():
+        # segments of 0.5 s every 62.5 ms at either sampling rate
+        estimator = MindwaveBandPowerEstimator(segmentLength=samplingRate // 2, hopLength=blockLength,
+                                               samplingRate=samplingRate)
+        estimates = 0
+        for block in blocks:
+            estimates += len(estimator.addSamples(block))
+        return {"samples": estimator.processedSamples, "estimates": estimates,
+                "headsetSeconds": estimator.processedSamples / samplingRate}
+    return estimateBandPowers
+
+
+def setUpBandPowersDecimated(stream):
+    # the same bands from the stream decimated to 128 Hz
+    return setUpBandPowers(stream, decimationFactor=4)
+
+
+# rolling statistics over the raw values, queried 16 times per second like
+# a dashboard would, with equal cost for short and long windows
+ROLLING_QUERY_INTERVAL = 32
+
+
+def setUpRollingStatistics(stream, windowSeconds=1, decimationFactor=1):
+    samplingRate = SAMPLING_RATE // decimationFactor
+    queryInterval = ROLLING_QUERY_INTERVAL // decimationFactor
+    rawSamples = [rawValue for samples in readAllRawSamples(stream, decimationFactor)
+                  for rawValue in samples.tolist()]
+    def rollingStatistics():
+        statistics = MindwaveRollingStatistics(windowSeconds=(windowSeconds,))
+        for sampleNumber, rawValue in enumerate(rawSamples):
+            statistics.addValue("raw", rawValue, sampleNumber / samplingRate)
+            if (sampleNumber % queryInterval == 0):
+                statistics.summary("raw", windowSeconds)
+        return {"samples": len(rawSamples), "headsetSeconds": len(rawSamples) / samplingRate}
+    return rollingStatistics
+
+
+def setUpRollingStatisticsDecimated(stream):
+    # the same statistics of the stream decimated to 128 Hz, every value
+    # costs the same, so a headset second costs a quarter
+    return setUpRollingStatistics(stream, decimationFactor=4)
+
+
+def setUpRollingStatisticsLongWindow(stream):
+    return setUpRollingStatistics(stream, windowSeconds=60)
+
+
+def setUpRescanLongWindow(stream, windowSeconds=60):
+    # the same queries by scanning the values of the window every time
+    rawSamples = [rawValue for samples in readAllRawSamples(stream) for rawValue in samples.tolist()]
+    def rescanLongWindow():
+        values = collections.deque(maxlen=windowSeconds * SAMPLING_RATE)
+        for sampleNumber, rawValue in enumerate(rawSamples):
+            values.append(rawValue)
+            if (sampleNumber % ROLLING_QUERY_INTERVAL == 0):
+                mean = sum(values) / len(values)
+                variance = sum((value - mean) ** 2 for value in values) / len(values)
+                minimum, maximum = min(values), max(values)
+        return {"samples": len(rawSamples)}
+    return rescanLongWindow
+
+
+def setUpHistory(stream, retentionSeconds=3600):
+    # raw batches kept for an hour, after every batch the last 4 seconds
+    # are read like a dashboard would; the lookup is a binary search and
+    # the rows are views, so the cost does not depend on the retention
+    mindwaveDataPointReader = MindwaveDataPointReader(byteSource=BytesByteSource(stream))
+    mindwaveDataPointReader.start()
+    rawBatches = list(mindwaveDataPointReader.iterRawBatches(32))
+    def history():
+        mindwaveHistory = MindwaveHistory(retentionSeconds)
+        for rawBatch in rawBatches:
+            mindwaveHistory.appendRawBatch(rawBatch)
+            mindwaveHistory.readLast("raw", 4)
+        return {"samples": 32 * len(rawBatches), "reads": len(rawBatches)}
+    return history
+
+
+# headsets decoded with features extracted per block of raw values, in one
+# process, through multiprocessing queues or through shared memory
+PIPELINE_HEADSETS = 4
+PIPELINE_BLOCK_LENGTH = 512
+
+
+def blockBandPowers(samples):
+    spectrum = np.abs(np.fft.rfft(samples * np.hanning(len(samples)))) ** 2
+    return np.add.reduceat(spectrum, [1, 4, 8, 10, 13, 18, 31, 41])
+
+
+def extractBlockBandPowers(headset, sequence, rawColumns):
+    return blockBandPowers(rawColumns["raw"])
+
+
+def setUpPipelineSingleProcess(stream):
+    def pipelineSingleProcess():
+        blocks = 0
+        for _ in range(PIPELINE_HEADSETS):
+            mindwaveDataPointReader = MindwaveDataPointReader(byteSource=BytesByteSource(stream))
+            mindwaveDataPointReader.start()
+            for rawBatch in mindwaveDataPointReader.iterRawBatches(PIPELINE_BLOCK_LENGTH, dropPartialBatch=True):
+                blockBandPowers(rawBatch.samples)
+                blocks += 1
+        return {"headsetSeconds": blocks * PIPELINE_BLOCK_LENGTH / SAMPLING_RATE}
+    return pipelineSingleProcess
+
+
+def decodeIntoQueue(stream, blockQueue):
+    mindwaveDataPointReader = MindwaveDataPointReader(byteSource=BytesByteSource(stream))
+    mindwaveDataPointReader.start()
+    for rawBatch in mindwaveDataPointReader.iterRawBatches(PIPELINE_BLOCK_LENGTH, dropPartialBatch=True):
+        blockQueue.put((rawBatch.samples, rawBatch.sampleTimes))
+
+
+def extractFromQueue(blockQueue, resultQueue):
+    while (True):
+        block = blockQueue.get()
+        if (block is None):
+            break
+        resultQueue.put(blockBandPowers(block[0]))
+    resultQueue.put(None)
+
+
+def setUpPipelineQueue(stream):
+    # raw batches pickled from the decoding processes to one worker per core
+    def pipelineQueue():
+        blockQueue = multiprocessing.Queue()
+        resultQueue = multiprocessing.Queue()
+        decodingProcesses = [multiprocessing.Process(target=decodeIntoQueue, args=(stream, blockQueue))
+                             for _ in range(PIPELINE_HEADSETS)]
+        workerProcesses = [multiprocessing.Process(target=extractFromQueue, args=(blockQueue, resultQueue))
+                           for _ in range(min(os.cpu_count(), PIPELINE_HEADSETS))]
+        for process in decodingProcesses + workerProcesses:
+            process.start()
+        for process in decodingProcesses:
+            process.join()
+        for _ in workerProcesses:
+            blockQueue.put(None)
+        blocks = 0
+        endedWorkers = 0
+        while (endedWorkers < len(workerProcesses)):
+            if (resultQueue.get() is None):
+                endedWorkers += 1
+            else:
+                blocks += 1
+        for process in workerProcesses:
+            process.join()
+        return {"headsetSeconds": blocks * PIPELINE_BLOCK_LENGTH / SAMPLING_RATE}
+    return pipelineQueue
+
+
+def setUpPipelineSharedMemory(stream):
+    # rings holding the whole stream, so no block is lost like with the queues
+    samples = sum(len(samples) for samples in readAllRawSamples(stream))
+    def pipelineSharedMemory():
+        pipeline = MindwaveSharedMemoryPipeline(
+            extractBlockBandPowers, byteSources=[BytesByteSource(stream) for _ in range(PIPELINE_HEADSETS)],
+            blockLength=PIPELINE_BLOCK_LENGTH, capacitySeconds=samples / SAMPLING_RATE + 1)
+        pipeline.start()
+        blocks = sum(1 for result in pipeline.results())
+        pipeline.stop()
+        return {"headsetSeconds": blocks * PIPELINE_BLOCK_LENGTH / SAMPLING_RATE}
+    return pipelineSharedMemory
+
+
+def sendToHeadsetSource(headsetListenSocket, stream, clientsConnected):
+    # the local stand-in for the headset the fan-out server connects to
+    headsetSocket, address = headsetListenSocket.accept()
+    clientsConnected.wait()
+    headsetSocket.sendall(stream)
+    headsetSocket.close()
+    headsetListenSocket.close()
+
+
+def drainClient(clientSocket, receivedAmounts):
+    buffer = bytearray(65536)
+    receivedAmount = 0
+    while (True):
+        chunkLength = clientSocket.recv_into(buffer)
+        if (chunkLength == 0):
+            break
+        receivedAmount += chunkLength
+    clientSocket.close()
+    receivedAmounts.append(receivedAmount)
+
+
+def setUpFanOut(stream, clientFormat=FORMAT_RAW, amountOfClients=32):
+    # the stream broadcast by one server to clients which only receive,
+    # headsetSecondsPerSecond above 1 means the server keeps up with the
+    # headset for that many clients on one core
+    samples = sum(len(samples) for samples in readAllRawSamples(stream))
+    def fanOut():
+        headsetListenSocket = socket.create_server(("127.0.0.1", 0))
+        server = MindwaveFanOutServer(byteSource=SocketByteSource(headsetListenSocket.getsockname()),
+                                      listenAddress=("127.0.0.1", 0), maximumQueuedBytes=2 * len(stream))
+        clientsConnected = threading.Event()
+        headsetThread = threading.Thread(target=sendToHeadsetSource,
+                                         args=(headsetListenSocket, stream, clientsConnected))
+        headsetThread.start()
+        server.start()
+        receivedAmounts = []
+        clientThreads = []
+        for _ in range(amountOfClients):
+            clientSocket = socket.create_connection(server.listenAddress())
+            clientSocket.sendall(clientFormat)
+            clientThreads.append(threading.Thread(target=drainClient, args=(clientSocket, receivedAmounts)))
+        while (server.clientCount() < amountOfClients):
+            time.sleep(0.001)
+        for clientThread in clientThreads:
+            clientThread.start()
+        clientsConnected.set()
+        for clientThread in clientThreads:
+            clientThread.join()
+        headsetThread.join()
+        server.stop()
+        return {"clientBytes": sum(receivedAmounts), "headsetSeconds": samples / SAMPLING_RATE}
+    return fanOut
+
+
+def setUpFanOutBatches(stream):
+    return setUpFanOut(stream, FORMAT_BATCHES)
+
+
+def sendPacedRawPackets(headsetListenSocket, sendTimes):
+    # raw packets at the pace of the headset, numbered by their raw value
+    headsetSocket, address = headsetListenSocket.accept()
+    headsetListenSocket.close()
+    startTime = time.monotonic()
+    for packetNumber in range(len(sendTimes)):
+        delay = startTime + packetNumber / SAMPLING_RATE - time.monotonic()
+        if (delay > 0):
+            time.sleep(delay)
+        packet = createPacket([0x80, 0x02, packetNumber >> 8, packetNumber & 0xff])
+        sendTimes[packetNumber] = time.monotonic()
+        headsetSocket.sendall(packet)
+    headsetSocket.close()
+
+
+def setUpPacketLatency(stream):
+    # from sending a packet to the callback receiving its data point, the
+    # stream is not used
+    def packetLatency():
+        headsetListenSocket = socket.create_server(("127.0.0.1", 0))
+        sendTimes = [None] * (PACED_SECONDS * SAMPLING_RATE)
+        latencies = []
+        def measureLatency(dataPoint):
+            latencies.append(time.monotonic() - sendTimes[dataPoint.rawValue])
+        headsetThread = threading.Thread(target=sendPacedRawPackets, args=(headsetListenSocket, sendTimes))
+        headsetThread.start()
+        mindwaveDataPointReader = MindwaveDataPointReader(
+            byteSource=SocketByteSource(headsetListenSocket.getsockname()))
+        mindwaveDataPointReader.start()
+        mindwaveDataPointReader.subscribe(measureLatency, [RawDataPoint])
+        mindwaveDataPointReader.dispatchDataPoints()
+        headsetThread.join()
+        latencies.sort()
+        return {"packets": len(latencies),
+                "p50Latency": latencies[len(latencies) // 2],
+                "p99Latency": latencies[len(latencies) * 99 // 100]}
+    return packetLatency
+
+
+def setUpEmulatedHeadsets(stream, amountOfHeadsets=100):
+    # emulated headsets read by one hub for PACED_SECONDS, the stream is not
+    # used, at the raw rate of every headset about 512 data points per
+    # headset and second arrive
+    def emulatedHeadsets():
+        emulator = MindwaveHeadsetEmulator(amountOfHeadsets)
+        emulator.start()
+        hub = MindwaveHub()
+        for address in emulator.addresses():
+            hub.connectDevice(address)
+        receivedDataPoints = 0
+        latencies = []
+        endTime = time.monotonic() + PACED_SECONDS
+        while (time.monotonic() < endTime):
+            hub.poll(0.1)
+            hubDataPoint = hub.readNextDataPoint(timeout=0)
+            while (hubDataPoint is not None):
+                receivedDataPoints += 1
+                latencies.append(time.monotonic() - hubDataPoint.timestamp)
+                hubDataPoint = hub.readNextDataPoint(timeout=0)
+        hub.close()
+        emulator.stop()
+        latencies.sort()
+        return {"dataPoints": receivedDataPoints,
+                "p99QueueingLatency": latencies[len(latencies) * 99 // 100]}
+    return emulatedHeadsets
+
+
+BENCHMARKS = [
+    ("framePackets", setUpFramePackets),
+    ("recoverCorruptedStream", setUpRecoverCorruptedStream),
+    ("parsePayloads", setUpParsePayloads),
+    ("readNextDataPoint", setUpReadNextDataPoint),
+    ("readRawBatches", setUpReadRawBatches),
+    ("readESenseDataPoints", setUpReadESenseDataPoints),
+    ("dispatchESenseDataPoints", setUpDispatchESenseDataPoints),
+    ("readNextDataPointWithMetrics", setUpReadNextDataPointWithMetrics),
+    ("readRawBatchesWithMetrics", setUpReadRawBatchesWithMetrics),
+    ("downsampleDataPoints", setUpDownsampleDataPoints),
+    ("readDecimatedRawBatches", setUpReadDecimatedRawBatches),
+    ("bandPowers", setUpBandPowers),
+    ("bandPowersDecimated", setUpBandPowersDecimated),
+    ("decodeCapture", setUpDecodeCapture),
+    ("fanOutRaw", setUpFanOut),
+    ("fanOutBatches", setUpFanOutBatches),
+    ("decodeCaptureParallel", setUpDecodeCaptureParallel),
+    ("packetLatency", setUpPacketLatency),
+    ("rollingStatistics", setUpRollingStatistics),
+    ("rollingStatisticsDecimated", setUpRollingStatisticsDecimated),
+    ("rollingStatisticsLongWindow", setUpRollingStatisticsLongWindow),
+    ("rescanLongWindow", setUpRescanLongWindow),
+    ("history", setUpHistory),
+    ("pipelineSingleProcess", setUpPipelineSingleProcess),
+    ("pipelineQueue", setUpPipelineQueue),
+    ("pipelineSharedMemory", setUpPipelineSharedMemory),
+    ("emulatedHeadsets", setUpEmulatedHeadsets),
+]
+
+
+def runBenchmark(setUp, stream, repetitions):
+    bestDuration = None
+    for _ in range(repetitions):
+        run = setUp(stream)
+        startTime = time.perf_counter()
+        amounts = run()
+        duration = time.perf_counter() - startTime
+        if (bestDuration is None or duration < bestDuration):
+            bestDuration = duration
+    result = {"seconds": bestDuration}
+    for name, amount in amounts.items():
+        result[name] = amount
+        if (not name.endswith("Latency")):
+            result[name + "PerSecond"] = amount / bestDuration
+    result["peakAllocatedBytes"] = measurePeakAllocation(setUp, stream)
+    return result
+
+
+def measurePeakAllocation(setUp, stream):
+    run = setUp(stream)
+    tracemalloc.start()
+    run()
+    peakAllocatedBytes = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peakAllocatedBytes
+
+
+def currentCommit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"],
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def printResults(results, comparedResults=None):
+    for name, result in results.items():
+        rates = ", ".join(["{:.0f} {}".format(value, key) for key, value in result.items()
+                           if key.endswith("PerSecond")] +
+                          ["{} {:.2f} ms".format(key, 1000 * value) for key, value in result.items()
+                           if key.endswith("Latency")])
+        line = "{:30s} {}, peak {:.0f} kB".format(name, rates,
+                                                  result["peakAllocatedBytes"] / 1024)
+        if (comparedResults is not None and name in comparedResults):
+            line += ", {:.2f}x".format(comparedResults[name]["seconds"] / result["seconds"])
+        print(line)
+
+
+def main():
+    argumentParser = argparse.ArgumentParser()
+    argumentParser.add_argument("--seconds", type=float, default=60,
+                                help="seconds of generated headset stream")
+    argumentParser.add_argument("--corruption", type=float, default=0.01,
+                                help="probability of a corrupted packet")
+    argumentParser.add_argument("--repetitions", type=int, default=3)
+    argumentParser.add_argument("--only", nargs="*", help="names of benchmarks to run")
+    argumentParser.add_argument("--output", help="write results as JSON to this file")
+    argumentParser.add_argument("--compare", help="JSON results of an earlier run")
+    arguments = argumentParser.parse_args()
+
+    stream = MindwaveStreamGenerator(seed=0, corruptionProbability=arguments.corruption)\
+        .generate(arguments.seconds)
+    results = {}
+    for name, setUp in BENCHMARKS:
+        if (arguments.only and name not in arguments.only):
+            continue
+        results[name] = runBenchmark(setUp, stream, arguments.repetitions)
+
+    comparedResults = None
+    if (arguments.compare):
+        with open(arguments.compare) as comparedFile:
+            comparedResults = json.load(comparedFile)["results"]
+    printResults(results, comparedResults)
+    if (arguments.output):
+        with open(arguments.output, "w") as outputFile:
+            json.dump({"commit": currentCommit(),
+                       "python": platform.python_version(),
+                       "streamSeconds": arguments.seconds,
+                       "streamBytes": len(stream),
+                       "corruption": arguments.corruption,
+                       "results": results}, outputFile, indent=2)
+
+
+if __name__ == '__main__':
+    main()
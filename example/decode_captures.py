@@ -0,0 +1,26 @@
+# Decodes capture files (or all .mwc files of a directory) in parallel and
+# writes the columns of each capture into an .npz file next to it:
+#   python example/decode_captures.py captures/ --processes 8
+import argparse
+import glob
+import os
+
+from mindwavemobile.MindwaveCaptureDecoder import decodeCaptures, writeColumns
+
+if __name__ == '__main__':
+    argumentParser = argparse.ArgumentParser()
+    argumentParser.add_argument("paths", nargs="+", help="capture files or directories")
+    argumentParser.add_argument("--processes", type=int, default=None,
+                                help="decoding processes, all cores by default")
+    arguments = argumentParser.parse_args()
+
+    capturePaths = []
+    for path in arguments.paths:
+        if (os.path.isdir(path)):
+            capturePaths.extend(sorted(glob.glob(os.path.join(path, "*.mwc"))))
+        else:
+            capturePaths.append(path)
+    for capturePath, columns in zip(capturePaths, decodeCaptures(capturePaths, arguments.processes)):
+        outputPath = os.path.splitext(capturePath)[0] + ".npz"
+        writeColumns(columns, outputPath)
+        print("{}: {} samples -> {}".format(capturePath, len(columns["raw"]), outputPath))
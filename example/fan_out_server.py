@@ -0,0 +1,30 @@
+# Connects to the headset once and shares it with local clients, e.g. a
+# recorder and a dashboard each using a MindwaveFanOutByteSource:
+#   python example/fan_out_server.py --port 9102
+#   python example/fan_out_server.py --unix /tmp/mindwave.sock
+import argparse
+import logging
+import socket
+
+from mindwavemobile.MindwaveFanOutServer import MindwaveFanOutServer, DEFAULT_PORT
+
+if __name__ == '__main__':
+    argumentParser = argparse.ArgumentParser()
+    argumentParser.add_argument("--address", help="bluetooth address, discovered by default")
+    argumentParser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    argumentParser.add_argument("--unix", help="listen on this UNIX socket path instead")
+    arguments = argumentParser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    if (arguments.unix is not None):
+        server = MindwaveFanOutServer(address=arguments.address, listenAddress=arguments.unix,
+                                      family=socket.AF_UNIX)
+    else:
+        server = MindwaveFanOutServer(address=arguments.address, listenAddress=("127.0.0.1", arguments.port))
+    if (server.start()):
+        print("Serving on {}".format(server.listenAddress()))
+        try:
+            server.waitUntilHeadsetEnded()
+        except KeyboardInterrupt:
+            pass
+        server.stop()
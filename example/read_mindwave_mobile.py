@@ -1,6 +1,5 @@
-import time
-import bluetooth
-from mindwavemobile.MindwaveDataPoints import RawDataPoint
+from mindwavemobile.MindwaveDataPoints import PoorSignalLevelDataPoint, AttentionDataPoint,\
+    MeditationDataPoint, BlinkDataPoint, EEGPowersDataPoint
 from mindwavemobile.MindwaveDataPointReader import MindwaveDataPointReader
 import textwrap
 
@@ -8,10 +7,10 @@ if __name__ == '__main__':
     mindwaveDataPointReader = MindwaveDataPointReader()
     mindwaveDataPointReader.start()
     if (mindwaveDataPointReader.isConnected()):    
-        while(True):
-            dataPoint = mindwaveDataPointReader.readNextDataPoint()
-            if (not dataPoint.__class__ is RawDataPoint):
-                print(dataPoint)
+        # raw values are not even decoded
+        mindwaveDataPointReader.subscribe(print, [PoorSignalLevelDataPoint, AttentionDataPoint,
+            MeditationDataPoint, BlinkDataPoint, EEGPowersDataPoint])
+        mindwaveDataPointReader.dispatchDataPoints()
     else:
         print((textwrap.dedent("""\
             Exiting because the program could not connect
@@ -0,0 +1,15 @@
+from mindwavemobile.MindwaveDataPointReader import MindwaveDataPointReader
+import textwrap
+
+if __name__ == '__main__':
+    mindwaveDataPointReader = MindwaveDataPointReader()
+    mindwaveDataPointReader.start()
+    if (mindwaveDataPointReader.isConnected()):
+        for rawBatch in mindwaveDataPointReader.iterRawBatches(512):
+            print("{} samples, mean {:.1f}, poor signal level {}".format(
+                len(rawBatch.samples), rawBatch.samples.mean(),
+                rawBatch.poorSignalLevels[-1]))
+    else:
+        print((textwrap.dedent("""\
+            Exiting because the program could not connect
+            to the Mindwave Mobile device.""").replace("\n", " ")))
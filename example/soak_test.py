@@ -0,0 +1,58 @@
+# Reads many emulated headsets with a MindwaveHub for a while and prints
+# throughput, queueing latency and memory every few seconds, reconnecting
+# headsets the emulator disconnected:
+#   python example/soak_test.py --headsets 200 --hours 8 --disconnects 600
+import argparse
+import resource
+import time
+
+from mindwavemobile.MindwaveDataPoints import SAMPLING_RATE
+from mindwavemobile.MindwaveHeadsetEmulator import MindwaveHeadsetEmulator
+from mindwavemobile.MindwaveHub import MindwaveHub
+
+if __name__ == '__main__':
+    argumentParser = argparse.ArgumentParser()
+    argumentParser.add_argument("--headsets", type=int, default=100)
+    argumentParser.add_argument("--seconds", type=float, default=60)
+    argumentParser.add_argument("--hours", type=float, default=None, help="instead of --seconds")
+    argumentParser.add_argument("--corruption", type=float, default=0.0,
+                                help="probability of a corrupted packet")
+    argumentParser.add_argument("--disconnects", type=float, default=None,
+                                help="mean seconds between disconnects of a headset")
+    argumentParser.add_argument("--drift", type=float, default=0.0, help="clock drift of the headsets")
+    argumentParser.add_argument("--interval", type=float, default=10, help="seconds between reports")
+    arguments = argumentParser.parse_args()
+    seconds = arguments.hours * 3600 if arguments.hours is not None else arguments.seconds
+
+    emulator = MindwaveHeadsetEmulator(arguments.headsets, corruptionProbability=arguments.corruption,
+                                       clockDrift=arguments.drift,
+                                       meanSecondsBetweenDisconnects=arguments.disconnects)
+    emulator.start()
+    hub = MindwaveHub()
+    addresses = emulator.addresses()
+    # one attempt per headset and second, so the hub keeps polling the others
+    nextConnectTimes = {}
+    startTime = time.monotonic()
+    while (time.monotonic() - startTime < seconds):
+        reportTime = time.monotonic() + arguments.interval
+        receivedDataPoints = 0
+        maximumLatency = 0.0
+        while (time.monotonic() < reportTime):
+            for address in set(addresses) - set(hub.addresses()):
+                if (time.monotonic() >= nextConnectTimes.get(address, 0)):
+                    nextConnectTimes[address] = time.monotonic() + 1
+                    hub.connectDevice(address, maximumAttempts=1)
+            hub.poll(0.1)
+            hubDataPoint = hub.readNextDataPoint(timeout=0)
+            while (hubDataPoint is not None):
+                receivedDataPoints += 1
+                maximumLatency = max(maximumLatency, time.monotonic() - hubDataPoint.timestamp)
+                hubDataPoint = hub.readNextDataPoint(timeout=0)
+        expectedDataPoints = arguments.headsets * SAMPLING_RATE * arguments.interval
+        print("{:.0f} s: {:.0f} data points/s ({:.0%} of the raw rate), latency up to {:.1f} ms, "
+              "maxrss {} KiB, {}".format(
+                  time.monotonic() - startTime, receivedDataPoints / arguments.interval,
+                  receivedDataPoints / expectedDataPoints, maximumLatency * 1000,
+                  resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, emulator.statistics()), flush=True)
+    hub.close()
+    emulator.stop()
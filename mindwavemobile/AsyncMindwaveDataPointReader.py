@@ -0,0 +1,189 @@
+import asyncio
+import logging
+import socket
+import time
+
+from .MindwaveByteSources import findMindwaveMobileAddress, parseSocketAddress, DEFAULT_RECEIVE_TIMEOUT
+from .MindwaveStreamDecoder import MindwaveStreamDecoder
+
+RFCOMM_CHANNEL = 1
+RECEIVE_SIZE = 4096
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncMindwaveDataPointReader:
+    # asyncio version of MindwaveDataPointReader, so one event loop can serve
+    # several headsets. By default address is a bluetooth address connected
+    # over RFCOMM. "tcp:host:port" and "unix:path" addresses connect to a
+    # local stand-in for the headset like createByteSource, as do a (host,
+    # port) tuple or a path with family=socket.AF_INET or AF_UNIX.
+    # A headset silent for receiveTimeout seconds is reconnected. After
+    # close() reads raise EOFError, also those waiting for bytes.
+    def __init__(self, address=None, family=None, reconnectDelay=1.0, maximumReconnectDelay=30.0,
+                 receiveTimeout=DEFAULT_RECEIVE_TIMEOUT, metrics=None):
+        socketAddress = parseSocketAddress(address) if isinstance(address, str) else None
+        if (socketAddress is not None):
+            family, address = socketAddress
+        self._address = address
+        self._family = family if family is not None else getattr(socket, "AF_BLUETOOTH", None)
+        if (self._family is None):
+            raise ValueError("bluetooth sockets are not available on this platform, "
+                             "give the family of a local stand-in for the headset")
+        self._reconnectDelay = reconnectDelay
+        self._maximumReconnectDelay = maximumReconnectDelay
+        self._receiveTimeout = receiveTimeout
+        self._socket = None
+        self._isReading = False
+        self._isClosed = False
+        # set by close() to end the wait for the next connection attempt
+        self._closedEvent = None
+        self._streamDecoder = MindwaveStreamDecoder(metrics=metrics)
+        self._metrics = metrics
+        self.reconnects = 0
+        if (metrics is not None):
+            metrics.registerCounters(lambda: {"reconnects": self.reconnects})
+
+    async def start(self):
+        self._isClosed = False
+        self._closedEvent = asyncio.Event()
+        if (self._address is None):
+            self._address = await self._findMindwaveMobileAddress()
+        await self._connect()
+
+    def isConnected(self):
+        return self._socket is not None
+
+    def close(self):
+        self._isClosed = True
+        if (self._closedEvent is not None):
+            self._closedEvent.set()
+        self._closeSocket()
+
+    def _closeSocket(self):
+        if (self._socket is None):
+            return
+        try:
+            # wakes up a pending read, which then closes the socket
+            self._socket.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        if (not self._isReading):
+            self._socket.close()
+            self._socket = None
+
+    async def readNextDataPoint(self):
+        dataPoint = self._streamDecoder.readNextDataPoint()
+        while (dataPoint is None):
+            await self._readNextChunk()
+            dataPoint = self._streamDecoder.readNextDataPoint()
+        return dataPoint
+
+    async def readRawBatch(self, amountOfSamples):
+        rawBatch = self._streamDecoder.readRawBatch(amountOfSamples)
+        while (rawBatch is None):
+            await self._readNextChunk()
+            rawBatch = self._streamDecoder.readRawBatch(amountOfSamples)
+        return rawBatch
+
+    def subscribe(self, callback, dataPointTypes):
+        # see MindwaveDataPointReader.subscribe
+        self._streamDecoder.subscribe(callback, dataPointTypes)
+
+    def unsubscribe(self, callback):
+        self._streamDecoder.unsubscribe(callback)
+
+    async def dispatchDataPoints(self):
+        # calls the subscribers for each received chunk until cancelled or closed
+        while (True):
+            self._streamDecoder.dispatchDataPoints()
+            await self._readNextChunk()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            return await self.readNextDataPoint()
+        except EOFError:
+            raise StopAsyncIteration
+
+    async def _findMindwaveMobileAddress(self):
+        # discovery blocks for seconds, so run it in a thread
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, findMindwaveMobileAddress)
+
+    async def _connect(self):
+        loop = asyncio.get_running_loop()
+        reconnectDelay = self._reconnectDelay
+        while (True):
+            self._raiseIfClosed()
+            connectingSocket = self._createSocket()
+            try:
+                await loop.sock_connect(connectingSocket, self._socketAddress())
+            except OSError as error:
+                connectingSocket.close()
+                logger.warning("Could not connect to %s: %s; Retrying in %ss...",
+                               self._address, error, reconnectDelay)
+                try:
+                    # returns early when closed meanwhile
+                    await asyncio.wait_for(self._closedEvent.wait(), reconnectDelay)
+                except asyncio.TimeoutError:
+                    pass
+                reconnectDelay = min(2 * reconnectDelay, self._maximumReconnectDelay)
+                continue
+            if (self._isClosed):
+                # closed while connecting
+                connectingSocket.close()
+                self._raiseIfClosed()
+            self._socket = connectingSocket
+            return
+
+    def _raiseIfClosed(self):
+        if (self._isClosed):
+            raise EOFError("Mindwave Mobile reader was closed")
+
+    def _createSocket(self):
+        if (self._family == getattr(socket, "AF_BLUETOOTH", None)):
+            newSocket = socket.socket(self._family, socket.SOCK_STREAM, socket.BTPROTO_RFCOMM)
+        else:
+            newSocket = socket.socket(self._family, socket.SOCK_STREAM)
+        newSocket.setblocking(False)
+        return newSocket
+
+    def _socketAddress(self):
+        if (self._family == getattr(socket, "AF_BLUETOOTH", None)):
+            return (self._address, RFCOMM_CHANNEL)
+        return self._address
+
+    async def _readNextChunk(self):
+        self._raiseIfClosed()
+        loop = asyncio.get_running_loop()
+        self._isReading = True
+        try:
+            chunk = await asyncio.wait_for(loop.sock_recv(self._socket, RECEIVE_SIZE), self._receiveTimeout)
+        except asyncio.TimeoutError:
+            logger.warning("No bytes from %s for %ss", self._address, self._receiveTimeout)
+            chunk = b''
+        except OSError as error:
+            logger.warning("Connection to %s lost: %s", self._address, error)
+            chunk = b''
+        finally:
+            self._isReading = False
+        if (self._isClosed):
+            # woken up by close()
+            self._closeSocket()
+            self._raiseIfClosed()
+        if (len(chunk) == 0):
+            await self._reconnect()
+            return
+        if (self._metrics is not None):
+            self._metrics.increment("receivedBytes", len(chunk))
+            self._metrics.increment("receivedChunks")
+        self._streamDecoder.feedBytes(chunk, time.monotonic())
+
+    async def _reconnect(self):
+        self._closeSocket()
+        self._streamDecoder.discardUnframedBytes()
+        self.reconnects += 1
+        await self._connect()
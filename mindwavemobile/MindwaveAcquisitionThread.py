@@ -0,0 +1,120 @@
+import collections
+import threading
+
+DROP_OLDEST = "dropOldest"
+DROP_NEWEST = "dropNewest"
+BLOCK = "block"
+
+
+class MindwaveAcquisitionThread(threading.Thread):
+    # Calls readDataPoints (which blocks until the next chunk arrived and returns
+    # its data points) continuously and hands the data points to consumers
+    # through a bounded deque. append and popleft of a deque are atomic, so
+    # single data points are handed off without a lock; events are only used
+    # to wake up a waiting consumer (once per chunk) or a blocked producer.
+    def __init__(self, readDataPoints, maximumQueueLength=100000, overflowPolicy=DROP_OLDEST):
+        threading.Thread.__init__(self, name="MindwaveAcquisitionThread", daemon=True)
+        if (overflowPolicy not in (DROP_OLDEST, DROP_NEWEST, BLOCK)):
+            raise ValueError("unknown overflow policy {}".format(overflowPolicy))
+        self._readDataPoints = readDataPoints
+        self._overflowPolicy = overflowPolicy
+        self._maximumQueueLength = maximumQueueLength
+        maxlen = maximumQueueLength if overflowPolicy == DROP_OLDEST else None
+        self._dataPointQueue = collections.deque(maxlen=maxlen)
+        self._dataAvailable = threading.Event()
+        self._spaceAvailable = threading.Event()
+        self._isStopped = False
+        self._hasEnded = False
+        self._error = None
+        self.droppedDataPoints = 0
+
+    def run(self):
+        try:
+            while (not self._isStopped):
+                self._handOff(self._readDataPoints())
+        except Exception as error:
+            # e.g. EOFError at the end of the stream, raised again for the consumer
+            self._error = error
+        finally:
+            self._hasEnded = True
+            self._dataAvailable.set()
+
+    def stop(self, timeout=1.0):
+        # The thread only sees the request after its current read returned.
+        # Returns False if it is still running after timeout seconds.
+        # Without start() there is nothing to stop, the thread then never runs.
+        self._isStopped = True
+        self._spaceAvailable.set()
+        if (self.ident is None):
+            self._hasEnded = True
+            self._dataAvailable.set()
+            return True
+        self.join(timeout)
+        return not self.is_alive()
+
+    def takeQueuedDataPoints(self):
+        # the data points no consumer read, in order, e.g. after stop()
+        dataPoints = list(self._dataPointQueue)
+        self._dataPointQueue.clear()
+        return dataPoints
+
+    def queueLength(self):
+        return len(self._dataPointQueue)
+
+    def _handOff(self, dataPoints):
+        dataPointQueue = self._dataPointQueue
+        for dataPoint in dataPoints:
+            if (len(dataPointQueue) >= self._maximumQueueLength):
+                if (self._overflowPolicy == DROP_NEWEST):
+                    self.droppedDataPoints += 1
+                    continue
+                elif (self._overflowPolicy == BLOCK):
+                    self._waitForSpace()
+                else:
+                    self.droppedDataPoints += 1
+            dataPointQueue.append(dataPoint)
+        self._dataAvailable.set()
+
+    def _waitForSpace(self):
+        self._dataAvailable.set()
+        while (len(self._dataPointQueue) >= self._maximumQueueLength and not self._isStopped):
+            self._spaceAvailable.clear()
+            if (len(self._dataPointQueue) >= self._maximumQueueLength):
+                self._spaceAvailable.wait(0.1)
+
+    def readNextDataPoint(self, timeout=None):
+        while (True):
+            try:
+                dataPoint = self._dataPointQueue.popleft()
+            except IndexError:
+                if (not self._waitForData(timeout)):
+                    return None
+                continue
+            if (self._overflowPolicy == BLOCK):
+                self._spaceAvailable.set()
+            return dataPoint
+
+    def readDataPoints(self, maximumAmount, timeout=None):
+        # waits for at least one data point, then returns all available ones up to maximumAmount
+        firstDataPoint = self.readNextDataPoint(timeout)
+        if (firstDataPoint is None):
+            return []
+        dataPoints = [firstDataPoint]
+        popleft = self._dataPointQueue.popleft
+        try:
+            while (len(dataPoints) < maximumAmount):
+                dataPoints.append(popleft())
+        except IndexError:
+            pass
+        if (self._overflowPolicy == BLOCK):
+            self._spaceAvailable.set()
+        return dataPoints
+
+    def _waitForData(self, timeout):
+        # returns False on timeout
+        self._dataAvailable.clear()
+        if (len(self._dataPointQueue) > 0):
+            return True
+        if (self._hasEnded):
+            raise self._error if self._error is not None else EOFError("acquisition thread stopped")
+        return self._dataAvailable.wait(timeout)
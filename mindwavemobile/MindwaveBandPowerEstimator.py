@@ -0,0 +1,84 @@
+import collections
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from .MindwaveDataPoints import SAMPLING_RATE
+
+# frequency ranges in Hz of the EEG powers the headset sends (0x83)
+DEFAULT_BANDS = collections.OrderedDict([
+    ("delta", (0.5, 2.75)),
+    ("theta", (3.5, 6.75)),
+    ("lowAlpha", (7.5, 9.25)),
+    ("highAlpha", (10, 11.75)),
+    ("lowBeta", (13, 16.75)),
+    ("highBeta", (18, 29.75)),
+    ("lowGamma", (31, 39.75)),
+    ("midGamma", (41, 49.75)),
+])
+
+
+class MindwaveBandPowerEstimator:
+    # Streaming Welch estimate of band powers from raw values. Every hopLength
+    # samples one new segment of segmentLength samples is windowed and
+    # transformed, reduced to its band powers and averaged with the band powers
+    # of the previous averagedSegments - 1 segments by a running sum, so
+    # samples are only transformed once per segment they belong to.
+    # With the defaults a new estimate over 1 second arrives every 62.5 ms.
+    def __init__(self, segmentLength=256, hopLength=32, averagedSegments=9,
+                 samplingRate=SAMPLING_RATE, bands=DEFAULT_BANDS, window=None):
+        self.bandNames = list(bands.keys())
+        self._segmentLength = segmentLength
+        self._hopLength = hopLength
+        self._averagedSegments = averagedSegments
+        self._window = np.hanning(segmentLength) if window is None else np.asarray(window, dtype=np.float64)
+        self._bandMatrix = self._createBandMatrix(bands, samplingRate)
+        # one sided power spectral density, summed over a band gives its power
+        frequencyResolution = samplingRate / segmentLength
+        self._scale = 2 * frequencyResolution / (samplingRate * np.sum(self._window ** 2))
+        self._samples = np.zeros(0, dtype=np.float64)
+        self._recentSegmentBandPowers = np.zeros((0, len(self.bandNames)))
+        self._latestBandPowers = None
+        self.processedSamples = 0
+
+    def _createBandMatrix(self, bands, samplingRate):
+        frequencies = np.fft.rfftfreq(self._segmentLength, 1.0 / samplingRate)
+        bandMatrix = np.zeros((len(frequencies), len(bands)))
+        for bandNumber, (lowFrequency, highFrequency) in enumerate(bands.values()):
+            bandMatrix[(frequencies >= lowFrequency) & (frequencies <= highFrequency), bandNumber] = 1
+        return bandMatrix
+
+    def addSamples(self, samples):
+        # Returns one row of band powers for every completed hop,
+        # shape (amount of new estimates, amount of bands), possibly empty.
+        self.processedSamples += len(samples)
+        samples = np.concatenate((self._samples, np.asarray(samples, dtype=np.float64)))
+        if (len(samples) < self._segmentLength):
+            self._samples = samples
+            return np.zeros((0, len(self.bandNames)))
+        numberOfSegments = (len(samples) - self._segmentLength) // self._hopLength + 1
+        segments = sliding_window_view(samples, self._segmentLength)[::self._hopLength][:numberOfSegments]
+        self._samples = samples[numberOfSegments * self._hopLength:]
+        spectra = np.fft.rfft(segments * self._window, axis=1)
+        segmentBandPowers = (spectra.real ** 2 + spectra.imag ** 2) @ self._bandMatrix * self._scale
+        return self._averageSegments(segmentBandPowers)
+
+    def _averageSegments(self, segmentBandPowers):
+        # running mean over the last averagedSegments segments via cumulative sums,
+        # at the start averaging over the segments there are
+        allBandPowers = np.concatenate((self._recentSegmentBandPowers, segmentBandPowers))
+        cumulativeSums = np.concatenate((np.zeros((1, allBandPowers.shape[1])),
+                                         np.cumsum(allBandPowers, axis=0)))
+        endIndices = np.arange(len(self._recentSegmentBandPowers), len(allBandPowers)) + 1
+        startIndices = np.maximum(endIndices - self._averagedSegments, 0)
+        averagedBandPowers = ((cumulativeSums[endIndices] - cumulativeSums[startIndices]) /
+                              (endIndices - startIndices)[:, np.newaxis])
+        self._recentSegmentBandPowers = allBandPowers[-(self._averagedSegments - 1):] \
+            if self._averagedSegments > 1 else allBandPowers[:0]
+        self._latestBandPowers = averagedBandPowers[-1]
+        return averagedBandPowers
+
+    def latestBandPowers(self):
+        # band powers of the latest estimate by band name, None before the first one
+        if (self._latestBandPowers is None):
+            return None
+        return dict(zip(self.bandNames, self._latestBandPowers.tolist()))
@@ -0,0 +1,292 @@
+import logging
+import mmap
+import os
+import socket
+import struct
+import time
+
+# Byte sources deliver the ThinkGear byte stream to MindwaveMobileRawReader.
+# They need connect(), recv_into(buffer) returning the amount of bytes
+# written into buffer (0 at the end of the stream) and close().
+
+CAPTURE_FILE_HEADER = b"MWMCAP1\n"
+# arrival time as float64 and chunk length as uint32, little endian
+CAPTURE_RECORD_HEADER = struct.Struct("<dI")
+# the address of the last discovered headset, so discovery is skipped
+DEFAULT_ADDRESS_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".mindwavemobile", "address")
+# the headset sends about every 2 ms, seconds of silence mean a lost connection
+DEFAULT_RECEIVE_TIMEOUT = 5.0
+
+logger = logging.getLogger(__name__)
+
+
+def findMindwaveMobileAddress():
+    # PyBluez is only imported when it is really needed
+    import bluetooth
+    nearby_devices = bluetooth.discover_devices(lookup_names = True)
+    for address, name in nearby_devices:
+        if (name == "MindWave Mobile"):
+            return address
+    return None
+
+
+def readCachedAddress(cachePath=DEFAULT_ADDRESS_CACHE_PATH):
+    # None if nothing was cached yet
+    try:
+        with open(cachePath) as cacheFile:
+            address = cacheFile.read().strip()
+    except OSError:
+        return None
+    return address if len(address) > 0 else None
+
+
+def writeCachedAddress(address, cachePath=DEFAULT_ADDRESS_CACHE_PATH):
+    try:
+        os.makedirs(os.path.dirname(cachePath), exist_ok=True)
+        temporaryPath = cachePath + ".tmp"
+        with open(temporaryPath, "w") as cacheFile:
+            cacheFile.write(address + "\n")
+        os.replace(temporaryPath, cachePath)
+    except OSError as error:
+        logger.warning("Could not cache the address in %s: %s", cachePath, error)
+
+
+def parseSocketAddress(address):
+    # family and socket address of "tcp:host:port" and "unix:path" addresses
+    # of a local stand-in for the headset, None for bluetooth addresses
+    if (address.startswith("tcp:")):
+        host, port = address[len("tcp:"):].rsplit(":", 1)
+        return socket.AF_INET, (host, int(port))
+    if (address.startswith("unix:")):
+        return socket.AF_UNIX, address[len("unix:"):]
+    return None
+
+
+def createByteSource(address, timeout=None):
+    # "tcp:host:port" and "unix:path" connect to a local stand-in for the
+    # headset, e.g. MindwaveHeadsetEmulator, any other address over bluetooth
+    socketAddress = parseSocketAddress(address)
+    if (socketAddress is not None):
+        family, address = socketAddress
+        return SocketByteSource(address, family, timeout)
+    return BluetoothByteSource(address, timeout)
+
+
+def _shutDownAndClose(byteSourceSocket):
+    # closing alone does not wake up a receive blocked in another thread
+    try:
+        byteSourceSocket.shutdown(socket.SHUT_RDWR)
+    except OSError:
+        pass
+    byteSourceSocket.close()
+
+
+class BluetoothByteSource:
+    # connect() makes one attempt and raises the BluetoothError (an OSError)
+    # if it fails, MindwaveMobileRawReader retries with a backoff.
+    def __init__(self, address, timeout=None):
+        self.address = address
+        self.timeout = timeout
+        self.socket = None
+
+    def connect(self):
+        import bluetooth
+        self.socket = bluetooth.BluetoothSocket(bluetooth.RFCOMM)
+        try:
+            self.socket.connect((self.address, 1))
+        except OSError:
+            self.socket.close()
+            raise
+        self.socket.settimeout(self.timeout)
+
+    def recv_into(self, buffer):
+        recvInto = getattr(self.socket, "recv_into", None)
+        if (recvInto is not None):
+            return recvInto(buffer)
+        # e.g. PyBluez sockets do not always provide recv_into
+        receivedBytes = self.socket.recv(len(buffer))
+        buffer[:len(receivedBytes)] = receivedBytes
+        return len(receivedBytes)
+
+    def close(self):
+        _shutDownAndClose(self.socket)
+
+
+class SocketByteSource:
+    # Reads from a local stand-in for the headset, e.g. a TCP or UNIX socket.
+    # With a timeout, recv_into raises socket.timeout after that many
+    # seconds without bytes.
+    def __init__(self, address, family=socket.AF_INET, timeout=None):
+        self.address = address
+        self.family = family
+        self.timeout = timeout
+        self.socket = None
+
+    def connect(self):
+        self.socket = socket.socket(self.family, socket.SOCK_STREAM)
+        try:
+            self.socket.connect(self.address)
+        except OSError:
+            self.socket.close()
+            raise
+        self.socket.settimeout(self.timeout)
+
+    def recv_into(self, buffer):
+        return self.socket.recv_into(buffer)
+
+    def close(self):
+        _shutDownAndClose(self.socket)
+
+
+class ConnectedSocketByteSource:
+    # Reads from a socket connected already, e.g. one end of a socket pair,
+    # which can not be connected again: connect() raises once it was closed,
+    # so reconnecting readers back off instead of spinning.
+    def __init__(self, connectedSocket):
+        self.socket = connectedSocket
+        self._isClosed = False
+
+    def connect(self):
+        if (self._isClosed):
+            raise OSError("connected socket was closed and can not be connected again")
+
+    def recv_into(self, buffer):
+        return self.socket.recv_into(buffer)
+
+    def close(self):
+        self._isClosed = True
+        _shutDownAndClose(self.socket)
+
+
+class BytesByteSource:
+    # Serves bytes held in memory in chunks of at most chunkSize bytes,
+    # e.g. a generated stream for tests and benchmarks. The view onto the
+    # bytes is made when connecting, so an unconnected source can be
+    # pickled, e.g. to a spawned process.
+    def __init__(self, data, chunkSize=4096):
+        self._data = data
+        self._view = None
+        self._chunkSize = chunkSize
+        self._position = 0
+
+    def connect(self):
+        self._view = memoryview(self._data)
+        self._position = 0
+
+    def recv_into(self, buffer):
+        chunkLength = min(len(buffer), self._chunkSize, len(self._view) - self._position)
+        buffer[:chunkLength] = self._view[self._position:self._position + chunkLength]
+        self._position += chunkLength
+        return chunkLength
+
+    def close(self):
+        pass
+
+
+class RecordingByteSource:
+    # Passes through the bytes of another source and writes every received
+    # chunk with its arrival time into a capture file. The file is appended
+    # to, so recording continues after reconnects, and later recordings into
+    # the same file add to the capture.
+    def __init__(self, byteSource, capturePath):
+        self.byteSource = byteSource
+        self._capturePath = capturePath
+        self._captureFile = None
+
+    def connect(self):
+        self.byteSource.connect()
+        if (self._captureFile is None):
+            self._captureFile = self._openCapture()
+
+    def _openCapture(self):
+        captureFile = open(self._capturePath, "ab")
+        if (captureFile.tell() == 0):
+            captureFile.write(CAPTURE_FILE_HEADER)
+            return captureFile
+        with open(self._capturePath, "rb") as existingFile:
+            isCapture = existingFile.read(len(CAPTURE_FILE_HEADER)) == CAPTURE_FILE_HEADER
+        if (not isCapture):
+            captureFile.close()
+            raise ValueError("{} is not a Mindwave Mobile capture".format(self._capturePath))
+        return captureFile
+
+    def recv_into(self, buffer):
+        receivedAmount = self.byteSource.recv_into(buffer)
+        if (receivedAmount > 0):
+            self._captureFile.write(CAPTURE_RECORD_HEADER.pack(time.time(), receivedAmount))
+            self._captureFile.write(buffer[:receivedAmount])
+        return receivedAmount
+
+    def close(self):
+        # readers close before reconnecting, the next connect appends again
+        self.byteSource.close()
+        if (self._captureFile is not None):
+            self._captureFile.close()
+            self._captureFile = None
+
+
+class ReplayByteSource:
+    # Replays a capture file written by RecordingByteSource. With realTime=True
+    # chunks are delivered with their recorded timing, otherwise as fast as
+    # possible, filling the whole buffer from as many chunks as fit.
+    def __init__(self, capturePath, realTime=False):
+        self._capturePath = capturePath
+        self._realTime = realTime
+        self._captureFile = None
+        self._capture = None
+
+    def connect(self):
+        self._captureFile = open(self._capturePath, "rb")
+        self._capture = mmap.mmap(self._captureFile.fileno(), 0, access=mmap.ACCESS_READ)
+        if (self._capture[:len(CAPTURE_FILE_HEADER)] != CAPTURE_FILE_HEADER):
+            self.close()
+            raise ValueError("{} is not a Mindwave Mobile capture".format(self._capturePath))
+        self._capturePosition = len(CAPTURE_FILE_HEADER)
+        self._remainingChunkBytes = 0
+        self._firstArrivalTime = None
+        self._replayStartTime = None
+
+    def recv_into(self, buffer):
+        writtenAmount = 0
+        while (writtenAmount < len(buffer)):
+            if (self._remainingChunkBytes == 0):
+                if (writtenAmount > 0 and self._realTime):
+                    break
+                if (not self._startNextChunk()):
+                    break
+            copiedAmount = min(len(buffer) - writtenAmount, self._remainingChunkBytes)
+            buffer[writtenAmount:writtenAmount + copiedAmount] = \
+                self._capture[self._capturePosition:self._capturePosition + copiedAmount]
+            self._capturePosition += copiedAmount
+            self._remainingChunkBytes -= copiedAmount
+            writtenAmount += copiedAmount
+        return writtenAmount
+
+    def _startNextChunk(self):
+        if (self._capturePosition + CAPTURE_RECORD_HEADER.size > len(self._capture)):
+            return False
+        arrivalTime, chunkLength = CAPTURE_RECORD_HEADER.unpack_from(
+            self._capture, self._capturePosition)
+        self._capturePosition += CAPTURE_RECORD_HEADER.size
+        # the last record of an interrupted recording might be incomplete
+        self._remainingChunkBytes = min(chunkLength, len(self._capture) - self._capturePosition)
+        if (self._realTime):
+            self._waitUntilArrivalTime(arrivalTime)
+        return True
+
+    def _waitUntilArrivalTime(self, arrivalTime):
+        if (self._firstArrivalTime is None):
+            self._firstArrivalTime = arrivalTime
+            self._replayStartTime = time.monotonic()
+        waitTime = ((arrivalTime - self._firstArrivalTime) -
+                    (time.monotonic() - self._replayStartTime))
+        if (waitTime > 0):
+            time.sleep(waitTime)
+
+    def close(self):
+        if (self._capture is not None):
+            self._capture.close()
+            self._capture = None
+        if (self._captureFile is not None):
+            self._captureFile.close()
+            self._captureFile = None
@@ -0,0 +1,316 @@
+import array
+import bisect
+import concurrent.futures
+import mmap
+import numpy as np
+
+from .MindwaveByteSources import CAPTURE_FILE_HEADER, CAPTURE_RECORD_HEADER
+from .MindwavePacketFramer import MindwavePacketFramer, HEADER_LENGTH, MAXIMUM_PACKET_LENGTH
+from .MindwavePacketPayloadParser import iterDataRows, isSingleRawValue
+
+# name, data row code and value length of the decoded columns,
+# rows with other value lengths are skipped like MindwavePacketPayloadParser
+# skips them, counting them as malformedDataRows
+COLUMNS = [
+    ("raw", 0x80, 2),
+    ("poorSignal", 0x02, 1),
+    ("attention", 0x04, 1),
+    ("meditation", 0x05, 1),
+    ("blink", 0x16, 1),
+    ("eegPowers", 0x83, 24),
+]
+# bytes of the stream decoded by one task of the process pool
+DEFAULT_REGION_LENGTH = 4 * 1024 * 1024
+# a region's leading packets that may be replaced when stitching regions,
+# for more the process decoding the previous region decodes on its own
+STITCHED_PACKETS = 64
+
+
+class MindwaveColumnDecoder:
+    # Collects the values of packet payloads into one flat buffer per column
+    # and hands them out as arrays: raw values as int16, EEG powers as
+    # uint32 rows of the eight bands, everything else as uint8, each with
+    # the packets' arrival times as <name>Timestamps.
+    def __init__(self):
+        self._columnOfCode = [None] * 256
+        for column, (name, dataRowCode, valueLength) in enumerate(COLUMNS):
+            self._columnOfCode[dataRowCode] = column
+        self._valueBytes = [bytearray() for _ in COLUMNS]
+        self._timestamps = [array.array("d") for _ in COLUMNS]
+
+    def rowCounts(self):
+        return tuple(len(timestamps) for timestamps in self._timestamps)
+
+    def decodePayload(self, payloadBytes, timestamp):
+        if (isSingleRawValue(payloadBytes)):
+            self._valueBytes[0] += payloadBytes[2:4]
+            self._timestamps[0].append(timestamp)
+            return
+        for dataRowCode, valueStart, valueEnd in iterDataRows(payloadBytes):
+            if (valueEnd is None):
+                break
+            column = self._columnOfCode[dataRowCode]
+            if (column is not None and COLUMNS[column][2] == valueEnd - valueStart):
+                self._valueBytes[column] += payloadBytes[valueStart:valueEnd]
+                self._timestamps[column].append(timestamp)
+
+    def columns(self):
+        columns = {}
+        for (name, dataRowCode, valueLength), valueBytes, timestamps in \
+                zip(COLUMNS, self._valueBytes, self._timestamps):
+            if (name == "raw"):
+                # big endian 16 bit two's complement
+                values = np.frombuffer(valueBytes, dtype=">i2").astype(np.int16)
+            elif (name == "eegPowers"):
+                # eight big endian 24 bit unsigned integers
+                bandBytes = np.frombuffer(valueBytes, dtype=np.uint8).reshape(-1, 8, 3).astype(np.uint32)
+                values = (bandBytes[:, :, 0] << 16) | (bandBytes[:, :, 1] << 8) | bandBytes[:, :, 2]
+            else:
+                values = np.frombuffer(valueBytes, dtype=np.uint8).copy()
+            columns[name] = values
+            columns[name + "Timestamps"] = np.frombuffer(timestamps, dtype=np.float64).copy()
+        return columns
+
+
+def decodePayloadColumns(payloads, timestamp):
+    # the columns of payloads that arrived together, e.g. with one chunk
+    columnDecoder = MindwaveColumnDecoder()
+    for payload in payloads:
+        columnDecoder.decodePayload(payload, timestamp)
+    return columnDecoder.columns()
+
+
+class MindwaveCapture:
+    # Byte stream of a capture file written by RecordingByteSource, addressed
+    # by stream position regardless of the records it was recorded in.
+    # records are the file offsets, stream starts, stream ends and arrival
+    # times of the records, read from the file if not given.
+    def __init__(self, capturePath, records=None):
+        self.capturePath = capturePath
+        self._captureFile = open(capturePath, "rb")
+        self._capture = mmap.mmap(self._captureFile.fileno(), 0, access=mmap.ACCESS_READ)
+        if (self._capture[:len(CAPTURE_FILE_HEADER)] != CAPTURE_FILE_HEADER):
+            self.close()
+            raise ValueError("{} is not a Mindwave Mobile capture".format(capturePath))
+        if (records is None):
+            records = self._readRecords()
+        (self.recordFileOffsets, self.recordStreamStarts,
+         self.recordStreamEnds, self.recordArrivalTimes) = records
+        self.streamLength = int(self.recordStreamEnds[-1]) if len(self.recordStreamEnds) > 0 else 0
+
+    def _readRecords(self):
+        fileOffsets = array.array("q")
+        lengths = array.array("q")
+        arrivalTimes = array.array("d")
+        capturePosition = len(CAPTURE_FILE_HEADER)
+        while (capturePosition + CAPTURE_RECORD_HEADER.size <= len(self._capture)):
+            arrivalTime, chunkLength = CAPTURE_RECORD_HEADER.unpack_from(self._capture, capturePosition)
+            capturePosition += CAPTURE_RECORD_HEADER.size
+            # the last record of an interrupted recording might be incomplete
+            chunkLength = min(chunkLength, len(self._capture) - capturePosition)
+            fileOffsets.append(capturePosition)
+            lengths.append(chunkLength)
+            arrivalTimes.append(arrivalTime)
+            capturePosition += chunkLength
+        recordStreamEnds = np.cumsum(np.frombuffer(lengths, dtype=np.int64))
+        recordStreamStarts = recordStreamEnds - np.frombuffer(lengths, dtype=np.int64)
+        return (np.frombuffer(fileOffsets, dtype=np.int64), recordStreamStarts,
+                recordStreamEnds, np.frombuffer(arrivalTimes, dtype=np.float64))
+
+    def recordsBetween(self, start, end):
+        # records containing the stream positions from start to end
+        firstRecord = int(np.searchsorted(self.recordStreamEnds, start, side="right"))
+        lastRecord = int(np.searchsorted(self.recordStreamEnds, end - 1, side="right"))
+        return (self.recordFileOffsets[firstRecord:lastRecord + 1],
+                self.recordStreamStarts[firstRecord:lastRecord + 1],
+                self.recordStreamEnds[firstRecord:lastRecord + 1],
+                self.recordArrivalTimes[firstRecord:lastRecord + 1])
+
+    def streamBytes(self, start, end):
+        end = min(end, self.streamLength)
+        if (start >= end):
+            return b''
+        firstRecord = int(np.searchsorted(self.recordStreamEnds, start, side="right"))
+        lastRecord = int(np.searchsorted(self.recordStreamEnds, end - 1, side="right"))
+        parts = []
+        for record in range(firstRecord, lastRecord + 1):
+            recordStreamStart = int(self.recordStreamStarts[record])
+            recordStreamEnd = int(self.recordStreamEnds[record])
+            partStart = max(start, recordStreamStart) - recordStreamStart
+            partEnd = min(end, recordStreamEnd) - recordStreamStart
+            fileOffset = int(self.recordFileOffsets[record])
+            parts.append(self._capture[fileOffset + partStart:fileOffset + partEnd])
+        return b''.join(parts)
+
+    def arrivalTimesAt(self, streamPositions):
+        # arrival time of the records containing the stream positions
+        recordNumbers = np.searchsorted(self.recordStreamEnds, streamPositions, side="right")
+        return self.recordArrivalTimes[recordNumbers]
+
+    def close(self):
+        self._capture.close()
+        self._captureFile.close()
+
+
+def _decodeRegion(capturePath, records, regionStart, regionEnd):
+    # Frames the packets starting in the region, searching from its first byte,
+    # and decodes them. Returns the packet starts, ends and positions needed
+    # to frame them, the columns and the row counts after each of the first
+    # STITCHED_PACKETS packets.
+    # records only need to cover the region and the packets ending after it.
+    # Like MindwaveStreamDecoder, the timestamp of a packet is the arrival
+    # time of the last byte needed to frame it.
+    capture = MindwaveCapture(capturePath, records)
+    try:
+        data = capture.streamBytes(regionStart, regionEnd + MAXIMUM_PACKET_LENGTH)
+        payloads, packetPositions, unframedBytes = MindwavePacketFramer().framePacketsWithPositions(data)
+        packetPositions = np.array(packetPositions, dtype=np.int64).reshape(-1, 2) + regionStart
+        amountOfPackets = int(np.searchsorted(packetPositions[:, 0], regionEnd))
+        payloads = payloads[:amountOfPackets]
+        packetStarts = packetPositions[:amountOfPackets, 0]
+        packetEnds = packetStarts + HEADER_LENGTH + 1 + \
+            np.array([len(payload) for payload in payloads], dtype=np.int64)
+        readyPositions = packetPositions[:amountOfPackets, 1]
+        timestamps = capture.arrivalTimesAt(readyPositions).tolist()
+    finally:
+        capture.close()
+    columnDecoder = MindwaveColumnDecoder()
+    headRowCounts = [columnDecoder.rowCounts()]
+    for packetNumber, (payload, timestamp) in enumerate(zip(payloads, timestamps)):
+        columnDecoder.decodePayload(payload, timestamp)
+        if (packetNumber < STITCHED_PACKETS):
+            headRowCounts.append(columnDecoder.rowCounts())
+    return packetStarts, packetEnds, readyPositions, columnDecoder.columns(), headRowCounts
+
+
+class _CaptureStitcher:
+    # Merges the decoded regions of one capture into the result of decoding it
+    # sequentially. A region's framer starts at its first byte, possibly in
+    # the middle of a packet, while the sequential framer continues after the
+    # last packet of the previous region. From there packets are framed here
+    # until one is found that the region's framer found as well, after which
+    # both framers make the same decisions, as long as the same false sync
+    # before it was waited for, see MindwavePacketFramer.framePacketsWithPositions.
+    def __init__(self, capture, regionEnds):
+        self._capture = capture
+        self._regionEnds = regionEnds
+        self._columnParts = []
+        self._position = 0
+        self._readyPosition = 0
+
+    def addRegion(self, regionNumber, regionResult):
+        packetStarts, packetEnds, readyPositions, columns, headRowCounts = regionResult
+        regionEnd = self._regionEnds[regionNumber]
+        if (regionNumber > 0):
+            skippedPackets = self._frameUntilPacketOf(packetStarts, readyPositions, regionEnd)
+            if (skippedPackets is None):
+                return
+        else:
+            skippedPackets = 0
+        if (skippedPackets == len(packetStarts)):
+            return
+        rowCounts = headRowCounts[skippedPackets]
+        self._columnParts.append(dict(
+            (name, values[rowCounts[_columnNumber(name)]:]) for name, values in columns.items()))
+        self._position = int(packetEnds[-1])
+        self._readyPosition = int(readyPositions[-1])
+
+    def _frameUntilPacketOf(self, packetStarts, readyPositions, regionEnd):
+        # Decodes packets from the current position on until one of the first
+        # STITCHED_PACKETS packets of the region, returning its index.
+        # Returns None if the region ended before.
+        columnDecoder = MindwaveColumnDecoder()
+        try:
+            while (self._position < regionEnd):
+                packet = self._frameNextPacket()
+                if (packet is None):
+                    self._position = self._capture.streamLength
+                    return None
+                packetStart, payload, readyPosition = packet
+                if (packetStart >= regionEnd):
+                    return None
+                # a false sync before the previous packet might still be waited for
+                readyPosition = max(readyPosition, self._readyPosition)
+                packetIndex = bisect.bisect_left(packetStarts, packetStart)
+                if (packetIndex < min(len(packetStarts), STITCHED_PACKETS + 1)
+                        and packetStarts[packetIndex] == packetStart
+                        and readyPositions[packetIndex] == readyPosition):
+                    return packetIndex
+                columnDecoder.decodePayload(payload, float(self._capture.arrivalTimesAt(readyPosition)))
+                self._position = packetStart + HEADER_LENGTH + len(payload) + 1
+                self._readyPosition = readyPosition
+            return None
+        finally:
+            self._columnParts.append(columnDecoder.columns())
+
+    def _frameNextPacket(self):
+        # first packet the sequential framer accepts after the current
+        # position, None at the end of the stream
+        windowLength = 4 * MAXIMUM_PACKET_LENGTH
+        while (True):
+            data = self._capture.streamBytes(self._position, self._position + windowLength)
+            payloads, packetPositions, unframedBytes = MindwavePacketFramer().framePacketsWithPositions(data)
+            if (len(payloads) > 0):
+                packetStart, readyPosition = packetPositions[0]
+                return self._position + packetStart, payloads[0], self._position + readyPosition
+            if (self._position + len(data) >= self._capture.streamLength):
+                return None
+            windowLength *= 2
+
+    def columns(self):
+        if (len(self._columnParts) == 0):
+            return MindwaveColumnDecoder().columns()
+        return dict((name, np.concatenate([part[name] for part in self._columnParts]))
+                    for name in self._columnParts[0])
+
+
+def _columnNumber(name):
+    for column, (columnName, dataRowCode, valueLength) in enumerate(COLUMNS):
+        if (name in (columnName, columnName + "Timestamps")):
+            return column
+
+
+def decodeCaptures(capturePaths, processes=None, regionLength=DEFAULT_REGION_LENGTH):
+    # Decodes capture files written by RecordingByteSource into columns (see
+    # MindwaveColumnDecoder), with the recorded arrival times as timestamps.
+    # The streams are split into regions of regionLength bytes decoded by a
+    # pool of processes (processes=1 decodes in this process). The result is
+    # the same as decoding each stream sequentially, see _CaptureStitcher.
+    # Returns one dict of columns per capture.
+    captures = [MindwaveCapture(capturePath) for capturePath in capturePaths]
+    try:
+        regions = []
+        for captureNumber, capture in enumerate(captures):
+            for regionStart in range(0, capture.streamLength, regionLength):
+                regions.append((captureNumber, regionStart,
+                                min(regionStart + regionLength, capture.streamLength)))
+        regionArguments = [(captures[captureNumber].capturePath,
+                            captures[captureNumber].recordsBetween(regionStart, regionEnd + MAXIMUM_PACKET_LENGTH),
+                            regionStart, regionEnd)
+                           for captureNumber, regionStart, regionEnd in regions]
+        if (processes == 1):
+            regionResults = [_decodeRegion(*arguments) for arguments in regionArguments]
+        else:
+            with concurrent.futures.ProcessPoolExecutor(processes) as executor:
+                futures = [executor.submit(_decodeRegion, *arguments) for arguments in regionArguments]
+                regionResults = [future.result() for future in futures]
+        stitchers = [_CaptureStitcher(capture, [regionEnd for captureNumber, regionStart, regionEnd
+                                                in regions if captureNumber == number])
+                     for number, capture in enumerate(captures)]
+        regionNumbers = [0] * len(captures)
+        for (captureNumber, regionStart, regionEnd), regionResult in zip(regions, regionResults):
+            stitchers[captureNumber].addRegion(regionNumbers[captureNumber], regionResult)
+            regionNumbers[captureNumber] += 1
+        return [stitcher.columns() for stitcher in stitchers]
+    finally:
+        for capture in captures:
+            capture.close()
+
+
+def decodeCapture(capturePath, processes=None, regionLength=DEFAULT_REGION_LENGTH):
+    return decodeCaptures([capturePath], processes, regionLength)[0]
+
+
+def writeColumns(columns, path):
+    # one .npz file with an array per column
+    np.savez(path, **columns)
@@ -0,0 +1,252 @@
+import array
+import collections
+import os
+import zlib
+import numpy as np
+
+from .MindwaveDataPoints import RawDataPoint, PoorSignalLevelDataPoint,\
+    AttentionDataPoint, MeditationDataPoint, BlinkDataPoint, EEGPowersDataPoint, SAMPLING_RATE
+
+# type, values per row and array typecode of the columns, named like the
+# columns of MindwaveCaptureDecoder
+COLUMN_TYPES = collections.OrderedDict([
+    ("raw", (np.dtype("<i2"), 1, "h")),
+    ("poorSignal", (np.dtype("u1"), 1, "B")),
+    ("attention", (np.dtype("u1"), 1, "B")),
+    ("meditation", (np.dtype("u1"), 1, "B")),
+    ("blink", (np.dtype("u1"), 1, "B")),
+    ("eegPowers", (np.dtype("<u4"), 8, "I")),
+])
+TIMESTAMP_TYPE = np.dtype("<f8")
+# rows per second expected of the columns other than raw: about one per
+# second, blinks a few more
+OTHER_ROWS_PER_SECOND = 8
+# one entry per chunk, the sparse time index of a column
+CHUNK_INDEX_TYPE = np.dtype([("firstTimestamp", "<f8"), ("lastTimestamp", "<f8"),
+                             ("firstRow", "<i8"), ("rows", "<i8"), ("compressed", "u1")])
+INDEX_FILE_NAME = "index"
+# 128 seconds of raw values
+DEFAULT_CHUNK_ROWS = 65536
+
+MindwaveColumnRows = collections.namedtuple("MindwaveColumnRows", ["values", "timestamps"])
+
+
+def _chunkPath(directory, name, chunkNumber, compressed, part):
+    return os.path.join(directory, name, "{:08d}.{}{}".format(
+        chunkNumber, part, ".z" if compressed else ""))
+
+
+def _readChunkIndex(directory, name):
+    indexPath = os.path.join(directory, name, INDEX_FILE_NAME)
+    if (not os.path.exists(indexPath)):
+        return np.zeros(0, dtype=CHUNK_INDEX_TYPE)
+    return np.fromfile(indexPath, dtype=CHUNK_INDEX_TYPE)
+
+
+def _deltaEncode(values):
+    # differences of the bit patterns as unsigned integers, reversible for
+    # any values and small for slowly changing values and timestamps
+    integers = values.view("<u{}".format(values.dtype.itemsize))
+    deltas = integers.copy()
+    deltas[1:] -= integers[:-1]
+    return zlib.compress(deltas.tobytes())
+
+
+def _deltaDecode(compressedBytes, dtype, valuesPerRow):
+    integerType = np.dtype("<u{}".format(dtype.itemsize))
+    deltas = np.frombuffer(zlib.decompress(compressedBytes), dtype=integerType)
+    if (valuesPerRow > 1):
+        deltas = deltas.reshape(-1, valuesPerRow)
+    return np.cumsum(deltas, axis=0, dtype=integerType).view(dtype)
+
+
+class MindwaveColumnStoreWriter:
+    # Appends data points to a directory with one column per data point type.
+    # Rows are buffered and written in chunks of chunkRows raw values, as plain
+    # little endian files that can be memory-mapped, or with compress=True
+    # delta encoded and zlib compressed. Every chunk gets an entry with its
+    # first and last timestamp in the column's index, written after the
+    # chunk, so a store stays readable if writing is interrupted.
+    # Chunks of the other columns hold OTHER_ROWS_PER_SECOND rows for every
+    # second of a raw chunk, and are written at the latest once their rows
+    # span as many seconds as a raw chunk, so slow columns reach the disk too.
+    # Opening an existing store appends to it. Timestamps of a column must
+    # not decrease, like the arrival times of the readers.
+    def __init__(self, directory, chunkRows=DEFAULT_CHUNK_ROWS, compress=False):
+        self._directory = directory
+        self._chunkRows = chunkRows
+        self._chunkSeconds = chunkRows / SAMPLING_RATE
+        self._chunkRowsOfColumn = {name: chunkRows if name == "raw"
+                                   else max(1, chunkRows * OTHER_ROWS_PER_SECOND // SAMPLING_RATE)
+                                   for name in COLUMN_TYPES}
+        self._compress = compress
+        self._values = {}
+        self._timestamps = {}
+        self._chunkCounts = {}
+        self._writtenRows = {}
+        for name, (dtype, valuesPerRow, typecode) in COLUMN_TYPES.items():
+            os.makedirs(os.path.join(directory, name), exist_ok=True)
+            chunkIndex = _readChunkIndex(directory, name)
+            self._chunkCounts[name] = len(chunkIndex)
+            self._writtenRows[name] = int(chunkIndex["rows"].sum())
+            self._values[name] = array.array(typecode)
+            self._timestamps[name] = array.array("d")
+        self._rawValues = self._values["raw"]
+        self._rawTimestamps = self._timestamps["raw"]
+        self._columnOfDataPointClass = {
+            PoorSignalLevelDataPoint: ("poorSignal", "amountOfNoise"),
+            AttentionDataPoint: ("attention", "attentionValue"),
+            MeditationDataPoint: ("meditation", "meditationValue"),
+            BlinkDataPoint: ("blink", "blinkValue"),
+        }
+
+    def appendDataPoint(self, dataPoint, timestamp):
+        # returns False for data points without column, e.g. UnknownDataPoint
+        dataPointClass = dataPoint.__class__
+        if (dataPointClass is RawDataPoint):
+            self._rawValues.append(dataPoint.rawValue)
+            self._rawTimestamps.append(timestamp)
+            if (len(self._rawTimestamps) >= self._chunkRows):
+                self._writeFullChunks("raw")
+            return True
+        if (dataPointClass is EEGPowersDataPoint):
+            self._values["eegPowers"].extend((
+                dataPoint.delta, dataPoint.theta, dataPoint.lowAlpha, dataPoint.highAlpha,
+                dataPoint.lowBeta, dataPoint.highBeta, dataPoint.lowGamma, dataPoint.midGamma))
+            name = "eegPowers"
+        elif (dataPointClass in self._columnOfDataPointClass):
+            name, attributeName = self._columnOfDataPointClass[dataPointClass]
+            self._values[name].append(getattr(dataPoint, attributeName))
+        else:
+            return False
+        timestamps = self._timestamps[name]
+        timestamps.append(timestamp)
+        if (len(timestamps) >= self._chunkRowsOfColumn[name] or timestamp - timestamps[0] >= self._chunkSeconds):
+            self._writeFullChunks(name)
+        return True
+
+    def appendRawBatch(self, rawBatch):
+        # a MindwaveRawBatch, stored with its arrival timestamps
+        self.appendColumns({"raw": rawBatch.samples, "rawTimestamps": rawBatch.timestamps})
+
+    def appendColumns(self, columns):
+        # columns like the ones of MindwaveCaptureDecoder, name and nameTimestamps
+        for name, (dtype, valuesPerRow, typecode) in COLUMN_TYPES.items():
+            if (name not in columns):
+                continue
+            values = np.asarray(columns[name])
+            self._values[name].frombytes(values.astype(self._values[name].typecode, copy=False).tobytes())
+            self._timestamps[name].frombytes(
+                np.asarray(columns[name + "Timestamps"], dtype=np.float64).tobytes())
+            self._writeFullChunks(name)
+
+    def flush(self):
+        # writes the buffered rows as chunks, possibly shorter than chunkRows
+        for name in COLUMN_TYPES:
+            self._writeFullChunks(name)
+            if (len(self._timestamps[name]) > 0):
+                self._writeChunk(name, len(self._timestamps[name]))
+
+    def close(self):
+        self.flush()
+
+    def _writeFullChunks(self, name):
+        # also writes the buffered rows if they span a raw chunk's seconds
+        chunkRows = self._chunkRowsOfColumn[name]
+        timestamps = self._timestamps[name]
+        while (len(timestamps) >= chunkRows):
+            self._writeChunk(name, chunkRows)
+        if (len(timestamps) > 0 and timestamps[-1] - timestamps[0] >= self._chunkSeconds):
+            self._writeChunk(name, len(timestamps))
+
+    def _writeChunk(self, name, rows):
+        dtype, valuesPerRow, typecode = COLUMN_TYPES[name]
+        values = np.frombuffer(self._values[name], dtype=typecode, count=rows * valuesPerRow).astype(dtype)
+        if (valuesPerRow > 1):
+            values = values.reshape(rows, valuesPerRow)
+        timestamps = np.frombuffer(self._timestamps[name], dtype=np.float64, count=rows).astype(TIMESTAMP_TYPE)
+        chunkNumber = self._chunkCounts[name]
+        valuesPath = _chunkPath(self._directory, name, chunkNumber, self._compress, "values")
+        timestampsPath = _chunkPath(self._directory, name, chunkNumber, self._compress, "timestamps")
+        if (self._compress):
+            with open(valuesPath, "wb") as valuesFile:
+                valuesFile.write(_deltaEncode(values))
+            with open(timestampsPath, "wb") as timestampsFile:
+                timestampsFile.write(_deltaEncode(timestamps))
+        else:
+            values.tofile(valuesPath)
+            timestamps.tofile(timestampsPath)
+        indexEntry = np.array([(timestamps[0], timestamps[-1], self._writtenRows[name], rows, self._compress)],
+                              dtype=CHUNK_INDEX_TYPE)
+        with open(os.path.join(self._directory, name, INDEX_FILE_NAME), "ab") as indexFile:
+            indexEntry.tofile(indexFile)
+        del self._values[name][:rows * valuesPerRow]
+        del self._timestamps[name][:rows]
+        self._chunkCounts[name] += 1
+        self._writtenRows[name] += rows
+
+
+class MindwaveColumnStoreReader:
+    # Reads a store written by MindwaveColumnStoreWriter. Time range queries
+    # find the chunks in the sparse index and memory-map only those, within a
+    # chunk the rows are found by binary search over its timestamps. Rows of
+    # a single uncompressed chunk are returned as views onto the mapped files.
+    # refresh() picks up chunks written since opening.
+    def __init__(self, directory):
+        self._directory = directory
+        self._chunkIndices = {}
+        self.refresh()
+
+    def refresh(self):
+        for name in COLUMN_TYPES:
+            self._chunkIndices[name] = _readChunkIndex(self._directory, name)
+
+    def rowCount(self, name):
+        return int(self._chunkIndices[name]["rows"].sum())
+
+    def timeRange(self, name):
+        # first and last timestamp of the column, None if it is empty
+        chunkIndex = self._chunkIndices[name]
+        if (len(chunkIndex) == 0):
+            return None
+        return float(chunkIndex["firstTimestamp"][0]), float(chunkIndex["lastTimestamp"][-1])
+
+    def read(self, name, startTime=None, endTime=None):
+        # rows with startTime <= timestamp < endTime as MindwaveColumnRows
+        chunkIndex = self._chunkIndices[name]
+        firstChunk = 0
+        endChunk = len(chunkIndex)
+        if (startTime is not None):
+            firstChunk = int(np.searchsorted(chunkIndex["lastTimestamp"], startTime, side="left"))
+        if (endTime is not None):
+            endChunk = int(np.searchsorted(chunkIndex["firstTimestamp"], endTime, side="left"))
+        parts = []
+        for chunkNumber in range(firstChunk, endChunk):
+            values, timestamps = self._readChunk(name, chunkNumber)
+            startRow = 0 if startTime is None else np.searchsorted(timestamps, startTime, side="left")
+            endRow = len(timestamps) if endTime is None else np.searchsorted(timestamps, endTime, side="left")
+            parts.append(MindwaveColumnRows(values[startRow:endRow], timestamps[startRow:endRow]))
+        if (len(parts) == 1):
+            return parts[0]
+        if (len(parts) == 0):
+            dtype, valuesPerRow, typecode = COLUMN_TYPES[name]
+            shape = (0, valuesPerRow) if valuesPerRow > 1 else (0,)
+            return MindwaveColumnRows(np.zeros(shape, dtype=dtype), np.zeros(0, dtype=TIMESTAMP_TYPE))
+        return MindwaveColumnRows(np.concatenate([part.values for part in parts]),
+                                  np.concatenate([part.timestamps for part in parts]))
+
+    def _readChunk(self, name, chunkNumber):
+        dtype, valuesPerRow, typecode = COLUMN_TYPES[name]
+        rows = int(self._chunkIndices[name]["rows"][chunkNumber])
+        compressed = bool(self._chunkIndices[name]["compressed"][chunkNumber])
+        valuesPath = _chunkPath(self._directory, name, chunkNumber, compressed, "values")
+        timestampsPath = _chunkPath(self._directory, name, chunkNumber, compressed, "timestamps")
+        if (compressed):
+            with open(valuesPath, "rb") as valuesFile:
+                values = _deltaDecode(valuesFile.read(), dtype, valuesPerRow)
+            with open(timestampsPath, "rb") as timestampsFile:
+                timestamps = _deltaDecode(timestampsFile.read(), TIMESTAMP_TYPE, 1)
+            return values, timestamps
+        shape = (rows, valuesPerRow) if valuesPerRow > 1 else (rows,)
+        return (np.memmap(valuesPath, dtype=dtype, mode="r", shape=shape),
+                np.memmap(timestampsPath, dtype=TIMESTAMP_TYPE, mode="r", shape=(rows,)))
@@ -1,13 +1,30 @@
 from .MindwaveMobileRawReader import MindwaveMobileRawReader
-import struct
-import collections
+import time
 
-from .MindwavePacketPayloadParser import MindwavePacketPayloadParser
+from .MindwaveByteSources import DEFAULT_ADDRESS_CACHE_PATH, DEFAULT_RECEIVE_TIMEOUT
+
+from .MindwaveAcquisitionThread import MindwaveAcquisitionThread, DROP_OLDEST
+from .MindwaveDecimator import MindwaveDecimator
+from .MindwaveStreamDecoder import MindwaveStreamDecoder
 
 class MindwaveDataPointReader:
-    def __init__(self, address=None):
-        self._mindwaveMobileRawReader = MindwaveMobileRawReader(address=address)
-        self._dataPointQueue = collections.deque()
+    def __init__(self, address=None, byteSource=None, maximumScanLength=None, metrics=None,
+                 reconnect=None, receiveTimeout=DEFAULT_RECEIVE_TIMEOUT,
+                 addressCachePath=DEFAULT_ADDRESS_CACHE_PATH):
+        # maximumScanLength bounds the bytes searched for packets per chunk,
+        # see MindwavePacketFramer. metrics is an optional MindwaveMetrics
+        # instance, which makes all stages count and measure themselves.
+        # For reconnect, receiveTimeout and addressCachePath see
+        # MindwaveMobileRawReader; a reconnect keeps all decoded data and
+        # the samples missed meanwhile are counted in lostSamples().
+        self._streamDecoder = MindwaveStreamDecoder(maximumScanLength, metrics)
+        self._mindwaveMobileRawReader = MindwaveMobileRawReader(
+            address=address, byteSource=byteSource, metrics=metrics, reconnect=reconnect,
+            receiveTimeout=receiveTimeout, addressCachePath=addressCachePath,
+            onReconnect=self._streamDecoder.discardUnframedBytes)
+        self._metrics = metrics
+        self._acquisitionThread = None
+        self._isDispatching = False
 
     def start(self):
         self._mindwaveMobileRawReader.connectToMindWaveMobile()
@@ -15,68 +32,139 @@ class MindwaveDataPointReader:
     def isConnected(self):
         return self._mindwaveMobileRawReader.isConnected()
 
+    def startAcquisitionThread(self, maximumQueueLength=100000, overflowPolicy=DROP_OLDEST):
+        # Reads the socket continuously in a background thread, so slow consumers
+        # do not let the bluetooth buffers overflow. When more than
+        # maximumQueueLength data points are waiting, overflowPolicy decides:
+        # DROP_OLDEST, DROP_NEWEST or BLOCK the reading thread.
+        if (self._acquisitionThread is not None):
+            raise RuntimeError("the acquisition thread was started already")
+        self._acquisitionThread = MindwaveAcquisitionThread(
+            self._readDataPointsFromNextChunk, maximumQueueLength, overflowPolicy)
+        if (self._metrics is not None):
+            acquisitionThread = self._acquisitionThread
+            self._metrics.registerCounters(
+                lambda: {"droppedDataPoints": acquisitionThread.droppedDataPoints})
+            self._metrics.registerGauge("queuedDataPoints", acquisitionThread.queueLength)
+        self._acquisitionThread.start()
+
+    def stopAcquisitionThread(self, timeout=1.0):
+        # Raises a RuntimeError if the thread is still waiting for bytes after
+        # timeout seconds, it then keeps running. Data points it queued are
+        # returned by the next readNextDataPoint calls. Does nothing if the
+        # thread was not started.
+        if (self._acquisitionThread is None):
+            return
+        if (not self._acquisitionThread.stop(timeout)):
+            raise RuntimeError("the acquisition thread did not stop within {} seconds".format(timeout))
+        self._streamDecoder.putBackDataPoints(self._acquisitionThread.takeQueuedDataPoints())
+        self._acquisitionThread = None
+
+    def framingStatistics(self):
+        # counts of framed packets, checksum failures, invalid payload lengths,
+        # resyncs and discarded bytes
+        return self._streamDecoder.framingStatistics()
+
+    def lastArrivalTime(self):
+        # time.monotonic() when the packet of the data point last returned by
+        # readNextDataPoint arrived (not available with the acquisition thread)
+        return self._streamDecoder.lastDataPointArrivalTime()
+
+    def reconnects(self):
+        return self._mindwaveMobileRawReader.reconnects
+
+    def lostSamples(self):
+        # raw samples missing in the raw batches read so far, see MindwaveSampleClock
+        return self._streamDecoder.lostSamples()
+
+    def droppedDataPoints(self):
+        if (self._acquisitionThread is None):
+            return 0
+        return self._acquisitionThread.droppedDataPoints
+
     def readNextDataPoint(self):
-        if (not self._moreDataPointsInQueue()):
-            self._putNextDataPointsInQueue()
-        return self._getDataPointFromQueue()
-
-    def _moreDataPointsInQueue(self):
-        return len(self._dataPointQueue) > 0
-    
-    def _getDataPointFromQueue(self):
-        return self._dataPointQueue.pop();
-    
-    def _putNextDataPointsInQueue(self):
-        dataPoints = self._readDataPointsFromOnePacket()
-        self._dataPointQueue.extend(dataPoints)
-    
-    def _readDataPointsFromOnePacket(self):
-        self._goToStartOfNextPacket()
-        payloadBytes, checkSum = self._readOnePacket()
-        if (not self._checkSumIsOk(payloadBytes, checkSum)):
-            print("checksum of packet was not correct, discarding packet...")
-            return self._readDataPointsFromOnePacket();
-        else:
-            dataPoints = self._readDataPointsFromPayload(payloadBytes)
+        if (self._acquisitionThread is not None):
+            return self._acquisitionThread.readNextDataPoint()
+        dataPoint = self._streamDecoder.readNextDataPoint()
+        while (dataPoint is None):
+            self._readNextChunk()
+            dataPoint = self._streamDecoder.readNextDataPoint()
+        return dataPoint
+
+    def readDataPoints(self, maximumAmount):
+        # waits for at least one data point and returns up to maximumAmount
+        if (self._acquisitionThread is not None):
+            return self._acquisitionThread.readDataPoints(maximumAmount)
+        dataPoints = [self.readNextDataPoint()]
+        dataPoints.extend(self._streamDecoder.readAvailableDataPoints(maximumAmount - 1))
+        return dataPoints
+
+    def subscribe(self, callback, dataPointTypes):
+        # callback(dataPoint) is called by dispatchDataPoints for data points
+        # of dataPointTypes, data point classes or data row codes. Rows no one
+        # subscribed to are skipped without being decoded.
+        self._streamDecoder.subscribe(callback, dataPointTypes)
+
+    def unsubscribe(self, callback):
+        self._streamDecoder.unsubscribe(callback)
+
+    def dispatchDataPoints(self):
+        # Calls the subscribers as soon as each chunk arrived, until the end
+        # of the byte stream or until a callback calls stopDispatching.
+        if (self._acquisitionThread is not None):
+            raise RuntimeError("data points can not be dispatched while the acquisition thread runs")
+        self._isDispatching = True
+        self._streamDecoder.dispatchDataPoints()
+        while (self._isDispatching):
+            try:
+                self._readNextChunk()
+            except EOFError:
+                return
+            self._streamDecoder.dispatchDataPoints()
+
+    def stopDispatching(self):
+        self._isDispatching = False
+
+    def readRawBatch(self, amountOfSamples):
+        # Returns the next amountOfSamples raw values as a MindwaveRawBatch of
+        # int16 samples, packet arrival timestamps (time.monotonic()), the poor
+        # signal level at each sample and the reconstructed sample times.
+        # Other data rows of the consumed packets are skipped.
+        if (self._acquisitionThread is not None):
+            raise RuntimeError("raw batches can not be read while the acquisition thread runs")
+        rawBatch = self._streamDecoder.readRawBatch(amountOfSamples)
+        while (rawBatch is None):
+            self._readNextChunk()
+            rawBatch = self._streamDecoder.readRawBatch(amountOfSamples)
+        return rawBatch
+
+    def iterRawBatches(self, amountOfSamples=512, decimationFactor=1, dropPartialBatch=False):
+        # Stops at the end of the byte stream, e.g. of a replayed capture,
+        # after a last shorter batch of the remaining raw values unless
+        # dropPartialBatch. With a decimationFactor the batches are filtered
+        # and decimated, see MindwaveDecimator, each from
+        # amountOfSamples * decimationFactor raw values.
+        decimator = None
+        if (decimationFactor > 1):
+            decimator = MindwaveDecimator(decimationFactor)
+        isEnded = False
+        while (not isEnded):
+            try:
+                rawBatch = self.readRawBatch(amountOfSamples * decimationFactor)
+            except EOFError:
+                isEnded = True
+                rawBatch = None if dropPartialBatch else self._streamDecoder.readRemainingRawBatch()
+                if (rawBatch is None):
+                    return
+            if (decimator is not None):
+                rawBatch = decimator.decimateBatch(rawBatch)
+            yield rawBatch
+
+    def _readDataPointsFromNextChunk(self):
+        self._readNextChunk()
+        return self._streamDecoder.readAvailableDataPoints()
+
+    def _readNextChunk(self):
+        chunk = self._mindwaveMobileRawReader.getAvailableBytesView()
+        self._streamDecoder.feedBytes(chunk, time.monotonic())
         self._mindwaveMobileRawReader.clearAlreadyReadBuffer()
-        return dataPoints;
-        
-    def _goToStartOfNextPacket(self):
-        while(True):
-            byte = self._mindwaveMobileRawReader.getByte()
-            if (byte == MindwaveMobileRawReader.START_OF_PACKET_BYTE):  # need two of these bytes at the start..
-                byte = self._mindwaveMobileRawReader.getByte()
-                if (byte == MindwaveMobileRawReader.START_OF_PACKET_BYTE):
-                    # now at the start of the packet..
-                    return;
-
-    def _readOnePacket(self):
-            payloadLength = self._readPayloadLength();
-            payloadBytes, checkSum = self._readPacket(payloadLength);
-            return payloadBytes, checkSum
-    
-    def _readPayloadLength(self):
-        payloadLength = self._mindwaveMobileRawReader.getByte()
-        return payloadLength
-
-    def _readPacket(self, payloadLength):
-        payloadBytes = self._mindwaveMobileRawReader.getBytes(payloadLength)
-        checkSum = self._mindwaveMobileRawReader.getByte()
-        return payloadBytes, checkSum
-
-    def _checkSumIsOk(self, payloadBytes, checkSum):
-        sumOfPayload = sum(payloadBytes)
-        lastEightBits = sumOfPayload % 256
-        invertedLastEightBits = self._computeOnesComplement(lastEightBits) #1's complement!
-        return invertedLastEightBits == checkSum;
-    
-    def _computeOnesComplement(self, lastEightBits):
-        return ~lastEightBits + 256
-        
-    def _readDataPointsFromPayload(self, payloadBytes):
-        payloadParser = MindwavePacketPayloadParser(payloadBytes)
-        return payloadParser.parseDataPoints();
-    
-    
-    
-    
@@ -1,21 +1,30 @@
-   
+# raw values per second
+SAMPLING_RATE = 512
+
+
 class DataPoint:
+    # Data points use __slots__ and keep only their decoded values, not the
+    # value bytes, since there are 512 raw values per second per headset.
+    __slots__ = ()
+
     def __init__(self, dataValueBytes):
-        self._dataValueBytes = dataValueBytes
+        pass
 
 class UnknownDataPoint(DataPoint):
+    __slots__ = ("unknownPoint",)
+
     def __init__(self, dataValueBytes):
-        DataPoint.__init__(self, dataValueBytes)
-        self.unknownPoint = self._dataValueBytes[0]
+        self.unknownPoint = dataValueBytes[0]
 
     def __str__(self):
         retMsgString = "Unknown OpCode. Value: {}".format(self.unknownPoint)
         return retMsgString
 
 class PoorSignalLevelDataPoint(DataPoint):
+    __slots__ = ("amountOfNoise",)
+
     def __init__(self, dataValueBytes):
-        DataPoint.__init__(self, dataValueBytes)
-        self.amountOfNoise = self._dataValueBytes[0];
+        self.amountOfNoise = dataValueBytes[0];
 
     def headSetHasContactToSkin(self):
         return self.amountOfNoise < 200;
@@ -27,73 +36,69 @@ class PoorSignalLevelDataPoint(DataPoint):
         return poorSignalLevelString
 
 class AttentionDataPoint(DataPoint):
+    __slots__ = ("attentionValue",)
+
     def __init__(self, _dataValueBytes):
-        DataPoint.__init__(self, _dataValueBytes)
-        self.attentionValue = self._dataValueBytes[0] 
+        self.attentionValue = _dataValueBytes[0] 
 
     def __str__(self):
         return "Attention Level: " + str(self.attentionValue)
 
 class MeditationDataPoint(DataPoint):
+    __slots__ = ("meditationValue",)
+
     def __init__(self, _dataValueBytes):
-        DataPoint.__init__(self, _dataValueBytes)
-        self.meditationValue = self._dataValueBytes[0]
+        self.meditationValue = _dataValueBytes[0]
 
     def __str__(self):
         return "Meditation Level: " + str(self.meditationValue)
 
 class BlinkDataPoint(DataPoint):
+    __slots__ = ("blinkValue",)
+
     def __init__(self, _dataValueBytes):
-        DataPoint.__init__(self, _dataValueBytes)
-        self.blinkValue = self._dataValueBytes[0]
+        self.blinkValue = _dataValueBytes[0]
 
     def __str__(self):
         return "Blink Level: " + str(self.blinkValue)
 
 class RawDataPoint(DataPoint):
+    __slots__ = ("rawValue",)
+
     def __init__(self, dataValueBytes):
-        DataPoint.__init__(self, dataValueBytes)
-        self.rawValue = self._readRawValue()
-
-    def _readRawValue(self):
-        firstByte = self._dataValueBytes[0]
-        secondByte = self._dataValueBytes[1]
-        # TODO(check if this is correct iwth soem more tests..
-        # and see http://stackoverflow.com/questions/5994307/bitwise-operations-in-python
-        rawValue = firstByte * 256 + secondByte;
+        # big endian 16 bit two's complement
+        rawValue = (dataValueBytes[0] << 8) | dataValueBytes[1]
         if rawValue >= 32768:
             rawValue -= 65536
-        return rawValue # hope this is correct ;)
+        self.rawValue = rawValue
 
     def __str__(self):
         return "Raw Value: " + str(self.rawValue)
 
 class EEGPowersDataPoint(DataPoint):
+    __slots__ = ("delta", "theta", "lowAlpha", "highAlpha",
+                 "lowBeta", "highBeta", "lowGamma", "midGamma")
+
     def __init__(self, dataValueBytes):
-        DataPoint.__init__(self, dataValueBytes)
-        self._rememberEEGValues();
+        self._rememberEEGValues(dataValueBytes);
         
-    def _rememberEEGValues(self):
-        self.delta = self._convertToBigEndianInteger(self._dataValueBytes[0:3]);
-        self.theta = self._convertToBigEndianInteger(self._dataValueBytes[3:6]);
-        self.lowAlpha = self._convertToBigEndianInteger(self._dataValueBytes[6:9]);
-        self.highAlpha = self._convertToBigEndianInteger(self._dataValueBytes[9:12]);
-        self.lowBeta = self._convertToBigEndianInteger(self._dataValueBytes[12:15]);
-        self.highBeta = self._convertToBigEndianInteger(self._dataValueBytes[15:18]);
-        self.lowGamma = self._convertToBigEndianInteger(self._dataValueBytes[18:21]);
-        self.midGamma = self._convertToBigEndianInteger(self._dataValueBytes[21:24]);
-
-
-    def _convertToBigEndianInteger(self, threeBytes):
-        # TODO(check if this is correct iwth soem more tests..
-        # and see http://stackoverflow.com/questions/5994307/bitwise-operations-in-python
-        # only use first 16 bits of second number, not rest inc ase number is negative, otherwise
-        # python would take all 1s before this bit...
-        # same with first number, only take first 8 bits...
-        bigEndianInteger = (threeBytes[0] << 16) |\
-         (((1 << 16) - 1) & (threeBytes[1] << 8)) |\
-          ((1 << 8) - 1) & threeBytes[2]
-        return bigEndianInteger
+    def _rememberEEGValues(self, dataValueBytes):
+        # eight big endian 24 bit unsigned integers, converted in one go
+        eegValues = int.from_bytes(dataValueBytes, "big")
+        self.midGamma = eegValues & 0xffffff
+        eegValues >>= 24
+        self.lowGamma = eegValues & 0xffffff
+        eegValues >>= 24
+        self.highBeta = eegValues & 0xffffff
+        eegValues >>= 24
+        self.lowBeta = eegValues & 0xffffff
+        eegValues >>= 24
+        self.highAlpha = eegValues & 0xffffff
+        eegValues >>= 24
+        self.lowAlpha = eegValues & 0xffffff
+        eegValues >>= 24
+        self.theta = eegValues & 0xffffff
+        self.delta = eegValues >> 24
         
     def __str__(self):
         return """EEG Powers:
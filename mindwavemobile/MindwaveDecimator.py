@@ -0,0 +1,67 @@
+import math
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from .MindwaveDataPoints import SAMPLING_RATE
+from .MindwaveRawBatchDecoder import MindwaveRawBatch
+
+
+def designAntiAliasFilter(factor, samplingRate=SAMPLING_RATE, passbandFrequency=None, attenuation=80):
+    # Kaiser windowed sinc lowpass for decimation by factor. Frequencies up to
+    # passbandFrequency (by default 80% of the new Nyquist frequency) pass,
+    # everything that would alias into them is attenuated by attenuation dB.
+    newSamplingRate = samplingRate / factor
+    if (passbandFrequency is None):
+        passbandFrequency = 0.4 * newSamplingRate
+    stopbandFrequency = newSamplingRate - passbandFrequency
+    cutoffFrequency = (passbandFrequency + stopbandFrequency) / 2
+    transitionWidth = 2 * math.pi * (stopbandFrequency - passbandFrequency) / samplingRate
+    numberOfTaps = int(math.ceil((attenuation - 7.95) / (2.285 * transitionWidth))) + 1
+    # odd, so the delay is a whole number of samples
+    numberOfTaps += 1 - numberOfTaps % 2
+    beta = 0.1102 * (attenuation - 8.7) if attenuation > 50 else \
+        0.5842 * (attenuation - 21) ** 0.4 + 0.07886 * (attenuation - 21)
+    relativeCutoff = 2 * cutoffFrequency / samplingRate
+    sampleOffsets = np.arange(numberOfTaps) - (numberOfTaps - 1) / 2
+    taps = relativeCutoff * np.sinc(relativeCutoff * sampleOffsets) * np.kaiser(numberOfTaps, beta)
+    return taps / np.sum(taps)
+
+
+class MindwaveDecimator:
+    # Streaming anti-alias filter and decimation of raw values by factor, e.g.
+    # 4 for 128 Hz. Polyphase: the FIR filter is only evaluated for the
+    # samples that are kept, one matrix product per block. The last
+    # len(taps) - 1 values are kept between blocks, so blocks of any length
+    # give the same result as one long block.
+    # The filter is causal, every factor-th raw value produces one decimated
+    # value, which is delayed by len(taps) // 2 raw samples.
+    def __init__(self, factor=4, samplingRate=SAMPLING_RATE, passbandFrequency=None, attenuation=80):
+        self.factor = factor
+        self.samplingRate = samplingRate / factor
+        self.taps = designAntiAliasFilter(factor, samplingRate, passbandFrequency, attenuation)
+        self.delay = (len(self.taps) - 1) // 2
+        self._samplePeriod = 1.0 / samplingRate
+        self._reversedTaps = self.taps[::-1].copy()
+        self._history = np.zeros(len(self.taps) - 1)
+        # index of the next kept raw value in the next block
+        self._phase = 0
+
+    def decimate(self, samples):
+        # one value per kept raw value of samples as float64
+        buffer = np.concatenate((self._history, np.asarray(samples, dtype=np.float64)))
+        windows = sliding_window_view(buffer, len(self.taps))[self._phase::self.factor]
+        decimatedSamples = windows @ self._reversedTaps
+        self._history = buffer[len(buffer) - len(self._history):]
+        self._phase = (self._phase - len(samples)) % self.factor
+        return decimatedSamples
+
+    def decimateBatch(self, rawBatch):
+        # MindwaveRawBatch at the lower sampling rate: int16 samples, the arrival
+        # time and poor signal level of the kept raw values and their sample
+        # times moved back by the delay of the filter
+        phase = self._phase
+        decimatedSamples = self.decimate(rawBatch.samples)
+        samples = np.clip(np.rint(decimatedSamples), -32768, 32767).astype(np.int16)
+        return MindwaveRawBatch(samples, rawBatch.timestamps[phase::self.factor],
+                                rawBatch.poorSignalLevels[phase::self.factor],
+                                rawBatch.sampleTimes[phase::self.factor] - self.delay * self._samplePeriod)
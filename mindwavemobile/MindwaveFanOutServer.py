@@ -0,0 +1,399 @@
+import array
+import collections
+import logging
+import os
+import selectors
+import socket
+import struct
+import threading
+import time
+import numpy as np
+
+from .MindwaveByteSources import SocketByteSource
+from .MindwaveCaptureDecoder import decodePayloadColumns
+from .MindwaveColumnStore import COLUMN_TYPES
+from .MindwaveMobileRawReader import MindwaveMobileRawReader
+from .MindwavePacketFramer import MindwavePacketFramer
+from .MindwaveRawBatchDecoder import MindwaveRawBatch, NO_CONTACT_POOR_SIGNAL_LEVEL
+from .MindwaveSampleClock import MindwaveSampleClock
+
+DEFAULT_PORT = 9102
+# the first byte a client sends chooses what it receives
+FORMAT_RAW = b"r"
+FORMAT_BATCHES = b"b"
+# about four minutes of the raw byte stream
+DEFAULT_MAXIMUM_QUEUED_BYTES = 1024 * 1024
+# message length, arrival time and row counts of the columns, followed by
+# the values of each column in the types of MindwaveColumnStore
+BATCH_HEADER = struct.Struct("<Id{}H".format(len(COLUMN_TYPES)))
+
+logger = logging.getLogger(__name__)
+
+
+def encodeBatch(columns, arrivalTime):
+    # columns of MindwaveColumnDecoder, all rows arrived with one chunk
+    rowCounts = [len(columns[name]) for name in COLUMN_TYPES]
+    body = b"".join(np.ascontiguousarray(columns[name], dtype=dtype).tobytes()
+                    for name, (dtype, valuesPerRow, typecode) in COLUMN_TYPES.items())
+    return BATCH_HEADER.pack(BATCH_HEADER.size + len(body), arrivalTime, *rowCounts) + body
+
+
+def decodeBatch(message):
+    # columns like the ones of MindwaveColumnDecoder, with name + "Timestamps"
+    messageLength, arrivalTime, *rowCounts = BATCH_HEADER.unpack_from(message)
+    columns = {}
+    offset = BATCH_HEADER.size
+    for (name, (dtype, valuesPerRow, typecode)), rowCount in zip(COLUMN_TYPES.items(), rowCounts):
+        values = np.frombuffer(message, dtype=dtype, count=rowCount * valuesPerRow, offset=offset)
+        columns[name] = values.reshape(rowCount, valuesPerRow) if valuesPerRow > 1 else values
+        columns[name + "Timestamps"] = np.full(rowCount, arrivalTime)
+        offset += values.nbytes
+    return columns
+
+
+class MindwaveFanOutClient:
+    def __init__(self, clientSocket, address):
+        self.socket = clientSocket
+        self.address = address
+        self.format = None
+        self.messages = collections.deque()
+        self.queuedBytes = 0
+        # messages taken from the queue and being sent
+        self.sendBuffer = b""
+        self.sentBytesOfSendBuffer = 0
+        self.isWriting = False
+        self.sentBytes = 0
+        self.droppedBytes = 0
+
+
+class MindwaveFanOutServer:
+    # Owns the connection to one headset and broadcasts it to any number of
+    # local clients over TCP (by default on 127.0.0.1) or, with
+    # family=socket.AF_UNIX and a path as listenAddress, a UNIX socket.
+    # Clients choose by their first byte: FORMAT_RAW for the ThinkGear byte
+    # stream as received, e.g. for a MindwaveDataPointReader with a
+    # MindwaveFanOutByteSource, or FORMAT_BATCHES for the decoded columns of
+    # every received chunk, see MindwaveFanOutBatchReader.
+    # One thread reads the headset, another one serves the clients with a
+    # selector. Every client has its own queue; when more than
+    # maximumQueuedBytes are waiting for a client its oldest messages are
+    # dropped, so a slow client never stalls the others or the headset.
+    # When the headset stream ends the clients are closed after receiving
+    # everything queued for them.
+    def __init__(self, address=None, byteSource=None, listenAddress=("127.0.0.1", DEFAULT_PORT),
+                 family=socket.AF_INET, maximumQueuedBytes=DEFAULT_MAXIMUM_QUEUED_BYTES, metrics=None):
+        self._mindwaveMobileRawReader = MindwaveMobileRawReader(address=address, byteSource=byteSource,
+                                                                metrics=metrics)
+        self._listenAddress = listenAddress
+        self._family = family
+        self._maximumQueuedBytes = maximumQueuedBytes
+        self._packetFramer = MindwavePacketFramer()
+        self._unframedBytes = b""
+        self._selector = selectors.DefaultSelector()
+        self._listenSocket = None
+        self._wakeUpSocket, self._wakeUpReceiveSocket = socket.socketpair()
+        self._wakeUpSocket.setblocking(False)
+        self._wakeUpReceiveSocket.setblocking(False)
+        self._lock = threading.Lock()
+        self._clients = []
+        self._headsetThread = None
+        self._servingThread = None
+        self._headsetEnded = False
+        self._isStopped = False
+        self.droppedBytes = 0
+        if (metrics is not None):
+            metrics.registerCounters(lambda: {"fanOutDroppedBytes": self.droppedBytes})
+            metrics.registerGauge("fanOutClients", self.clientCount)
+
+    def start(self):
+        # returns False if the headset could not be connected
+        self._mindwaveMobileRawReader.connectToMindWaveMobile()
+        if (not self._mindwaveMobileRawReader.isConnected()):
+            return False
+        try:
+            self._listen()
+        except OSError:
+            self._mindwaveMobileRawReader.close()
+            raise
+        self._servingThread = threading.Thread(target=self._serve, name="MindwaveFanOutServer",
+                                               daemon=True)
+        self._headsetThread = threading.Thread(target=self._readHeadset, name="MindwaveFanOutHeadset",
+                                               daemon=True)
+        self._servingThread.start()
+        self._headsetThread.start()
+        return True
+
+    def listenAddress(self):
+        # e.g. the port chosen for port 0
+        return self._listenSocket.getsockname()
+
+    def clientCount(self):
+        # clients which chose their format
+        return sum(client.format is not None for client in self._clients)
+
+    def waitUntilHeadsetEnded(self, timeout=None):
+        self._headsetThread.join(timeout)
+
+    def stop(self, timeout=1.0):
+        # also after a failed start(), stopping again does nothing
+        if (self._isStopped):
+            return
+        self._isStopped = True
+        self._wakeUp()
+        if (self._headsetThread is not None):
+            self._servingThread.join(timeout)
+            self._mindwaveMobileRawReader.close()
+            self._headsetThread.join(timeout)
+        for client in list(self._clients):
+            self._removeClient(client)
+        self._selector.close()
+        if (self._listenSocket is not None):
+            self._listenSocket.close()
+            if (self._family == getattr(socket, "AF_UNIX", None) and os.path.exists(self._listenAddress)):
+                os.unlink(self._listenAddress)
+        self._wakeUpSocket.close()
+        self._wakeUpReceiveSocket.close()
+
+    def _listen(self):
+        if (self._family == getattr(socket, "AF_UNIX", None) and os.path.exists(self._listenAddress)):
+            # left over by a server that was not stopped
+            os.unlink(self._listenAddress)
+        self._listenSocket = socket.socket(self._family, socket.SOCK_STREAM)
+        if (self._family != getattr(socket, "AF_UNIX", None)):
+            self._listenSocket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._listenSocket.bind(self._listenAddress)
+        self._listenSocket.listen()
+        self._listenSocket.setblocking(False)
+        self._selector.register(self._listenSocket, selectors.EVENT_READ)
+        self._selector.register(self._wakeUpReceiveSocket, selectors.EVENT_READ)
+
+    def _wakeUp(self):
+        try:
+            self._wakeUpSocket.send(b"\0")
+        except OSError:
+            # the serving thread has not even read the last wake ups,
+            # or was stopped
+            pass
+
+    # headset thread
+
+    def _readHeadset(self):
+        try:
+            while (not self._isStopped):
+                chunk = self._mindwaveMobileRawReader.getAvailableBytes()
+                self._mindwaveMobileRawReader.clearAlreadyReadBuffer()
+                self._broadcast(chunk, time.monotonic())
+        except (EOFError, OSError) as error:
+            if (not self._isStopped):
+                logger.info("Mindwave Mobile stream ended: %s", error)
+        finally:
+            self._headsetEnded = True
+            self._wakeUp()
+
+    def _broadcast(self, chunk, arrivalTime):
+        batch = None
+        if (any(client.format == FORMAT_BATCHES for client in self._clients)):
+            batch = self._decodeBatch(chunk, arrivalTime)
+        else:
+            # nothing is framed without batch clients, framing restarts
+            # with the first chunk one receives
+            self._unframedBytes = b""
+        with self._lock:
+            for client in self._clients:
+                if (client.format == FORMAT_RAW):
+                    self._queueMessage(client, chunk)
+                elif (client.format == FORMAT_BATCHES and batch is not None):
+                    self._queueMessage(client, batch)
+        self._wakeUp()
+
+    def _decodeBatch(self, chunk, arrivalTime):
+        # None if the chunk did not complete any packet
+        payloads, unframedBytes = self._packetFramer.framePackets(self._unframedBytes + chunk)
+        self._unframedBytes = bytes(unframedBytes)
+        if (len(payloads) == 0):
+            return None
+        return encodeBatch(decodePayloadColumns(payloads, arrivalTime), arrivalTime)
+
+    def _queueMessage(self, client, message):
+        client.messages.append(message)
+        client.queuedBytes += len(message)
+        while (client.queuedBytes > self._maximumQueuedBytes):
+            droppedMessage = client.messages.popleft()
+            client.queuedBytes -= len(droppedMessage)
+            client.droppedBytes += len(droppedMessage)
+            self.droppedBytes += len(droppedMessage)
+
+    # serving thread
+
+    def _serve(self):
+        while (not self._isStopped):
+            for key, events in self._selector.select():
+                if (key.fileobj is self._listenSocket):
+                    self._acceptClient()
+                elif (key.fileobj is self._wakeUpReceiveSocket):
+                    self._drainWakeUps()
+                else:
+                    client = key.data
+                    if (events & selectors.EVENT_READ):
+                        self._readFromClient(client)
+                    if (events & selectors.EVENT_WRITE and client in self._clients):
+                        self._writeToClient(client)
+            self._updateWritingClients()
+
+    def _acceptClient(self):
+        try:
+            clientSocket, address = self._listenSocket.accept()
+        except BlockingIOError:
+            return
+        clientSocket.setblocking(False)
+        client = MindwaveFanOutClient(clientSocket, address)
+        with self._lock:
+            self._clients.append(client)
+        self._selector.register(clientSocket, selectors.EVENT_READ, client)
+
+    def _drainWakeUps(self):
+        try:
+            while (self._wakeUpReceiveSocket.recv(4096)):
+                pass
+        except BlockingIOError:
+            pass
+
+    def _readFromClient(self, client):
+        try:
+            receivedBytes = client.socket.recv(1)
+        except BlockingIOError:
+            return
+        except OSError:
+            receivedBytes = b""
+        if (len(receivedBytes) == 0):
+            self._removeClient(client)
+        elif (client.format is None):
+            if (receivedBytes not in (FORMAT_RAW, FORMAT_BATCHES)):
+                logger.warning("Client %s asked for unknown format %r", client.address, receivedBytes)
+                self._removeClient(client)
+                return
+            client.format = receivedBytes
+
+    def _writeToClient(self, client):
+        if (client.sentBytesOfSendBuffer == len(client.sendBuffer)):
+            with self._lock:
+                client.sendBuffer = b"".join(client.messages)
+                client.messages.clear()
+                client.queuedBytes = 0
+            client.sentBytesOfSendBuffer = 0
+        try:
+            sentAmount = client.socket.send(memoryview(client.sendBuffer)[client.sentBytesOfSendBuffer:])
+        except BlockingIOError:
+            return
+        except OSError:
+            self._removeClient(client)
+            return
+        client.sentBytesOfSendBuffer += sentAmount
+        client.sentBytes += sentAmount
+
+    def _updateWritingClients(self):
+        for client in list(self._clients):
+            hasPendingBytes = (len(client.messages) > 0 or
+                               client.sentBytesOfSendBuffer < len(client.sendBuffer))
+            if (self._headsetEnded and not hasPendingBytes):
+                self._removeClient(client)
+            elif (hasPendingBytes != client.isWriting):
+                events = selectors.EVENT_READ | (selectors.EVENT_WRITE if hasPendingBytes else 0)
+                self._selector.modify(client.socket, events, client)
+                client.isWriting = hasPendingBytes
+
+    def _removeClient(self, client):
+        with self._lock:
+            if (client not in self._clients):
+                return
+            self._clients.remove(client)
+        self._selector.unregister(client.socket)
+        client.socket.close()
+
+
+class MindwaveFanOutByteSource(SocketByteSource):
+    # Receives the raw byte stream of a MindwaveFanOutServer, so a
+    # MindwaveDataPointReader(byteSource=MindwaveFanOutByteSource()) reads
+    # the shared headset like its own.
+    def __init__(self, address=("127.0.0.1", DEFAULT_PORT), family=socket.AF_INET, timeout=None):
+        SocketByteSource.__init__(self, address, family, timeout)
+
+    def connect(self):
+        SocketByteSource.connect(self)
+        try:
+            self.socket.sendall(FORMAT_RAW)
+        except OSError:
+            self.socket.close()
+            raise
+
+
+class MindwaveFanOutBatchReader:
+    # Receives the decoded batches of a MindwaveFanOutServer, the server
+    # frames and parses the stream once for all of these clients.
+    # readRawBatch works like the one of MindwaveDataPointReader, except that
+    # a poor signal level applies from the next received chunk on.
+    def __init__(self, address=("127.0.0.1", DEFAULT_PORT), family=socket.AF_INET):
+        self._address = address
+        self._family = family
+        self._socket = None
+        self._socketFile = None
+        self._rawValues = array.array("h")
+        self._timestamps = array.array("d")
+        self._poorSignalLevels = bytearray()
+        self._poorSignalLevel = NO_CONTACT_POOR_SIGNAL_LEVEL
+        self._lastArrivalTime = None
+        self.sampleClock = MindwaveSampleClock()
+
+    def start(self):
+        self._socket = socket.socket(self._family, socket.SOCK_STREAM)
+        self._socket.connect(self._address)
+        self._socket.sendall(FORMAT_BATCHES)
+        self._socketFile = self._socket.makefile("rb")
+
+    def close(self):
+        self._socketFile.close()
+        self._socket.close()
+
+    def lastArrivalTime(self):
+        # time.monotonic() when the last read chunk arrived at the server
+        return self._lastArrivalTime
+
+    def lostSamples(self):
+        return self.sampleClock.lostSamples
+
+    def readColumns(self):
+        # the columns of the next received chunk, EOFError when the server closed
+        header = self._socketFile.read(BATCH_HEADER.size)
+        if (len(header) < BATCH_HEADER.size):
+            raise EOFError("Mindwave fan-out server closed the connection")
+        messageLength = BATCH_HEADER.unpack_from(header)[0]
+        body = self._socketFile.read(messageLength - BATCH_HEADER.size)
+        if (len(body) < messageLength - BATCH_HEADER.size):
+            raise EOFError("Mindwave fan-out server closed the connection")
+        self._lastArrivalTime = BATCH_HEADER.unpack_from(header)[1]
+        return decodeBatch(header + body)
+
+    def readRawBatch(self, amountOfSamples):
+        while (len(self._timestamps) < amountOfSamples):
+            columns = self.readColumns()
+            samples = columns["raw"]
+            self._rawValues.frombytes(samples.astype(np.int16).tobytes())
+            self._timestamps.frombytes(columns["rawTimestamps"].tobytes())
+            self._poorSignalLevels.extend(bytes([self._poorSignalLevel]) * len(samples))
+            if (len(columns["poorSignal"]) > 0):
+                self._poorSignalLevel = int(columns["poorSignal"][-1])
+        samples = np.frombuffer(self._rawValues, dtype=np.int16, count=amountOfSamples).copy()
+        timestamps = np.frombuffer(self._timestamps, dtype=np.float64, count=amountOfSamples).copy()
+        poorSignalLevels = np.frombuffer(self._poorSignalLevels, dtype=np.uint8, count=amountOfSamples).copy()
+        del self._rawValues[:amountOfSamples]
+        del self._timestamps[:amountOfSamples]
+        del self._poorSignalLevels[:amountOfSamples]
+        return MindwaveRawBatch(samples, timestamps, poorSignalLevels, self.sampleClock.sampleTimes(timestamps))
+
+    def iterRawBatches(self, amountOfSamples=512):
+        # stops when the server closed the connection
+        while (True):
+            try:
+                yield self.readRawBatch(amountOfSamples)
+            except EOFError:
+                return
@@ -0,0 +1,340 @@
+import heapq
+import itertools
+import logging
+import os
+import random
+import selectors
+import shutil
+import socket
+import tempfile
+import threading
+import time
+
+from .MindwaveByteSources import ConnectedSocketByteSource
+from .MindwaveDataPoints import SAMPLING_RATE
+from .MindwaveStreamGenerator import MindwaveStreamGenerator
+
+# bluetooth delivers the stream in bursts of about this many samples
+DEFAULT_BURST_SAMPLES = 16
+# whole seconds of generated stream all headsets loop over
+LOOP_SECONDS = 8
+# bytes kept for a client that does not read, about 15 seconds, beyond
+# them the oldest are dropped like when a bluetooth buffer overflows
+DEFAULT_MAXIMUM_PENDING_BYTES = 65536
+
+logger = logging.getLogger(__name__)
+
+
+class MindwaveStreamLoop:
+    # A stream of MindwaveStreamGenerator (raw values at 512 Hz, poor signal,
+    # EEG powers, attention and meditation once per second) and the stream
+    # position of every sample's packets, served over and over.
+    def __init__(self, seconds=LOOP_SECONDS, seed=0):
+        streamGenerator = MindwaveStreamGenerator(seed=seed)
+        packets = [streamGenerator.nextPacket() for _ in range(int(seconds) * SAMPLING_RATE)]
+        self.amountOfSamples = len(packets)
+        self.sampleStarts = [0] + list(itertools.accumulate(len(packet) for packet in packets))
+        self.stream = b"".join(packets)
+
+    def bytesOf(self, firstSample, endSample):
+        # the packets of samples firstSample to endSample, counted from the loop's start
+        parts = []
+        while (firstSample < endSample):
+            start = firstSample % self.amountOfSamples
+            end = min(self.amountOfSamples, start + endSample - firstSample)
+            parts.append(self.stream[self.sampleStarts[start]:self.sampleStarts[end]])
+            firstSample += end - start
+        return b"".join(parts)
+
+
+class MindwaveEmulatedHeadset:
+    # State of one virtual headset of a MindwaveHeadsetEmulator. Like a real
+    # headset it keeps sending while no client is connected; those samples
+    # are lost.
+    def __init__(self, headsetNumber, streamLoop, randomGenerator, startTime, listenSocket=None,
+                 listenAddress=None):
+        self.headsetNumber = headsetNumber
+        self.listenSocket = listenSocket
+        self.listenAddress = listenAddress
+        self.clientSocket = None
+        self.pendingBytes = bytearray()
+        self._streamLoop = streamLoop
+        self._random = randomGenerator
+        self.startTime = startTime
+        # every headset starts somewhere else in the loop
+        self.firstSample = randomGenerator.randrange(streamLoop.amountOfSamples)
+        self.nextSample = 0
+        self.disconnectTime = None
+        self.isWaitingToSend = False
+        self.sentBytes = 0
+        self.sentSamples = 0
+        self.lostSamples = 0
+        self.droppedBytes = 0
+        self.corruptedPackets = 0
+        self.disconnects = 0
+
+    def nextBytes(self, endSample, corruptionProbability):
+        # the packets of the samples up to endSample, some of them corrupted
+        data = self._streamLoop.bytesOf(self.firstSample + self.nextSample, self.firstSample + endSample)
+        if (corruptionProbability > 0):
+            corruptions = sum(self._random.random() < corruptionProbability
+                              for _ in range(endSample - self.nextSample))
+            if (corruptions > 0):
+                data = self._corrupt(bytearray(data), corruptions)
+        self.sentSamples += endSample - self.nextSample
+        self.nextSample = endSample
+        return data
+
+    def _corrupt(self, data, corruptions):
+        # flipped bits, lost bytes and false sync bytes like MindwaveStreamGenerator
+        self.corruptedPackets += corruptions
+        for _ in range(corruptions):
+            position = self._random.randrange(len(data))
+            corruption = self._random.random()
+            if (corruption < 0.5):
+                data[position] ^= 1 << self._random.randrange(8)
+            elif (corruption < 0.8):
+                del data[position:position + self._random.randint(1, 8)]
+            else:
+                data.insert(position, 0xaa)
+        return bytes(data)
+
+    def jitter(self, maximumJitter):
+        return self._random.uniform(0, maximumJitter)
+
+    def secondsUntilDisconnect(self, meanSeconds):
+        return self._random.expovariate(1.0 / meanSeconds)
+
+    def skipSamples(self, endSample):
+        self.lostSamples += endSample - self.nextSample
+        self.nextSample = endSample
+
+
+class MindwaveHeadsetEmulator:
+    # Serves any number of virtual headsets from one thread, each streaming
+    # ThinkGear packets at the pace of a real one to one client at a time.
+    # With family AF_INET or AF_UNIX every headset listens on a socket of its
+    # own, see addresses(), which readers connect to like to a headset:
+    #   MindwaveDataPointReader(address=emulator.addresses()[0])
+    # connectSocketPair returns a byte source connected to a headset instead.
+    # Headsets send burstSamples samples at once, each burst up to
+    # burstJitter seconds late. Their clocks run clockDrift faster than
+    # 512 Hz (e.g. 0.001 for 512.5 Hz, negative for slower). Packets are
+    # corrupted with corruptionProbability, and with
+    # meanSecondsBetweenDisconnects connections are closed after
+    # exponentially distributed times, after which readers have to reconnect.
+    def __init__(self, amountOfHeadsets=1, family=socket.AF_INET, directory=None, seed=0,
+                 corruptionProbability=0.0, burstSamples=DEFAULT_BURST_SAMPLES, burstJitter=0.0,
+                 clockDrift=0.0, meanSecondsBetweenDisconnects=None,
+                 maximumPendingBytes=DEFAULT_MAXIMUM_PENDING_BYTES):
+        self._amountOfHeadsets = amountOfHeadsets
+        self._family = family
+        self._directory = directory
+        self._removeDirectory = False
+        self._seed = seed
+        self._corruptionProbability = corruptionProbability
+        self._burstSamples = burstSamples
+        self._burstJitter = burstJitter
+        self._samplingRate = SAMPLING_RATE * (1 + clockDrift)
+        self._meanSecondsBetweenDisconnects = meanSecondsBetweenDisconnects
+        self._maximumPendingBytes = maximumPendingBytes
+        self._headsets = []
+        # (time of the next burst, headset number)
+        self._burstTimes = []
+        self._selector = selectors.DefaultSelector()
+        self._wakeUpSocket, self._wakeUpReceiveSocket = socket.socketpair()
+        self._wakeUpSocket.setblocking(False)
+        self._wakeUpReceiveSocket.setblocking(False)
+        self._lock = threading.Lock()
+        self._servingThread = None
+        self._isStopped = False
+
+    def start(self):
+        streamLoop = MindwaveStreamLoop(seed=self._seed)
+        if (self._family == getattr(socket, "AF_UNIX", None) and self._directory is None):
+            self._directory = tempfile.mkdtemp(prefix="mindwave")
+            self._removeDirectory = True
+        startTime = time.monotonic()
+        for headsetNumber in range(self._amountOfHeadsets):
+            listenSocket, listenAddress = self._listen(headsetNumber)
+            headset = MindwaveEmulatedHeadset(headsetNumber, streamLoop,
+                                              random.Random(self._seed * 1000003 + headsetNumber),
+                                              startTime, listenSocket, listenAddress)
+            self._headsets.append(headset)
+            if (listenSocket is not None):
+                self._selector.register(listenSocket, selectors.EVENT_READ, headset)
+            heapq.heappush(self._burstTimes, (self._burstTime(headset), headsetNumber))
+        self._selector.register(self._wakeUpReceiveSocket, selectors.EVENT_READ)
+        self._servingThread = threading.Thread(target=self._serve, name="MindwaveHeadsetEmulator", daemon=True)
+        self._servingThread.start()
+
+    def _listen(self, headsetNumber):
+        if (self._family is None):
+            return None, None
+        listenSocket = socket.socket(self._family, socket.SOCK_STREAM)
+        if (self._family == getattr(socket, "AF_UNIX", None)):
+            listenAddress = os.path.join(self._directory, "headset{}".format(headsetNumber))
+            if (os.path.exists(listenAddress)):
+                os.unlink(listenAddress)
+        else:
+            listenAddress = ("127.0.0.1", 0)
+        listenSocket.bind(listenAddress)
+        listenSocket.listen()
+        listenSocket.setblocking(False)
+        return listenSocket, listenSocket.getsockname()
+
+    def addresses(self):
+        # reader addresses of the headsets, see MindwaveByteSources.createByteSource,
+        # none without family, then headsets are only reached by connectSocketPair
+        if (self._family is None):
+            return []
+        if (self._family == getattr(socket, "AF_UNIX", None)):
+            return ["unix:" + headset.listenAddress for headset in self._headsets]
+        return ["tcp:{}:{}".format(*headset.listenAddress[:2]) for headset in self._headsets]
+
+    def connectSocketPair(self, headsetNumber):
+        # a byte source for a socket pair connected to the headset, replacing
+        # its current client, after start()
+        clientSocket, emulatorSocket = socket.socketpair()
+        emulatorSocket.setblocking(False)
+        with self._lock:
+            self._connectClient(self._headsets[headsetNumber], emulatorSocket)
+        self._wakeUp()
+        return ConnectedSocketByteSource(clientSocket)
+
+    def statistics(self):
+        # totals over all headsets
+        with self._lock:
+            return {"connectedHeadsets": sum(headset.clientSocket is not None for headset in self._headsets),
+                    "sentBytes": sum(headset.sentBytes for headset in self._headsets),
+                    "sentSamples": sum(headset.sentSamples for headset in self._headsets),
+                    "lostSamples": sum(headset.lostSamples for headset in self._headsets),
+                    "droppedBytes": sum(headset.droppedBytes for headset in self._headsets),
+                    "corruptedPackets": sum(headset.corruptedPackets for headset in self._headsets),
+                    "disconnects": sum(headset.disconnects for headset in self._headsets)}
+
+    def stop(self, timeout=1.0):
+        self._isStopped = True
+        self._wakeUp()
+        self._servingThread.join(timeout)
+        for headset in self._headsets:
+            if (headset.clientSocket is not None):
+                headset.clientSocket.close()
+            if (headset.listenSocket is not None):
+                headset.listenSocket.close()
+        self._selector.close()
+        self._wakeUpSocket.close()
+        self._wakeUpReceiveSocket.close()
+        if (self._removeDirectory):
+            shutil.rmtree(self._directory, ignore_errors=True)
+
+    def _wakeUp(self):
+        try:
+            self._wakeUpSocket.send(b"\0")
+        except OSError:
+            pass
+
+    def _burstTime(self, headset):
+        # when the samples of the next burst are due, up to burstJitter later
+        burstTime = headset.startTime + (headset.nextSample + self._burstSamples) / self._samplingRate
+        if (self._burstJitter > 0):
+            burstTime += headset.jitter(self._burstJitter)
+        return burstTime
+
+    def _serve(self):
+        while (not self._isStopped):
+            timeout = max(0.0, self._burstTimes[0][0] - time.monotonic()) if self._burstTimes else None
+            for key, events in self._selector.select(timeout):
+                with self._lock:
+                    self._handleEvent(key, events)
+            now = time.monotonic()
+            with self._lock:
+                while (self._burstTimes and self._burstTimes[0][0] <= now):
+                    burstTime, headsetNumber = self._burstTimes[0]
+                    headset = self._headsets[headsetNumber]
+                    self._sendBurst(headset, now)
+                    heapq.heapreplace(self._burstTimes, (self._burstTime(headset), headsetNumber))
+
+    def _handleEvent(self, key, events):
+        if (key.fileobj is self._wakeUpReceiveSocket):
+            try:
+                while (self._wakeUpReceiveSocket.recv(4096)):
+                    pass
+            except BlockingIOError:
+                pass
+            return
+        headset = key.data
+        if (key.fileobj is headset.listenSocket):
+            try:
+                clientSocket, address = headset.listenSocket.accept()
+            except BlockingIOError:
+                return
+            clientSocket.setblocking(False)
+            self._connectClient(headset, clientSocket)
+            return
+        if (events & selectors.EVENT_READ):
+            # clients send nothing, readable means closed
+            try:
+                receivedBytes = headset.clientSocket.recv(4096)
+            except BlockingIOError:
+                receivedBytes = None
+            except OSError:
+                receivedBytes = b""
+            if (receivedBytes == b""):
+                self._disconnectClient(headset)
+                return
+        if (events & selectors.EVENT_WRITE):
+            self._sendPendingBytes(headset)
+
+    def _connectClient(self, headset, clientSocket):
+        # a headset serves one client, a new one replaces the last
+        if (headset.clientSocket is not None):
+            self._disconnectClient(headset)
+        headset.clientSocket = clientSocket
+        self._selector.register(clientSocket, selectors.EVENT_READ, headset)
+        if (self._meanSecondsBetweenDisconnects is not None):
+            headset.disconnectTime = time.monotonic() + \
+                headset.secondsUntilDisconnect(self._meanSecondsBetweenDisconnects)
+
+    def _disconnectClient(self, headset):
+        self._selector.unregister(headset.clientSocket)
+        headset.clientSocket.close()
+        headset.clientSocket = None
+        headset.isWaitingToSend = False
+        headset.droppedBytes += len(headset.pendingBytes)
+        headset.pendingBytes = bytearray()
+
+    def _sendBurst(self, headset, now):
+        endSample = int((now - headset.startTime) * self._samplingRate)
+        if (headset.clientSocket is None):
+            headset.skipSamples(endSample)
+            return
+        if (headset.disconnectTime is not None and now >= headset.disconnectTime):
+            headset.disconnects += 1
+            self._disconnectClient(headset)
+            headset.skipSamples(endSample)
+            return
+        wasPending = len(headset.pendingBytes) > 0
+        headset.pendingBytes += headset.nextBytes(endSample, self._corruptionProbability)
+        overflow = len(headset.pendingBytes) - self._maximumPendingBytes
+        if (overflow > 0):
+            del headset.pendingBytes[:overflow]
+            headset.droppedBytes += overflow
+        if (not wasPending):
+            self._sendPendingBytes(headset)
+
+    def _sendPendingBytes(self, headset):
+        try:
+            sentAmount = headset.clientSocket.send(headset.pendingBytes)
+        except BlockingIOError:
+            sentAmount = 0
+        except OSError:
+            self._disconnectClient(headset)
+            return
+        del headset.pendingBytes[:sentAmount]
+        headset.sentBytes += sentAmount
+        isWaitingToSend = len(headset.pendingBytes) > 0
+        if (isWaitingToSend != headset.isWaitingToSend):
+            headset.isWaitingToSend = isWaitingToSend
+            events = selectors.EVENT_READ | (selectors.EVENT_WRITE if isWaitingToSend else 0)
+            self._selector.modify(headset.clientSocket, events, headset)
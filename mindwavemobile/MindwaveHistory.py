@@ -0,0 +1,171 @@
+import math
+import numpy as np
+
+from .MindwaveColumnStore import COLUMN_TYPES, TIMESTAMP_TYPE, OTHER_ROWS_PER_SECOND, MindwaveColumnRows
+from .MindwaveDataPoints import RawDataPoint, PoorSignalLevelDataPoint,\
+    AttentionDataPoint, MeditationDataPoint, BlinkDataPoint, EEGPowersDataPoint, SAMPLING_RATE
+from .MindwaveRingBuffer import writeCircularRows
+
+# rows kept per second of retention
+RETAINED_ROWS_PER_SECOND = {name: SAMPLING_RATE if name == "raw" else OTHER_ROWS_PER_SECOND
+                            for name in COLUMN_TYPES}
+# column and attributes of the values per data point class
+COLUMN_OF_DATA_POINT_CLASS = {
+    RawDataPoint: ("raw", ("rawValue",)),
+    PoorSignalLevelDataPoint: ("poorSignal", ("amountOfNoise",)),
+    AttentionDataPoint: ("attention", ("attentionValue",)),
+    MeditationDataPoint: ("meditation", ("meditationValue",)),
+    BlinkDataPoint: ("blink", ("blinkValue",)),
+    EEGPowersDataPoint: ("eegPowers", ("delta", "theta", "lowAlpha", "highAlpha",
+                                       "lowBeta", "highBeta", "lowGamma", "midGamma")),
+}
+
+
+class _HistoryColumn:
+    # Values and timestamps in preallocated circular arrays. Rows are
+    # numbered from 0 in the order they were appended. Rows about to be
+    # overwritten are announced in reservedRows before, and counted in
+    # writtenRows after they were written, so readers in other threads can
+    # tell whether rows changed while they copied them.
+    def __init__(self, dtype, valuesPerRow, capacity):
+        shape = (capacity, valuesPerRow) if valuesPerRow > 1 else (capacity,)
+        self.values = np.zeros(shape, dtype=dtype)
+        self.timestamps = np.zeros(capacity, dtype=TIMESTAMP_TYPE)
+        self.capacity = capacity
+        self.writtenRows = 0
+        self.reservedRows = 0
+
+    def appendRow(self, value, timestamp):
+        position = self.writtenRows % self.capacity
+        self.reservedRows = self.writtenRows + 1
+        self.values[position] = value
+        self.timestamps[position] = timestamp
+        self.writtenRows = self.reservedRows
+
+    def append(self, values, timestamps):
+        # at most the last capacity rows are kept
+        amountOfRows = len(timestamps)
+        self.reservedRows = self.writtenRows + amountOfRows
+        writeCircularRows(((self.values, values), (self.timestamps, timestamps)), self.writtenRows, amountOfRows)
+        self.writtenRows = self.reservedRows
+
+    def oldestRow(self):
+        return max(0, self.reservedRows - self.capacity)
+
+    def findRow(self, timestamp, firstRow, endRow):
+        # first row from firstRow to endRow with a timestamp >= timestamp,
+        # by binary search in the one or two parts of the circular array
+        start = firstRow % self.capacity
+        firstPart = self.timestamps[start:min(self.capacity, start + endRow - firstRow)]
+        foundRow = int(np.searchsorted(firstPart, timestamp, side="left"))
+        if (foundRow < len(firstPart)):
+            return firstRow + foundRow
+        secondPart = self.timestamps[:endRow - firstRow - len(firstPart)]
+        return firstRow + len(firstPart) + int(np.searchsorted(secondPart, timestamp, side="left"))
+
+    def rows(self, startTime, endTime):
+        # first row and MindwaveColumnRows with startTime <= timestamp < endTime,
+        # views unless the rows wrap around the end of the arrays
+        endRow = self.writtenRows
+        firstRow = self.oldestRow()
+        if (startTime is not None):
+            firstRow = self.findRow(startTime, firstRow, endRow)
+        if (endTime is not None):
+            endRow = self.findRow(endTime, firstRow, endRow)
+        start = firstRow % self.capacity
+        end = start + max(0, endRow - firstRow)
+        if (end <= self.capacity):
+            return firstRow, MindwaveColumnRows(self.values[start:end], self.timestamps[start:end])
+        end -= self.capacity
+        return firstRow, MindwaveColumnRows(np.concatenate((self.values[start:], self.values[:end])),
+                                            np.concatenate((self.timestamps[start:], self.timestamps[:end])))
+
+
+class MindwaveHistory:
+    # The data points of one headset during the last retentionSeconds, in
+    # one preallocated circular array per column of MindwaveColumnStore with
+    # the arrival timestamps. All memory is allocated up front, see
+    # memoryBytes(), and the oldest rows are overwritten when a column is
+    # full, so retention is exact at the expected rates of rowsPerSecond.
+    # Time ranges are found by binary search over the timestamps, which must
+    # not decrease per column. Columns are appended by one thread, e.g.
+    # while dispatching, and can be read by others: read returns views that
+    # later appends may overwrite, snapshot returns consistent copies.
+    def __init__(self, retentionSeconds=60, rowsPerSecond=None):
+        self.retentionSeconds = retentionSeconds
+        rowsPerSecond = dict(RETAINED_ROWS_PER_SECOND, **(rowsPerSecond or {}))
+        self._columns = {name: _HistoryColumn(dtype, valuesPerRow,
+                                              max(1, int(math.ceil(retentionSeconds * rowsPerSecond[name]))))
+                         for name, (dtype, valuesPerRow, typecode) in COLUMN_TYPES.items()}
+
+    def memoryBytes(self):
+        return sum(column.values.nbytes + column.timestamps.nbytes for column in self._columns.values())
+
+    def attachTo(self, mindwaveDataPointReader):
+        # appends the data points dispatched by the reader, see
+        # MindwaveDataPointReader.subscribe, at their arrival time
+        def appendDispatchedDataPoint(dataPoint):
+            self.appendDataPoint(dataPoint, mindwaveDataPointReader.lastArrivalTime())
+        mindwaveDataPointReader.subscribe(appendDispatchedDataPoint, list(COLUMN_OF_DATA_POINT_CLASS))
+        return appendDispatchedDataPoint
+
+    def appendDataPoint(self, dataPoint, timestamp):
+        # returns False for data points without column, e.g. UnknownDataPoint
+        columnOfDataPoint = COLUMN_OF_DATA_POINT_CLASS.get(dataPoint.__class__)
+        if (columnOfDataPoint is None):
+            return False
+        name, attributeNames = columnOfDataPoint
+        if (len(attributeNames) == 1):
+            value = getattr(dataPoint, attributeNames[0])
+        else:
+            value = [getattr(dataPoint, attributeName) for attributeName in attributeNames]
+        self._columns[name].appendRow(value, timestamp)
+        return True
+
+    def appendRawBatch(self, rawBatch):
+        # a MindwaveRawBatch, kept with its arrival timestamps
+        self._columns["raw"].append(rawBatch.samples, rawBatch.timestamps)
+
+    def appendColumns(self, columns):
+        # columns like the ones of MindwaveCaptureDecoder, name and nameTimestamps
+        for name, column in self._columns.items():
+            if (name in columns):
+                column.append(np.asarray(columns[name]), np.asarray(columns[name + "Timestamps"]))
+
+    def rowCount(self, name):
+        column = self._columns[name]
+        return column.writtenRows - column.oldestRow()
+
+    def timeRange(self, name):
+        # first and last retained timestamp of the column, None if it is empty
+        column = self._columns[name]
+        if (column.writtenRows == 0):
+            return None
+        return (float(column.timestamps[column.oldestRow() % column.capacity]),
+                float(column.timestamps[(column.writtenRows - 1) % column.capacity]))
+
+    def read(self, name, startTime=None, endTime=None):
+        # rows with startTime <= timestamp < endTime as MindwaveColumnRows
+        firstRow, rows = self._columns[name].rows(startTime, endTime)
+        return rows
+
+    def readLast(self, name, seconds):
+        # rows of the last seconds before the latest timestamp of the column
+        timeRange = self.timeRange(name)
+        if (timeRange is None):
+            return self.read(name)
+        return self.read(name, timeRange[1] - seconds)
+
+    def snapshot(self, startTime=None, endTime=None, names=None):
+        # copies of the rows of every column, each consistent even while
+        # another thread appends, retried if rows were overwritten meanwhile
+        snapshot = {}
+        for name in (names or self._columns):
+            column = self._columns[name]
+            while (True):
+                firstRow, rows = column.rows(startTime, endTime)
+                rows = MindwaveColumnRows(np.array(rows.values), np.array(rows.timestamps))
+                if (column.oldestRow() <= firstRow):
+                    break
+            snapshot[name] = rows
+        return snapshot
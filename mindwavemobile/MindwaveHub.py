@@ -0,0 +1,233 @@
+import collections
+import logging
+import selectors
+import time
+
+from .MindwaveByteSources import ConnectedSocketByteSource
+from .MindwaveMobileRawReader import MindwaveMobileRawReader
+from .MindwaveRingBuffer import MindwaveRingBuffer
+from .MindwaveStreamDecoder import MindwaveStreamDecoder
+
+MindwaveHubDataPoint = collections.namedtuple("MindwaveHubDataPoint",
+                                              ["address", "timestamp", "dataPoint"])
+
+logger = logging.getLogger(__name__)
+
+
+class MindwaveHubDevice:
+    def __init__(self, address, byteSource, dataPointQueue, metrics=None):
+        # byteSource reads from the connected socket of the device
+        self.address = address
+        self.byteSource = byteSource
+        self.socket = byteSource.socket
+        self.dataPointQueue = dataPointQueue
+        self.buffer = MindwaveRingBuffer()
+        self.streamDecoder = MindwaveStreamDecoder(metrics=metrics)
+        self.metrics = metrics
+        self.connectedSince = time.time()
+        self.receivedBytes = 0
+        self.receivedDataPoints = 0
+        self.droppedDataPoints = 0
+        if (metrics is not None):
+            metrics.registerCounters(lambda: {"receivedBytes": self.receivedBytes,
+                                              "receivedDataPoints": self.receivedDataPoints,
+                                              "droppedDataPoints": self.droppedDataPoints})
+
+
+class MindwaveHub:
+    # Reads many headsets in one thread by polling their sockets with a
+    # selector. Data points are tagged with the device address and the
+    # arrival time and put into one merged queue, or into one queue per
+    # device with mergeQueues=False, which readNextDataPoint reads in turn.
+    # Queues are bounded, when one is full the oldest data point is dropped.
+    # Data points of removed devices, e.g. after a disconnect, can still be
+    # read, a device added again with the same address continues its queue.
+    # With a MindwaveMetrics instance as metrics every device is measured
+    # in child metrics labeled with its address. The queued data points are
+    # a gauge of each device, or of the hub with merged queues.
+    def __init__(self, mergeQueues=True, maximumQueueLength=100000, metrics=None):
+        self._selector = selectors.DefaultSelector()
+        self._devices = {}
+        self._mergeQueues = mergeQueues
+        self._maximumQueueLength = maximumQueueLength
+        self._mergedQueue = collections.deque(maxlen=maximumQueueLength)
+        # with mergeQueues=False: the queue of every address, kept after
+        # the device was removed until it is empty, and the addresses with
+        # queued data points in the order readNextDataPoint visits them
+        self._queues = {}
+        self._readyAddresses = collections.deque()
+        self._readyAddressSet = set()
+        self._metrics = metrics
+        if (metrics is not None and mergeQueues):
+            metrics.registerGauge("queuedDataPoints", lambda: len(self._mergedQueue))
+
+    def connectDevice(self, address=None, maximumAttempts=None):
+        # uses the blocking discovery and connection of MindwaveMobileRawReader,
+        # returns None if it failed, with maximumAttempts after that many
+        # connection attempts instead of retrying until one succeeds
+        mindwaveMobileRawReader = MindwaveMobileRawReader(address=address)
+        mindwaveMobileRawReader.connectToMindWaveMobile(maximumAttempts)
+        if (not mindwaveMobileRawReader.isConnected()):
+            return None
+        address = mindwaveMobileRawReader.getAddress()
+        byteSource = mindwaveMobileRawReader.getByteSource()
+        self.addDevice(address, byteSource.socket, byteSource)
+        return address
+
+    def addDevice(self, address, deviceSocket, byteSource=None):
+        # byteSource reads from deviceSocket, e.g. the BluetoothByteSource
+        # it belongs to, which also reads PyBluez sockets without recv_into
+        if (byteSource is None):
+            byteSource = ConnectedSocketByteSource(deviceSocket)
+        deviceSocket.setblocking(False)
+        if (self._mergeQueues):
+            dataPointQueue = self._mergedQueue
+        else:
+            dataPointQueue = self._queues.get(address)
+            if (dataPointQueue is None):
+                dataPointQueue = collections.deque(maxlen=self._maximumQueueLength)
+                self._queues[address] = dataPointQueue
+        deviceMetrics = None
+        if (self._metrics is not None):
+            deviceMetrics = self._metrics.withLabels(address=address)
+        device = MindwaveHubDevice(address, byteSource, dataPointQueue, deviceMetrics)
+        if (deviceMetrics is not None and not self._mergeQueues):
+            deviceMetrics.registerGauge("queuedDataPoints", lambda: len(dataPointQueue))
+        self._devices[address] = device
+        self._selector.register(deviceSocket, selectors.EVENT_READ, device)
+
+    def removeDevice(self, address):
+        device = self._devices.pop(address)
+        self._selector.unregister(device.socket)
+        device.byteSource.close()
+        if (device.metrics is not None):
+            self._metrics.removeChild(device.metrics)
+        self._forgetQueueIfDrained(address)
+
+    def close(self):
+        for address in self.addresses():
+            self.removeDevice(address)
+        self._selector.close()
+
+    def addresses(self):
+        return list(self._devices.keys())
+
+    def poll(self, timeout=None):
+        # reads everything that arrived and returns the number of new data points
+        newDataPoints = 0
+        for key, events in self._selector.select(timeout):
+            newDataPoints += self._readFromDevice(key.data)
+        return newDataPoints
+
+    def readNextDataPoint(self, timeout=None):
+        # returns None if no data point arrived within the timeout
+        if (self._mergeQueues):
+            return self._readNextDataPointFromQueue(self._mergedQueue, timeout)
+        return self._waitForDataPoint(self._readNextDataPointInTurn, timeout)
+
+    def readNextDataPointOf(self, address, timeout=None):
+        # only with mergeQueues=False; returns None if no data point arrived
+        # within the timeout, or if the device was removed (or never added)
+        # and its queue is empty
+        if (self._mergeQueues):
+            raise RuntimeError("data points of one device can only be read with mergeQueues=False")
+        dataPointQueue = self._queues.get(address)
+        if (address not in self._devices):
+            dataPoint = dataPointQueue.popleft() if dataPointQueue else None
+            self._forgetQueueIfDrained(address)
+            return dataPoint
+        return self._readNextDataPointFromQueue(dataPointQueue, timeout)
+
+    def _readNextDataPointFromQueue(self, dataPointQueue, timeout):
+        def popDataPoint():
+            return dataPointQueue.popleft() if len(dataPointQueue) > 0 else None
+        return self._waitForDataPoint(popDataPoint, timeout)
+
+    def _waitForDataPoint(self, popDataPoint, timeout):
+        # polls until popDataPoint returns a data point
+        deadline = None if timeout is None else time.monotonic() + timeout
+        dataPoint = popDataPoint()
+        while (dataPoint is None):
+            remainingTime = None if deadline is None else deadline - time.monotonic()
+            if (remainingTime is not None and remainingTime <= 0):
+                return None
+            if (len(self._devices) == 0):
+                return None
+            self.poll(remainingTime)
+            dataPoint = popDataPoint()
+        return dataPoint
+
+    def _readNextDataPointInTurn(self):
+        # one data point of the next address with queued data points
+        while (len(self._readyAddresses) > 0):
+            address = self._readyAddresses.popleft()
+            self._readyAddressSet.discard(address)
+            dataPointQueue = self._queues.get(address)
+            if (not dataPointQueue):
+                # emptied by readNextDataPointOf meanwhile
+                continue
+            dataPoint = dataPointQueue.popleft()
+            if (len(dataPointQueue) > 0):
+                self._markReady(address)
+            elif (address not in self._devices):
+                self._forgetQueueIfDrained(address)
+            return dataPoint
+        return None
+
+    def _markReady(self, address):
+        if (address not in self._readyAddressSet):
+            self._readyAddressSet.add(address)
+            self._readyAddresses.append(address)
+
+    def _forgetQueueIfDrained(self, address):
+        if (address not in self._devices and len(self._queues.get(address, ())) == 0):
+            self._queues.pop(address, None)
+
+    def throughput(self):
+        now = time.time()
+        throughput = {}
+        for address, device in self._devices.items():
+            duration = max(now - device.connectedSince, 1e-9)
+            throughput[address] = {
+                "receivedBytes": device.receivedBytes,
+                "receivedDataPoints": device.receivedDataPoints,
+                "droppedDataPoints": device.droppedDataPoints,
+                "bytesPerSecond": device.receivedBytes / duration,
+                "dataPointsPerSecond": device.receivedDataPoints / duration,
+            }
+        return throughput
+
+    def _readFromDevice(self, device):
+        try:
+            receivedAmount = device.buffer.fillFrom(device.byteSource)
+        except BlockingIOError:
+            return 0
+        except OSError as error:
+            logger.warning("Connection to %s lost: %s", device.address, error)
+            receivedAmount = 0
+        if (receivedAmount == 0):
+            logger.info("Mindwave Mobile %s disconnected", device.address)
+            if (self._metrics is not None):
+                self._metrics.increment("disconnects")
+            self.removeDevice(device.address)
+            return 0
+        arrivalTime = time.monotonic()
+        device.receivedBytes += receivedAmount
+        device.streamDecoder.feedBytes(device.buffer.getBytes(receivedAmount), arrivalTime)
+        device.buffer.release()
+        return self._queueDataPoints(device, arrivalTime)
+
+    def _queueDataPoints(self, device, arrivalTime):
+        dataPointQueue = device.dataPointQueue
+        newDataPoints = 0
+        dataPoint = device.streamDecoder.readNextDataPoint()
+        while (dataPoint is not None):
+            if (len(dataPointQueue) == dataPointQueue.maxlen):
+                device.droppedDataPoints += 1
+            dataPointQueue.append(MindwaveHubDataPoint(device.address, arrivalTime, dataPoint))
+            newDataPoints += 1
+            dataPoint = device.streamDecoder.readNextDataPoint()
+        device.receivedDataPoints += newDataPoints
+        if (newDataPoints > 0 and not self._mergeQueues):
+            self._markReady(device.address)
+        return newDataPoints
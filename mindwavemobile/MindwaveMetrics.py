@@ -0,0 +1,220 @@
+import bisect
+import http.server
+import os
+import re
+import threading
+import time
+
+# upper bounds of the histogram buckets
+LATENCY_BUCKETS = (0.00001, 0.00003, 0.0001, 0.0003, 0.001, 0.003,
+                   0.01, 0.03, 0.1, 0.3, 1.0, 3.0)
+SIZE_BUCKETS = (16, 64, 256, 1024, 4096, 16384, 65536)
+METRIC_PREFIX = "mindwave_"
+
+
+class MindwaveHistogram:
+    def __init__(self, bucketBounds=LATENCY_BUCKETS):
+        self.bucketBounds = bucketBounds
+        # the last bucket counts values above all bounds
+        self.bucketCounts = [0] * (len(bucketBounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.bucketCounts[bisect.bisect_left(self.bucketBounds, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, fraction):
+        # upper bound of the bucket containing the quantile, None if empty
+        # or above all bounds
+        if (self.count == 0):
+            return None
+        rank = fraction * self.count
+        cumulativeCount = 0
+        for bound, bucketCount in zip(self.bucketBounds, self.bucketCounts):
+            cumulativeCount += bucketCount
+            if (cumulativeCount >= rank):
+                return bound
+        return None
+
+    def snapshot(self):
+        cumulativeCounts = []
+        cumulativeCount = 0
+        for bucketCount in self.bucketCounts[:-1]:
+            cumulativeCount += bucketCount
+            cumulativeCounts.append(cumulativeCount)
+        return {"count": self.count, "sum": self.sum,
+                "buckets": list(zip(self.bucketBounds, cumulativeCounts))}
+
+
+class MindwaveMetrics:
+    # Opt-in counters, gauges and histograms of the reading pipeline. Readers
+    # and decoders take a metrics instance and only then install measuring
+    # versions of their stage methods, so without metrics nothing is measured
+    # and nothing is checked on the hot path.
+    # Counters of other objects (e.g. the framing statistics) are registered
+    # as functions and only called for a snapshot, as are gauges.
+    # withLabels creates child metrics, e.g. one per headset, which are
+    # included in the snapshot and the export of their parent.
+    # Reading threads update the metrics while e.g. the export thread of
+    # startPrometheusServer takes snapshots. A parent and its children share
+    # one lock, held by snapshots and by every change of the dicts and lists
+    # they iterate; updating a value that exists already does not need it.
+    def __init__(self, labels=None, lock=None):
+        self.labels = dict(labels) if labels is not None else {}
+        self.counters = {}
+        self.histograms = {}
+        self._counterFunctions = []
+        self._gaugeFunctions = {}
+        self._children = []
+        self._lock = lock if lock is not None else threading.Lock()
+
+    def withLabels(self, **labels):
+        allLabels = dict(self.labels)
+        allLabels.update(labels)
+        child = MindwaveMetrics(allLabels, self._lock)
+        with self._lock:
+            self._children.append(child)
+        return child
+
+    def removeChild(self, child):
+        with self._lock:
+            self._children.remove(child)
+
+    def increment(self, name, amount=1):
+        if (name in self.counters):
+            self.counters[name] += amount
+            return
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def observe(self, name, value, bucketBounds=LATENCY_BUCKETS):
+        histogram = self.histograms.get(name)
+        if (histogram is None):
+            histogram = self._addHistogram(name, bucketBounds)
+        histogram.observe(value)
+
+    def _addHistogram(self, name, bucketBounds):
+        with self._lock:
+            histogram = self.histograms.get(name)
+            if (histogram is None):
+                histogram = self.histograms[name] = MindwaveHistogram(bucketBounds)
+            return histogram
+
+    def timed(self, name, function):
+        # function measuring its duration in the histogram name
+        histogram = self._addHistogram(name, LATENCY_BUCKETS)
+        perfCounter = time.perf_counter
+        def timedFunction(*arguments):
+            startTime = perfCounter()
+            try:
+                return function(*arguments)
+            finally:
+                histogram.observe(perfCounter() - startTime)
+        return timedFunction
+
+    def registerCounters(self, counterFunction):
+        # counterFunction returns a dict of counter names and values
+        with self._lock:
+            self._counterFunctions.append(counterFunction)
+
+    def registerGauge(self, name, gaugeFunction):
+        with self._lock:
+            self._gaugeFunctions[name] = gaugeFunction
+
+    def snapshot(self):
+        with self._lock:
+            return self._snapshot()
+
+    def _snapshot(self):
+        counters = dict(self.counters)
+        for counterFunction in self._counterFunctions:
+            counters.update(counterFunction())
+        return {"labels": dict(self.labels),
+                "counters": counters,
+                "gauges": {name: gaugeFunction() for name, gaugeFunction in self._gaugeFunctions.items()},
+                "histograms": {name: histogram.snapshot() for name, histogram in self.histograms.items()},
+                "children": [child._snapshot() for child in self._children]}
+
+
+def _flattenSnapshots(snapshot):
+    snapshots = [snapshot]
+    for childSnapshot in snapshot["children"]:
+        snapshots.extend(_flattenSnapshots(childSnapshot))
+    return snapshots
+
+
+def _prometheusName(name):
+    return METRIC_PREFIX + re.sub(r"(?<=[a-z0-9])([A-Z])", r"_\1", name).lower()
+
+
+def _prometheusLabels(labels, extraLabels=()):
+    allLabels = list(labels.items()) + list(extraLabels)
+    if (len(allLabels) == 0):
+        return ""
+    return "{" + ",".join('{}="{}"'.format(key, str(value).replace("\\", "\\\\").replace('"', '\\"'))
+                          for key, value in allLabels) + "}"
+
+
+def prometheusText(metrics):
+    # Prometheus text exposition format of metrics and all its children,
+    # samples of one metric are grouped under one TYPE line
+    families = {}
+    for snapshot in _flattenSnapshots(metrics.snapshot()):
+        labels = snapshot["labels"]
+        for name, value in snapshot["counters"].items():
+            families.setdefault((_prometheusName(name) + "_total", "counter"), []).append(
+                "{}_total{} {}".format(_prometheusName(name), _prometheusLabels(labels), value))
+        for name, value in snapshot["gauges"].items():
+            families.setdefault((_prometheusName(name), "gauge"), []).append(
+                "{}{} {}".format(_prometheusName(name), _prometheusLabels(labels), value))
+        for name, histogram in snapshot["histograms"].items():
+            prometheusName = _prometheusName(name)
+            lines = families.setdefault((prometheusName, "histogram"), [])
+            for bound, cumulativeCount in histogram["buckets"]:
+                lines.append("{}_bucket{} {}".format(
+                    prometheusName, _prometheusLabels(labels, [("le", repr(float(bound)))]), cumulativeCount))
+            lines.append("{}_bucket{} {}".format(
+                prometheusName, _prometheusLabels(labels, [("le", "+Inf")]), histogram["count"]))
+            lines.append("{}_sum{} {}".format(prometheusName, _prometheusLabels(labels), histogram["sum"]))
+            lines.append("{}_count{} {}".format(prometheusName, _prometheusLabels(labels), histogram["count"]))
+    text = []
+    for (name, metricType), lines in families.items():
+        text.append("# TYPE {} {}".format(name, metricType))
+        text.extend(lines)
+    return "\n".join(text) + "\n"
+
+
+def writePrometheusFile(metrics, path):
+    # e.g. for the textfile collector of the node exporter, replaced
+    # atomically so it is never read half written
+    temporaryPath = path + ".tmp"
+    with open(temporaryPath, "w") as prometheusFile:
+        prometheusFile.write(prometheusText(metrics))
+    os.replace(temporaryPath, path)
+
+
+def startPrometheusServer(metrics, port=9101, host="127.0.0.1"):
+    # serves the metrics on http://host:port/metrics from a daemon thread,
+    # stop with server.shutdown()
+    class MetricsRequestHandler(http.server.BaseHTTPRequestHandler):
+        def do_GET(self):
+            if (self.path != "/metrics"):
+                self.send_error(404)
+                return
+            body = prometheusText(metrics).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *arguments):
+            pass
+
+    server = http.server.ThreadingHTTPServer((host, port), MetricsRequestHandler)
+    serverThread = threading.Thread(target=server.serve_forever, name="MindwaveMetricsServer",
+                                    daemon=True)
+    serverThread.start()
+    return server
@@ -1,106 +1,255 @@
-import bluetooth
-import time
+import logging
 import textwrap
+import threading
+
+from .MindwaveByteSources import createByteSource, findMindwaveMobileAddress,\
+    readCachedAddress, writeCachedAddress, DEFAULT_ADDRESS_CACHE_PATH, DEFAULT_RECEIVE_TIMEOUT
+from .MindwaveMetrics import SIZE_BUCKETS
+from .MindwaveRingBuffer import MindwaveRingBuffer
+
+logger = logging.getLogger(__name__)
 
 
 class MindwaveMobileRawReader:
     START_OF_PACKET_BYTE = 0xaa;
-    def __init__(self, address=None):
-        self._buffer = [];
-        self._bufferPosition = 0;
+    # cached addresses are tried this often before discovering again
+    CACHED_ADDRESS_ATTEMPTS = 3
+    # bounds of the adaptive amount of bytes asked for per receive
+    MINIMUM_READ_SIZE = 64
+    MAXIMUM_READ_SIZE = 65536
+    def __init__(self, address=None, byteSource=None, metrics=None, reconnect=None,
+                 reconnectDelay=0.5, maximumReconnectDelay=30.0,
+                 receiveTimeout=DEFAULT_RECEIVE_TIMEOUT, addressCachePath=DEFAULT_ADDRESS_CACHE_PATH,
+                 onReconnect=None):
+        # byteSource replaces the bluetooth connection, e.g. with a
+        # ReplayByteSource or a SocketByteSource, see MindwaveByteSources.py;
+        # addresses like "tcp:127.0.0.1:9000" connect to local stand-ins
+        # for the headset, see createByteSource
+        # With reconnect (by default only for bluetooth) an ended or failed
+        # connection, or receiveTimeout seconds without bytes from the
+        # headset, lead to a reconnect instead of an EOFError, after which
+        # onReconnect is called. Connecting is retried after reconnectDelay
+        # seconds, doubled up to maximumReconnectDelay for every failure.
+        # A discovered address is cached in addressCachePath (None disables
+        # the cache) and discovery is skipped while the cached one works.
+        # close() ends reading and reconnecting in other threads with an
+        # EOFError.
+        # room for the largest receives, wherever the ring buffer is at
+        self._buffer = MindwaveRingBuffer(2 * self.MAXIMUM_READ_SIZE);
         self._isConnected = False;
         self._mindwaveMobileAddress = address
-        
-    def connectToMindWaveMobile(self):
+        self._byteSource = byteSource
+        self._reconnect = reconnect if reconnect is not None else byteSource is None
+        self._reconnectDelay = reconnectDelay
+        self._maximumReconnectDelay = maximumReconnectDelay
+        self._receiveTimeout = receiveTimeout
+        self._addressCachePath = addressCachePath
+        self._onReconnect = onReconnect
+        self._isClosed = threading.Event()
+        # doubled when a receive filled it, halved when one used a quarter
+        # of it: a few packets at the headset's pace, large reads when
+        # bytes queued up, e.g. after a pause of the reading thread
+        self._readSize = 512
+        self.reconnects = 0
+        if (metrics is not None):
+            self._instrument(metrics)
+
+    def _instrument(self, metrics):
+        # see MindwaveMetrics
+        fillBuffer = metrics.timed("socketReadSeconds", self._fillBuffer)
+        def measuredFillBuffer():
+            receivedAmount = fillBuffer()
+            metrics.increment("receivedBytes", receivedAmount)
+            metrics.increment("receivedChunks")
+            metrics.observe("receiveSizeBytes", receivedAmount, SIZE_BUCKETS)
+            return receivedAmount
+        self._fillBuffer = measuredFillBuffer
+        metrics.registerGauge("bufferedBytes", self._buffer.availableBytes)
+        metrics.registerGauge("bufferCapacityBytes", self._buffer.capacity)
+        metrics.registerCounters(lambda: {"reconnects": self.reconnects})
+        metrics.registerGauge("readSizeBytes", lambda: self._readSize)
+
+    def connectToMindWaveMobile(self, maximumAttempts=None):
+        # with maximumAttempts connecting gives up after that many failed
+        # attempts and the reader stays unconnected, see isConnected
+        self._isClosed.clear()
+        if (self._byteSource is not None):
+            self._connectOrGiveUp(maximumAttempts)
+            return
         # First discover mindwave mobile address, then connect.
         # Headset address of my headset was'9C:B7:0D:72:CD:02';
         # not sure if it really can be different?
         # now discovering address because of https://github.com/robintibor/python-mindwave-mobile/issues/4
+        if (self._mindwaveMobileAddress is None and self._addressCachePath is not None):
+            cachedAddress = readCachedAddress(self._addressCachePath)
+            if (cachedAddress is not None and self._connectToCachedAddress(cachedAddress)):
+                return
         if (self._mindwaveMobileAddress is None):
             self._mindwaveMobileAddress = self._findMindwaveMobileAddress()
+            if (self._mindwaveMobileAddress is not None and self._addressCachePath is not None):
+                writeCachedAddress(self._mindwaveMobileAddress, self._addressCachePath)
         if (self._mindwaveMobileAddress is not None):            
-            print ("Discovered Mindwave Mobile...")
-            self._connectToAddress(self._mindwaveMobileAddress)
+            logger.info("Discovered Mindwave Mobile %s", self._mindwaveMobileAddress)
+            self._connectToAddress(self._mindwaveMobileAddress, maximumAttempts)
         else:
             self._printErrorDiscoveryMessage()
         
     def _findMindwaveMobileAddress(self):
-        nearby_devices = bluetooth.discover_devices(lookup_names = True)
-        for address, name in nearby_devices:
-            if (name == "MindWave Mobile"):
-                return address
-        return None
+        return findMindwaveMobileAddress()
+
+    def _createByteSource(self, mindwaveMobileAddress):
+        return createByteSource(mindwaveMobileAddress, timeout=self._receiveTimeout)
+
+    def _connectToCachedAddress(self, cachedAddress):
+        # False if the headset could not be reached, e.g. a different one is used now
+        self._mindwaveMobileAddress = cachedAddress
+        self._byteSource = self._createByteSource(cachedAddress)
+        try:
+            self._connectWithBackoff(self.CACHED_ADDRESS_ATTEMPTS)
+        except OSError as error:
+            logger.info("Cached address %s did not connect: %s", cachedAddress, error)
+            self._mindwaveMobileAddress = None
+            self._byteSource = None
+            return False
+        return True
         
-    def _connectToAddress(self, mindwaveMobileAddress):
-        self.mindwaveMobileSocket = bluetooth.BluetoothSocket(bluetooth.RFCOMM)
-        while (not self._isConnected):
+    def _connectToAddress(self, mindwaveMobileAddress, maximumAttempts=None):
+        self._byteSource = self._createByteSource(mindwaveMobileAddress)
+        self._connectOrGiveUp(maximumAttempts)
+
+    def _connectOrGiveUp(self, maximumAttempts):
+        try:
+            self._connectWithBackoff(maximumAttempts)
+        except OSError as error:
+            logger.warning("Could not connect to %s in %s attempts: %s",
+                           self._mindwaveMobileAddress, maximumAttempts, error)
+
+    def _connectWithBackoff(self, maximumAttempts=None):
+        # raises the last error after maximumAttempts failed attempts
+        reconnectDelay = self._reconnectDelay
+        attempts = 0
+        while (True):
+            self._raiseIfClosed()
             try:
-                self.mindwaveMobileSocket.connect(
-                    (mindwaveMobileAddress, 1))
-                self._isConnected = True
-            except bluetooth.btcommon.BluetoothError as error:
-                print("Could not connect: ", error, "; Retrying in 5s...")
-                time.sleep(5) 
-           
+                self._byteSource.connect()
+            except OSError as error:
+                attempts += 1
+                if (maximumAttempts is not None and attempts >= maximumAttempts):
+                    raise
+                logger.warning("Could not connect to %s: %s; Retrying in %ss...",
+                               self._mindwaveMobileAddress, error, reconnectDelay)
+                # returns early when closed meanwhile
+                self._isClosed.wait(reconnectDelay)
+                reconnectDelay = min(2 * reconnectDelay, self._maximumReconnectDelay)
+                continue
+            if (self._isClosed.is_set()):
+                # closed while connecting
+                self._byteSource.close()
+                self._raiseIfClosed()
+            self._isConnected = True
+            return
+
+    def _raiseIfClosed(self):
+        if (self._isClosed.is_set()):
+            self._isConnected = False
+            raise EOFError("Mindwave Mobile reader was closed")
+
+    def _reconnectToMindWaveMobile(self):
+        self._isConnected = False
+        try:
+            self._byteSource.close()
+        except OSError:
+            pass
+        self.reconnects += 1
+        self._connectWithBackoff()
+        logger.info("Reconnected to Mindwave Mobile %s", self._mindwaveMobileAddress)
+        if (self._onReconnect is not None):
+            self._onReconnect()
 
     def isConnected(self):
         return self._isConnected
 
+    def getAddress(self):
+        return self._mindwaveMobileAddress
+
+    def getByteSource(self):
+        return self._byteSource
+
+    def close(self):
+        self._isClosed.set()
+        self._byteSource.close()
+        self._isConnected = False
+
     def _printErrorDiscoveryMessage(self):
-         print((textwrap.dedent("""\
+         logger.error((textwrap.dedent("""\
                     Could not discover Mindwave Mobile. Please make sure the
                     Mindwave Mobile device is in pairing mode and your computer
                     has bluetooth enabled.""").replace("\n", " ")))
 
     def _readMoreBytesIntoBuffer(self, amountOfBytes):
-        newBytes = self._readBytesFromMindwaveMobile(amountOfBytes)
-        self._buffer += newBytes
-    
-    def _readBytesFromMindwaveMobile(self, amountOfBytes):
-        missingBytes = amountOfBytes
-        # receivedBytes = ""  #py2
-        receivedBytes = b''   #py3
-        
         # Sometimes the socket will not send all the requested bytes
         # on the first request, therefore a loop is necessary...
-        while(missingBytes > 0):
-            receivedBytes += self.mindwaveMobileSocket.recv(missingBytes)
-            missingBytes = amountOfBytes - len(receivedBytes)
-        return receivedBytes;
+        while (self._buffer.availableBytes() < amountOfBytes):
+            self._fillBuffer()
+
+    def _fillBuffer(self):
+        while (True):
+            try:
+                requestedAmount = min(self._readSize, self._buffer.writableBytes())
+                receivedAmount = self._buffer.fillFrom(self._byteSource, requestedAmount)
+            except OSError as error:
+                # including socket.timeout, and EBADF after close()
+                self._raiseIfClosed()
+                if (not self._reconnect):
+                    raise
+                logger.warning("Connection to Mindwave Mobile lost: %s", error)
+                receivedAmount = 0
+            if (receivedAmount > 0):
+                self._adaptReadSize(receivedAmount, requestedAmount)
+                return receivedAmount
+            self._raiseIfClosed()
+            if (not self._reconnect):
+                self._isConnected = False
+                raise EOFError("Mindwave Mobile byte stream ended")
+            self._reconnectToMindWaveMobile()
+
+    def _adaptReadSize(self, receivedAmount, requestedAmount):
+        # requestedAmount is less than the read size at the end of the ring
+        # buffer, a receive cut short there says nothing about the pace
+        if (receivedAmount >= self._readSize):
+            self._readSize = min(2 * self._readSize, self.MAXIMUM_READ_SIZE)
+        elif (receivedAmount <= requestedAmount // 4):
+            self._readSize = max(self._readSize // 2, self.MINIMUM_READ_SIZE)
 
     def peekByte(self):
-        self._ensureMoreBytesCanBeRead();
-        return ord(self._buffer[self._bufferPosition])
+        self._ensureMoreBytesCanBeRead(1);
+        return self._buffer.peekByte()
 
     def getByte(self):
-        self._ensureMoreBytesCanBeRead(100);
-        return self._getNextByte();
+        # waits for the byte only, packets are complete as soon as they arrived
+        self._ensureMoreBytesCanBeRead(1);
+        return self._buffer.getByte();
     
     def  _ensureMoreBytesCanBeRead(self, amountOfBytes):
-        if (self._bufferSize() <= self._bufferPosition + amountOfBytes):
+        if (self._buffer.availableBytes() < amountOfBytes):
             self._readMoreBytesIntoBuffer(amountOfBytes)
-    
-    def _getNextByte(self):
-        # nextByte = ord(self._buffer[self._bufferPosition]) #py2
-        nextByte = self._buffer[self._bufferPosition]   #py3
-        self._bufferPosition += 1;
-        return nextByte;
 
     def getBytes(self, amountOfBytes):
         self._ensureMoreBytesCanBeRead(amountOfBytes);
-        return self._getNextBytes(amountOfBytes);
+        return bytes(self._buffer.getBytes(amountOfBytes));
     
-    def _getNextBytes(self, amountOfBytes):
-        # nextBytes = list(map(ord, self._buffer[self._bufferPosition: self._bufferPosition + amountOfBytes])) #py2
-        nextBytes = list(self._buffer[self._bufferPosition: self._bufferPosition + amountOfBytes]) #py3
-        self._bufferPosition += amountOfBytes
-        return nextBytes
+    def getAvailableBytes(self):
+        # waits only if nothing is buffered, then returns everything that was received
+        return bytes(self.getAvailableBytesView())
+
+    def getAvailableBytesView(self):
+        # like getAvailableBytes without copying: a memoryview onto the
+        # buffer, only valid until clearAlreadyReadBuffer
+        if (self._buffer.availableBytes() == 0):
+            self._fillBuffer()
+        return self._buffer.getBytes(self._buffer.availableBytes())
     
     def clearAlreadyReadBuffer(self):
-        self._buffer = self._buffer[self._bufferPosition : ]
-        self._bufferPosition = 0;
-    
-    def _bufferSize(self):
-        return len(self._buffer);
+        self._buffer.release()
     
 #------------------------------------------------------------------------------ 
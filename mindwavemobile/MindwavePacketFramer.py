@@ -0,0 +1,107 @@
+SYNC_BYTE = 0xaa
+SYNC_BYTES = bytes([SYNC_BYTE, SYNC_BYTE])
+# two sync bytes and the payload length byte
+HEADER_LENGTH = 3
+# according to the specification payloads are never longer
+MAXIMUM_PAYLOAD_LENGTH = 169
+MAXIMUM_PACKET_LENGTH = HEADER_LENGTH + MAXIMUM_PAYLOAD_LENGTH + 1
+
+
+class MindwavePacketFramer:
+    # Splits a chunk of the ThinkGear byte stream into packet payloads,
+    # see http://wearcam.org/ece516/mindset_communications_protocol.pdf
+    # Packets are: 0xAA 0xAA, payload length, payload, checksum.
+    # A packet with an invalid length or checksum might have started at a
+    # false sync, so the search continues right after its first sync byte.
+    # maximumScanLength bounds the bytes examined per call; the rest is
+    # returned unframed and framing resumes with the next call.
+    def __init__(self, maximumScanLength=None):
+        if (maximumScanLength is not None and maximumScanLength < MAXIMUM_PACKET_LENGTH):
+            raise ValueError("maximumScanLength must be at least {}".format(MAXIMUM_PACKET_LENGTH))
+        self._maximumScanLength = maximumScanLength
+        self.framedPackets = 0
+        self.checkSumFailures = 0
+        self.invalidPayloadLengths = 0
+        self.resyncs = 0
+        self.discardedBytes = 0
+
+    def statistics(self):
+        return {"framedPackets": self.framedPackets,
+                "checkSumFailures": self.checkSumFailures,
+                "invalidPayloadLengths": self.invalidPayloadLengths,
+                "resyncs": self.resyncs,
+                "discardedBytes": self.discardedBytes}
+
+    def framePackets(self, chunk):
+        # Returns all complete packet payloads with a correct checksum as
+        # memoryviews, and the unframed bytes starting at a possible
+        # incomplete packet, which should be prepended to the next chunk.
+        payloads, packetPositions, unframedBytes = self._framePacketsOf(chunk, None)
+        return payloads, unframedBytes
+
+    def framePacketsWithPositions(self, chunk):
+        # As framePackets, additionally returns for every framed packet the
+        # position of its first sync byte in the chunk and the position of
+        # the last byte needed to accept it. That is its checksum, unless a
+        # false sync before it could only be rejected by a later checksum.
+        return self._framePacketsOf(chunk, [])
+
+    def _framePacketsOf(self, chunk, packetPositions):
+        data = chunk if isinstance(chunk, bytes) else bytes(chunk)
+        payloads, unframedStart, framedBytes = self._framePackets(data, packetPositions)
+        self.discardedBytes += unframedStart - framedBytes
+        return payloads, packetPositions, memoryview(data)[unframedStart:]
+
+    def _framePackets(self, data, packetPositions):
+        dataView = memoryview(data)
+        dataLength = len(data)
+        scanEnd = dataLength
+        if (self._maximumScanLength is not None):
+            scanEnd = min(dataLength, self._maximumScanLength)
+        payloads = []
+        framedBytes = 0
+        position = 0
+        rejectedCheckSumPosition = 0
+        while (True):
+            syncPosition = data.find(SYNC_BYTES, position, scanEnd + 1)
+            if (syncPosition == -1):
+                if (scanEnd < dataLength):
+                    return payloads, max(position, scanEnd - 1), framedBytes
+                # a single sync byte at the end might be the start of a packet
+                if (dataLength > position and data[-1] == SYNC_BYTE):
+                    return payloads, dataLength - 1, framedBytes
+                return payloads, dataLength, framedBytes
+            if (syncPosition + HEADER_LENGTH > dataLength):
+                return payloads, syncPosition, framedBytes
+            payloadLength = data[syncPosition + 2]
+            if (payloadLength == SYNC_BYTE):
+                # more than two sync bytes, the packet starts later
+                position = syncPosition + 1
+                continue
+            if (payloadLength > MAXIMUM_PAYLOAD_LENGTH):
+                self.invalidPayloadLengths += 1
+                self.resyncs += 1
+                position = syncPosition + 1
+                continue
+            payloadStart = syncPosition + HEADER_LENGTH
+            payloadEnd = payloadStart + payloadLength
+            if (payloadEnd >= dataLength):
+                return payloads, syncPosition, framedBytes
+            payload = dataView[payloadStart:payloadEnd]
+            if (self._checkSumIsOk(payload, data[payloadEnd])):
+                payloads.append(payload)
+                if (packetPositions is not None):
+                    packetPositions.append((syncPosition, payloadEnd if payloadEnd > rejectedCheckSumPosition
+                                            else rejectedCheckSumPosition))
+                self.framedPackets += 1
+                framedBytes += payloadLength + HEADER_LENGTH + 1
+                position = payloadEnd + 1
+            else:
+                self.checkSumFailures += 1
+                self.resyncs += 1
+                rejectedCheckSumPosition = max(rejectedCheckSumPosition, payloadEnd)
+                position = syncPosition + 1
+
+    def _checkSumIsOk(self, payloadBytes, checkSum):
+        # 1's complement of the last eight bits of the payload sum
+        return (~sum(payloadBytes)) & 0xff == checkSum
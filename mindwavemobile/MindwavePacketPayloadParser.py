@@ -3,84 +3,130 @@ from .MindwaveDataPoints import RawDataPoint, PoorSignalLevelDataPoint,\
     UnknownDataPoint
 
 EXTENDED_CODE_BYTE = 0x55
+RAW_VALUE_CODE = 0x80
+# value length of every data row code, None if a length byte follows the code
+# (codes above 0x7f), except for the mysterious initial code values 0xBA and 0xBC
+DATA_ROW_VALUE_LENGTHS = [1] * 0x80 + [None] * 0x80
+DATA_ROW_VALUE_LENGTHS[0xba] = 1
+DATA_ROW_VALUE_LENGTHS[0xbc] = 1
+
+# data point class and expected value length of the decoded data row codes,
+# rows with other value lengths are skipped and counted in malformedDataRows
+DATA_POINT_DECODERS = {
+    0x02: (PoorSignalLevelDataPoint, 1),
+    0x04: (AttentionDataPoint, 1),
+    0x05: (MeditationDataPoint, 1),
+    0x16: (BlinkDataPoint, 1),
+    0x80: (RawDataPoint, 2),
+    0x83: (EEGPowersDataPoint, 24),
+    0xba: (UnknownDataPoint, 1),
+    0xbc: (UnknownDataPoint, 1),
+}
+DATA_POINT_CLASSES = {dataRowCode: dataPointClass
+                      for dataRowCode, (dataPointClass, valueLength) in DATA_POINT_DECODERS.items()}
 
 class MindwavePacketPayloadParser:
-    
-    def __init__(self, payloadBytes):
+    # Can be reused for any number of payloads, each data row code is looked
+    # up in a table of 256 decoders. Rows with codes without decoder are
+    # skipped and counted in unknownDataRowCodeCounts, rows with another
+    # value length than their decoder expects in malformedDataRows.
+    # With selectDataRowCodes only the selected rows are decoded, the others
+    # are skipped over by their length without creating data points.
+    def __init__(self, payloadBytes=None):
         self._payloadBytes = payloadBytes
-        self._payloadIndex = 0
-        
-    def parseDataPoints(self):
+        self._registeredDecoders = [None] * 256
+        # None accepts any value length
+        self._expectedValueLengths = [None] * 256
+        for dataRowCode, (dataPointClass, valueLength) in DATA_POINT_DECODERS.items():
+            self._registeredDecoders[dataRowCode] = dataPointClass
+            self._expectedValueLengths[dataRowCode] = valueLength
+        self._decoders = list(self._registeredDecoders)
+        self._unselectedDataRowCodes = [False] * 256
+        self._valueLengths = list(DATA_ROW_VALUE_LENGTHS)
+        self.unknownDataRowCodeCounts = [0] * 256
+        self.truncatedDataRows = 0
+        self.malformedDataRows = 0
+
+    def registerDecoder(self, dataRowCode, decoder, valueLength=None):
+        # decoder is called with the value bytes of the row and returns the data point.
+        # valueLength is the only value length passed to it, needed for codes below
+        # 0x80 with values longer than one byte; without it the length expected
+        # before is kept
+        self._registeredDecoders[dataRowCode] = decoder
+        if (not self._unselectedDataRowCodes[dataRowCode]):
+            self._decoders[dataRowCode] = decoder
+        if (valueLength is not None):
+            self._expectedValueLengths[dataRowCode] = valueLength
+            if (dataRowCode < 0x80):
+                self._valueLengths[dataRowCode] = valueLength
+
+    def decoderOf(self, dataRowCode):
+        return self._registeredDecoders[dataRowCode]
+
+    def selectDataRowCodes(self, dataRowCodes=None):
+        # None selects all rows again
+        for dataRowCode in range(256):
+            isSelected = dataRowCodes is None or dataRowCode in dataRowCodes
+            self._unselectedDataRowCodes[dataRowCode] = not isSelected
+            self._decoders[dataRowCode] = self._registeredDecoders[dataRowCode] if isSelected else None
+
+    def unknownDataRowCodes(self):
+        return dict((dataRowCode, count) for dataRowCode, count
+                    in enumerate(self.unknownDataRowCodeCounts) if count > 0)
+
+    def parseDataPoints(self, payloadBytes=None):
+        if (payloadBytes is None):
+            payloadBytes = self._payloadBytes
+        decoders = self._decoders
+        expectedValueLengths = self._expectedValueLengths
+        if (isSingleRawValue(payloadBytes) and decoders[RAW_VALUE_CODE] is not None
+                and expectedValueLengths[RAW_VALUE_CODE] in (None, 2)):
+            return [decoders[RAW_VALUE_CODE](payloadBytes[2:4])]
         dataPoints = []
-        while (not self._atEndOfPayloadBytes()):
-            dataPoint = self._parseOneDataPoint()
-            dataPoints.append(dataPoint)
+        for dataRowCode, valueStart, valueEnd in iterDataRows(payloadBytes, self._valueLengths):
+            if (valueEnd is None):
+                self.truncatedDataRows += 1
+                break
+            decoder = decoders[dataRowCode]
+            if (decoder is None):
+                if (not self._unselectedDataRowCodes[dataRowCode]):
+                    self.unknownDataRowCodeCounts[dataRowCode] += 1
+            elif (expectedValueLengths[dataRowCode] not in (None, valueEnd - valueStart)):
+                self.malformedDataRows += 1
+            else:
+                dataPoints.append(decoder(payloadBytes[valueStart:valueEnd]))
         return dataPoints
-        
-    def _atEndOfPayloadBytes(self):
-        return self._payloadIndex == len(self._payloadBytes)
-    
-    def _parseOneDataPoint(self):
-        dataRowCode = self._extractDataRowCode();
-        dataRowValueBytes = self._extractDataRowValueBytes(dataRowCode)
-        return self._createDataPoint(dataRowCode, dataRowValueBytes)
-    
-    def _extractDataRowCode(self):
-        return self._ignoreExtendedCodeBytesAndGetRowCode()
-        
-    def _ignoreExtendedCodeBytesAndGetRowCode(self):
-        # EXTENDED_CODE_BYTES seem not to be used according to 
+
+
+def isSingleRawValue(payloadBytes):
+    # nearly all packets are a single raw value: 0x80 0x02 high low
+    return len(payloadBytes) == 4 and payloadBytes[0] == RAW_VALUE_CODE and payloadBytes[1] == 2
+
+
+def iterDataRows(payloadBytes, valueLengths=DATA_ROW_VALUE_LENGTHS):
+    # yields code, value start and value end of every data row,
+    # a truncated last row is yielded with None as value end
+    payloadLength = len(payloadBytes)
+    payloadIndex = 0
+    while (payloadIndex < payloadLength):
+        dataRowCode = payloadBytes[payloadIndex]
+        payloadIndex += 1
+        # EXTENDED_CODE_BYTES seem not to be used according to
         # http://wearcam.org/ece516/mindset_communications_protocol.pdf
         # (August 2012)
         # so we ignore them
-        byte = self._getNextByte()
-        while (byte == EXTENDED_CODE_BYTE):
-            byte = self._getNextByte()
-        dataRowCode = byte
-        return dataRowCode
-       
-    def _getNextByte(self):
-        nextByte = self._payloadBytes[self._payloadIndex]
-        self._payloadIndex += 1
-        return nextByte
-    
-    def _getNextBytes(self, amountOfBytes):
-        nextBytes = self._payloadBytes[self._payloadIndex : self._payloadIndex + amountOfBytes]
-        self._payloadIndex += amountOfBytes
-        return nextBytes
-    
-    def _extractDataRowValueBytes(self, dataRowCode):
-        lengthOfValueBytes = self._extractLengthOfValueBytes(dataRowCode)
-        dataRowValueBytes = self._getNextBytes(lengthOfValueBytes)
-        return dataRowValueBytes
-       
-    def _extractLengthOfValueBytes(self, dataRowCode):
-        # If code is one of the mysterious initial code values
-        # return before the extended code check
-        if dataRowCode == 0xBA or dataRowCode == 0xBC:
-            return 1
-
-        dataRowHasLengthByte = dataRowCode > 0x7f
-        if (dataRowHasLengthByte):
-            return self._getNextByte()
-        else:
-            return 1
-        
-    def _createDataPoint(self, dataRowCode, dataRowValueBytes):
-        if (dataRowCode == 0x02):
-            return PoorSignalLevelDataPoint(dataRowValueBytes)
-        elif (dataRowCode == 0x04):
-            return AttentionDataPoint(dataRowValueBytes)
-        elif (dataRowCode == 0x05):
-            return MeditationDataPoint(dataRowValueBytes)
-        elif (dataRowCode == 0x16):
-            return BlinkDataPoint(dataRowValueBytes)
-        elif (dataRowCode == 0x80):
-            return RawDataPoint(dataRowValueBytes)
-        elif (dataRowCode == 0x83):
-            return EEGPowersDataPoint(dataRowValueBytes)
-        elif (dataRowCode == 0xba or dataRowCode == 0xbc):
-            return UnknownDataPoint(dataRowValueBytes)
-        else:
-            assert False 
-        
+        if (dataRowCode == EXTENDED_CODE_BYTE):
+            continue
+        valueLength = valueLengths[dataRowCode]
+        if (valueLength is None):
+            if (payloadIndex == payloadLength):
+                yield dataRowCode, payloadIndex, None
+                return
+            valueLength = payloadBytes[payloadIndex]
+            payloadIndex += 1
+        valueEnd = payloadIndex + valueLength
+        if (valueEnd > payloadLength):
+            yield dataRowCode, payloadIndex, None
+            return
+        yield dataRowCode, payloadIndex, valueEnd
+        payloadIndex = valueEnd
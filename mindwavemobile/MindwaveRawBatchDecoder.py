@@ -0,0 +1,63 @@
+import array
+import collections
+import numpy as np
+
+from .MindwavePacketPayloadParser import iterDataRows, isSingleRawValue, RAW_VALUE_CODE
+from .MindwaveSampleClock import MindwaveSampleClock
+
+POOR_SIGNAL_CODE = 0x02
+# headset reports 200 when it has no contact to the skin,
+# assume that until the first poor signal value arrives
+NO_CONTACT_POOR_SIGNAL_LEVEL = 200
+
+# timestamps are the arrival times of the samples' chunks,
+# sampleTimes the reconstructed times of the samples, see MindwaveSampleClock
+MindwaveRawBatch = collections.namedtuple("MindwaveRawBatch",
+                                          ["samples", "timestamps", "poorSignalLevels",
+                                           "sampleTimes"])
+
+
+class MindwaveRawBatchDecoder:
+    # Collects raw values (0x80 rows) from packet payloads into flat buffers,
+    # without creating any data point objects, and hands them out as arrays.
+    def __init__(self):
+        self._rawValueBytes = bytearray()
+        self._timestamps = array.array("d")
+        self._poorSignalLevels = bytearray()
+        self._poorSignalLevel = NO_CONTACT_POOR_SIGNAL_LEVEL
+        self.sampleClock = MindwaveSampleClock()
+
+    def amountOfSamples(self):
+        return len(self._timestamps)
+
+    def decodePayload(self, payloadBytes, arrivalTime):
+        if (isSingleRawValue(payloadBytes)):
+            self._addRawValue(payloadBytes[2:4], arrivalTime)
+            return
+        for dataRowCode, valueStart, valueEnd in iterDataRows(payloadBytes):
+            if (valueEnd is None):
+                break
+            if (dataRowCode == RAW_VALUE_CODE and valueEnd - valueStart == 2):
+                self._addRawValue(payloadBytes[valueStart:valueEnd], arrivalTime)
+            elif (dataRowCode == POOR_SIGNAL_CODE):
+                self._poorSignalLevel = payloadBytes[valueStart]
+
+    def _addRawValue(self, rawValueBytes, arrivalTime):
+        self._rawValueBytes.extend(rawValueBytes)
+        self._timestamps.append(arrivalTime)
+        self._poorSignalLevels.append(self._poorSignalLevel)
+
+    def takeBatch(self, amountOfSamples):
+        amountOfSamples = min(amountOfSamples, self.amountOfSamples())
+        # raw values are big endian 16 bit two's complement
+        samples = np.frombuffer(self._rawValueBytes, dtype=">i2",
+                                count=amountOfSamples).astype(np.int16)
+        timestamps = np.frombuffer(self._timestamps, dtype=np.float64,
+                                   count=amountOfSamples).copy()
+        poorSignalLevels = np.frombuffer(self._poorSignalLevels, dtype=np.uint8,
+                                         count=amountOfSamples).copy()
+        del self._rawValueBytes[:2 * amountOfSamples]
+        del self._timestamps[:amountOfSamples]
+        del self._poorSignalLevels[:amountOfSamples]
+        sampleTimes = self.sampleClock.sampleTimes(timestamps)
+        return MindwaveRawBatch(samples, timestamps, poorSignalLevels, sampleTimes)
@@ -0,0 +1,105 @@
+DEFAULT_CAPACITY = 4096
+
+
+def writeCircularRows(columnsAndRows, writtenRows, amountOfRows):
+    # Writes amountOfRows rows into circular columns after the writtenRows
+    # rows written so far, (column, rows) pairs of equally long columns. At
+    # most the last len(column) rows are kept.
+    for column, rows in columnsAndRows:
+        capacity = len(column)
+        skippedRows = max(0, amountOfRows - capacity)
+        start = (writtenRows + skippedRows) % capacity
+        firstPartLength = min(amountOfRows - skippedRows, capacity - start)
+        column[start:start + firstPartLength] = rows[skippedRows:skippedRows + firstPartLength]
+        column[:amountOfRows - skippedRows - firstPartLength] = rows[skippedRows + firstPartLength:]
+
+
+class MindwaveRingBuffer:
+    # Fixed-capacity byte ring buffer. Positions are absolute stream offsets,
+    # the index into the bytearray is position % capacity.
+    # Bytes that were read stay valid (and views onto them stay untouched)
+    # until release() is called, just like the old list buffer kept them
+    # until clearAlreadyReadBuffer().
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        self._capacity = capacity
+        self._buffer = bytearray(capacity)
+        self._view = memoryview(self._buffer)
+        self._writePosition = 0
+        self._readPosition = 0
+        self._releasedPosition = 0
+
+    def capacity(self):
+        return self._capacity
+
+    def availableBytes(self):
+        return self._writePosition - self._readPosition
+
+    def freeBytes(self):
+        return self._capacity - (self._writePosition - self._releasedPosition)
+
+    def writableBytes(self):
+        # bytes the next fillFrom can receive at most, up to the end of the
+        # bytearray; a full buffer grows
+        if (self.freeBytes() == 0):
+            self._grow()
+        return min(self.freeBytes(), self._capacity - self._writePosition % self._capacity)
+
+    def fillFrom(self, socket, maximumAmount=None):
+        # one recv_into of at most maximumAmount bytes
+        writableBytes = self.writableBytes()
+        start = self._writePosition % self._capacity
+        end = start + writableBytes
+        if (maximumAmount is not None):
+            end = min(end, start + maximumAmount)
+        receivedAmount = socket.recv_into(self._view[start:end])
+        self._writePosition += receivedAmount
+        return receivedAmount
+
+    def write(self, data):
+        data = memoryview(data)
+        while (self.freeBytes() < len(data)):
+            self._grow()
+        self._copyIn(self._writePosition, data)
+        self._writePosition += len(data)
+
+    def peekByte(self):
+        return self._buffer[self._readPosition % self._capacity]
+
+    def getByte(self):
+        byte = self._buffer[self._readPosition % self._capacity]
+        self._readPosition += 1
+        return byte
+
+    def getBytes(self, amountOfBytes):
+        start = self._readPosition % self._capacity
+        self._readPosition += amountOfBytes
+        if (start + amountOfBytes <= self._capacity):
+            return self._view[start:start + amountOfBytes]
+        # only copy when the requested bytes wrap around the end
+        return memoryview(self._copyOut(self._readPosition - amountOfBytes,
+                                        self._readPosition))
+
+    def release(self):
+        self._releasedPosition = self._readPosition
+
+    def _copyOut(self, startPosition, endPosition):
+        start = startPosition % self._capacity
+        amountOfBytes = endPosition - startPosition
+        firstPart = min(amountOfBytes, self._capacity - start)
+        return (bytes(self._view[start:start + firstPart]) +
+                bytes(self._view[:amountOfBytes - firstPart]))
+
+    def _copyIn(self, position, data):
+        start = position % self._capacity
+        firstPart = min(len(data), self._capacity - start)
+        self._view[start:start + firstPart] = data[:firstPart]
+        self._view[:len(data) - firstPart] = data[firstPart:]
+
+    def _grow(self):
+        # Only happens if nobody releases bytes for a whole buffer length.
+        # Views handed out earlier keep the old bytearray alive.
+        unreleasedBytes = self._copyOut(self._releasedPosition, self._writePosition)
+        self._capacity *= 2
+        self._buffer = bytearray(self._capacity)
+        self._view = memoryview(self._buffer)
+        self._copyIn(self._releasedPosition, memoryview(unreleasedBytes))
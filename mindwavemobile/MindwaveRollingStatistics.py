@@ -0,0 +1,160 @@
+import collections
+import math
+
+from .MindwaveDataPoints import AttentionDataPoint, MeditationDataPoint, EEGPowersDataPoint
+
+EEG_POWER_NAMES = ("delta", "theta", "lowAlpha", "highAlpha", "lowBeta", "highBeta", "lowGamma", "midGamma")
+# (metric name, attribute) per data point class
+METRIC_ATTRIBUTES = {
+    AttentionDataPoint: (("attention", "attentionValue"),),
+    MeditationDataPoint: (("meditation", "meditationValue"),),
+    EEGPowersDataPoint: tuple((name, name) for name in EEG_POWER_NAMES),
+}
+DATA_POINT_TYPES = tuple(METRIC_ATTRIBUTES)
+
+
+class MindwaveRollingWindow:
+    # Count, mean, variance, minimum and maximum of the values of the last
+    # seconds before the latest timestamp. Mean and variance are updated
+    # with Welford's algorithm when a value enters or leaves the window,
+    # minimum and maximum are the fronts of monotonic deques, so adding
+    # costs amortized O(1) and queries O(1) whatever the window length.
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self._values = collections.deque()
+        # (timestamp, value), values increasing resp. decreasing
+        self._minimumCandidates = collections.deque()
+        self._maximumCandidates = collections.deque()
+        self._mean = 0.0
+        self._sumOfSquaredDeviations = 0.0
+
+    def add(self, value, timestamp):
+        values = self._values
+        values.append((timestamp, value))
+        count = len(values)
+        deviation = value - self._mean
+        self._mean += deviation / count
+        self._sumOfSquaredDeviations += deviation * (value - self._mean)
+
+        minimumCandidates = self._minimumCandidates
+        while (minimumCandidates and minimumCandidates[-1][1] >= value):
+            minimumCandidates.pop()
+        minimumCandidates.append((timestamp, value))
+        maximumCandidates = self._maximumCandidates
+        while (maximumCandidates and maximumCandidates[-1][1] <= value):
+            maximumCandidates.pop()
+        maximumCandidates.append((timestamp, value))
+
+        oldestTimestamp = timestamp - self.seconds
+        while (values[0][0] <= oldestTimestamp):
+            self._remove(values.popleft()[1])
+        while (minimumCandidates[0][0] <= oldestTimestamp):
+            minimumCandidates.popleft()
+        while (maximumCandidates[0][0] <= oldestTimestamp):
+            maximumCandidates.popleft()
+
+    def _remove(self, value):
+        count = len(self._values)
+        if (count == 0):
+            self._mean = 0.0
+            self._sumOfSquaredDeviations = 0.0
+            return
+        deviation = value - self._mean
+        self._mean -= deviation / count
+        self._sumOfSquaredDeviations -= deviation * (value - self._mean)
+
+    def count(self):
+        return len(self._values)
+
+    def mean(self):
+        if (not self._values):
+            return math.nan
+        return self._mean
+
+    def variance(self):
+        # population variance like numpy.var
+        if (not self._values):
+            return math.nan
+        return max(self._sumOfSquaredDeviations, 0.0) / len(self._values)
+
+    def standardDeviation(self):
+        return math.sqrt(self.variance())
+
+    def minimum(self):
+        if (not self._values):
+            return math.nan
+        return self._minimumCandidates[0][1]
+
+    def maximum(self):
+        if (not self._values):
+            return math.nan
+        return self._maximumCandidates[0][1]
+
+
+class MindwaveRollingStatistics:
+    # Rolling windows of every given length over attention, meditation and
+    # the eight EEG powers, or any other metric given to addValue, e.g. the
+    # rows of a MindwaveBandPowerEstimator. Timestamps are seconds, like
+    # MindwaveDataPointReader.lastArrivalTime(), and must not decrease per metric.
+    def __init__(self, windowSeconds=(10, 60)):
+        self.windowSeconds = tuple(windowSeconds)
+        # metric name -> {window seconds: MindwaveRollingWindow}
+        self._windows = {}
+
+    def attachTo(self, mindwaveDataPointReader):
+        # adds the data points dispatched by the reader, see
+        # MindwaveDataPointReader.subscribe, at their arrival time
+        def addDispatchedDataPoint(dataPoint):
+            self.addDataPoint(dataPoint, mindwaveDataPointReader.lastArrivalTime())
+        mindwaveDataPointReader.subscribe(addDispatchedDataPoint, DATA_POINT_TYPES)
+        return addDispatchedDataPoint
+
+    def addDataPoint(self, dataPoint, timestamp):
+        # data points of other classes are ignored
+        for metricName, attribute in METRIC_ATTRIBUTES.get(dataPoint.__class__, ()):
+            self.addValue(metricName, getattr(dataPoint, attribute), timestamp)
+
+    def addValue(self, metricName, value, timestamp):
+        windows = self._windows.get(metricName)
+        if (windows is None):
+            windows = {seconds: MindwaveRollingWindow(seconds) for seconds in self.windowSeconds}
+            self._windows[metricName] = windows
+        for window in windows.values():
+            window.add(value, timestamp)
+
+    def metricNames(self):
+        return list(self._windows)
+
+    def window(self, metricName, seconds):
+        # KeyError for metrics without values or windows not configured
+        return self._windows[metricName][seconds]
+
+    def count(self, metricName, seconds):
+        return self.window(metricName, seconds).count()
+
+    def mean(self, metricName, seconds):
+        return self.window(metricName, seconds).mean()
+
+    def variance(self, metricName, seconds):
+        return self.window(metricName, seconds).variance()
+
+    def standardDeviation(self, metricName, seconds):
+        return self.window(metricName, seconds).standardDeviation()
+
+    def minimum(self, metricName, seconds):
+        return self.window(metricName, seconds).minimum()
+
+    def maximum(self, metricName, seconds):
+        return self.window(metricName, seconds).maximum()
+
+    def ratio(self, numeratorMetricName, denominatorMetricName, seconds):
+        # of the means, e.g. ratio("theta", "lowBeta", 10)
+        denominator = self.mean(denominatorMetricName, seconds)
+        if (denominator == 0):
+            return math.nan
+        return self.mean(numeratorMetricName, seconds) / denominator
+
+    def summary(self, metricName, seconds):
+        window = self.window(metricName, seconds)
+        return {"count": window.count(), "mean": window.mean(), "variance": window.variance(),
+                "minimum": window.minimum(), "maximum": window.maximum()}
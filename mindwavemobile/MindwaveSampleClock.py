@@ -0,0 +1,69 @@
+import math
+import numpy as np
+
+from .MindwaveDataPoints import SAMPLING_RATE
+
+
+class MindwaveSampleClock:
+    # Reconstructs the time of every raw sample from the arrival times of the
+    # chunks they came in. Bluetooth delivers samples in bursts, so arrival
+    # times jitter by tens of milliseconds. A delay-locked loop (see
+    # F. Adriaensen, "Using a DLL to filter time") follows the arrival times
+    # with the given bandwidth and tracks the actual sample period, which
+    # drifts slightly from 1/512 s. The arrival time of a chunk is taken as
+    # the time of its last sample.
+    # If a chunk arrives more than gapThreshold seconds later than predicted,
+    # the missing time is counted as lost samples.
+    def __init__(self, samplingRate=SAMPLING_RATE, bandwidth=0.05, gapThreshold=0.25):
+        self.samplePeriod = 1.0 / samplingRate
+        self._bandwidth = bandwidth
+        self._gapThreshold = gapThreshold
+        self._lastSampleTime = None
+        self._lastArrivalTime = None
+        self.sampleNumber = 0
+        self.lostSamples = 0
+        # (sample number after the gap, amount of lost samples)
+        self.gaps = []
+
+    def sampleTimes(self, arrivalTimes):
+        # arrivalTimes of consecutive samples, equal for samples of one chunk
+        arrivalTimes = np.asarray(arrivalTimes, dtype=np.float64)
+        sampleTimes = np.empty(len(arrivalTimes))
+        runStarts = np.concatenate(([0], np.flatnonzero(np.diff(arrivalTimes)) + 1))
+        runEnds = np.concatenate((runStarts[1:], [len(arrivalTimes)]))
+        for runStart, runEnd in zip(runStarts.tolist(), runEnds.tolist()):
+            self._addChunk(arrivalTimes[runStart], runEnd - runStart,
+                           sampleTimes[runStart:runEnd])
+        return sampleTimes
+
+    def _addChunk(self, arrivalTime, amountOfSamples, sampleTimes):
+        if (self._lastSampleTime is None):
+            self._lastSampleTime = arrivalTime
+            self._writeSampleTimes(sampleTimes, amountOfSamples)
+        elif (arrivalTime == self._lastArrivalTime):
+            # rest of a chunk that was split between two batches
+            self._lastSampleTime += amountOfSamples * self.samplePeriod
+            self._writeSampleTimes(sampleTimes, amountOfSamples)
+        else:
+            self._followArrivalTime(arrivalTime, amountOfSamples)
+            self._writeSampleTimes(sampleTimes, amountOfSamples)
+        self._lastArrivalTime = arrivalTime
+        self.sampleNumber += amountOfSamples
+
+    def _followArrivalTime(self, arrivalTime, amountOfSamples):
+        predictedTime = self._lastSampleTime + amountOfSamples * self.samplePeriod
+        error = arrivalTime - predictedTime
+        if (error > self._gapThreshold):
+            lostSamples = int(round(error / self.samplePeriod))
+            self.lostSamples += lostSamples
+            self.gaps.append((self.sampleNumber, lostSamples))
+            self.sampleNumber += lostSamples
+            predictedTime += lostSamples * self.samplePeriod
+            error = arrivalTime - predictedTime
+        omega = min(2 * math.pi * self._bandwidth * amountOfSamples * self.samplePeriod, 0.5)
+        self._lastSampleTime = predictedTime + math.sqrt(2) * omega * error
+        self.samplePeriod += omega * omega * error / amountOfSamples
+
+    def _writeSampleTimes(self, sampleTimes, amountOfSamples):
+        sampleTimes[:] = self._lastSampleTime - \
+            np.arange(amountOfSamples - 1, -1, -1) * self.samplePeriod
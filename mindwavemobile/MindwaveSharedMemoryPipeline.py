@@ -0,0 +1,320 @@
+import multiprocessing
+import os
+import time
+from multiprocessing import shared_memory
+import numpy as np
+
+from .MindwaveCaptureDecoder import decodePayloadColumns, COLUMNS
+from .MindwaveColumnStore import OTHER_ROWS_PER_SECOND
+from .MindwaveDataPoints import SAMPLING_RATE
+from .MindwaveMobileRawReader import MindwaveMobileRawReader
+from .MindwavePacketFramer import MindwavePacketFramer
+from .MindwaveRingBuffer import writeCircularRows
+from .MindwaveSampleClock import MindwaveSampleClock
+
+DEFAULT_CAPACITY_SECONDS = 60
+# how often readers waiting for rows look for them
+POLL_INTERVAL = 0.002
+# written rows, rows being written, end of the stream
+HEADER_LENGTH = 3
+WRITTEN_ROWS, RESERVED_ROWS, HAS_ENDED = range(HEADER_LENGTH)
+
+
+def headsetColumnTypes():
+    # ring name -> (column name, dtype, row shape) of a MindwaveSharedHeadset,
+    # the columns named like those of MindwaveColumnDecoder
+    columnTypes = {"raw": [("raw", "int16", ()), ("rawTimestamps", "float64", ()),
+                           ("rawSampleTimes", "float64", ())]}
+    for name, dataRowCode, valueLength in COLUMNS:
+        if (name == "eegPowers"):
+            columnTypes[name] = [(name, "uint32", (8,)), (name + "Timestamps", "float64", ())]
+        elif (name != "raw"):
+            columnTypes[name] = [(name, "uint8", ()), (name + "Timestamps", "float64", ())]
+    return columnTypes
+
+
+class MindwaveSharedRingBuffer:
+    # Rows of named columns in one block of shared memory, written by one
+    # process and read by any number of others as NumPy views, without
+    # copying or pickling. Rows are numbered by sequence numbers from 0.
+    # The writer announces rows in the header before overwriting old ones and
+    # counts them as written afterwards, so readers that fell behind by more
+    # than the capacity lose the oldest rows and can tell, see isOverwritten.
+    # Without name the shared memory is created, otherwise attached to, see
+    # description(). Only the creating process unlinks it.
+    def __init__(self, columnTypes, capacity, name=None):
+        self.columnTypes = [(columnName, np.dtype(dtype), tuple(shape)) for columnName, dtype, shape in columnTypes]
+        self.capacity = capacity
+        columnOffsets = []
+        length = HEADER_LENGTH * 8
+        for columnName, dtype, shape in self.columnTypes:
+            columnOffsets.append(length)
+            # 8 byte aligned columns
+            length += -(-capacity * int(np.prod(shape, dtype=np.int64)) * dtype.itemsize // 8) * 8
+        self._isOwner = name is None
+        self._sharedMemory = shared_memory.SharedMemory(name=name, create=self._isOwner, size=length)
+        self.name = self._sharedMemory.name
+        self._header = np.ndarray(HEADER_LENGTH, dtype=np.int64, buffer=self._sharedMemory.buf)
+        self._columns = {columnName: np.ndarray((capacity,) + shape, dtype=dtype, buffer=self._sharedMemory.buf,
+                                                offset=columnOffset)
+                         for (columnName, dtype, shape), columnOffset in zip(self.columnTypes, columnOffsets)}
+        if (self._isOwner):
+            self._header[:] = 0
+
+    def description(self):
+        # picklable arguments to attach to the ring in another process
+        return ([(columnName, dtype.str, shape) for columnName, dtype, shape in self.columnTypes],
+                self.capacity, self.name)
+
+    def writtenRows(self):
+        return int(self._header[WRITTEN_ROWS])
+
+    def hasEnded(self):
+        return bool(self._header[HAS_ENDED])
+
+    def markEnded(self):
+        self._header[HAS_ENDED] = 1
+
+    def write(self, columns):
+        # columns: equally long arrays for every column, of which at most
+        # the last capacity rows are kept
+        amountOfRows = len(columns[self.columnTypes[0][0]])
+        writtenRows = int(self._header[WRITTEN_ROWS])
+        self._header[RESERVED_ROWS] = writtenRows + amountOfRows
+        writeCircularRows(((self._columns[columnName], values) for columnName, values in columns.items()),
+                          writtenRows, amountOfRows)
+        self._header[WRITTEN_ROWS] = writtenRows + amountOfRows
+
+    def read(self, sequence, maximumRows=None):
+        # Returns the sequence number of the first row and views of the
+        # written rows from there up to the end of the buffer. The first row
+        # is later than sequence when those rows were overwritten already.
+        writtenRows = int(self._header[WRITTEN_ROWS])
+        sequence = max(sequence, int(self._header[RESERVED_ROWS]) - self.capacity, 0)
+        start = sequence % self.capacity
+        end = start + max(0, min(writtenRows - sequence, self.capacity - start))
+        if (maximumRows is not None):
+            end = min(end, start + maximumRows)
+        return sequence, {columnName: column[start:end] for columnName, column in self._columns.items()}
+
+    def isOverwritten(self, sequence):
+        # whether rows from sequence on were overwritten since they were read,
+        # then the views returned by read may have changed meanwhile
+        return int(self._header[RESERVED_ROWS]) - self.capacity > sequence
+
+    def waitForRows(self, sequence, amountOfRows, timeout=None):
+        # True once rows up to sequence + amountOfRows are written, False at
+        # the end of the stream or timeout
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while (self.writtenRows() < sequence + amountOfRows):
+            if (self.hasEnded() and self.writtenRows() < sequence + amountOfRows):
+                return False
+            if (deadline is not None and time.monotonic() > deadline):
+                return False
+            time.sleep(POLL_INTERVAL)
+        return True
+
+    def close(self):
+        # views returned by read must not be used any more
+        self._header = None
+        self._columns = None
+        self._sharedMemory.close()
+        if (self._isOwner):
+            self._sharedMemory.unlink()
+
+
+class MindwaveSharedHeadset:
+    # The decoded columns of one headset in shared ring buffers: raw values
+    # with arrival and reconstructed sample times in the ring "raw", the
+    # other columns of MindwaveColumnDecoder (poor signal, attention,
+    # meditation, blink, EEG powers) each in a ring of their own.
+    def __init__(self, capacitySeconds=DEFAULT_CAPACITY_SECONDS, descriptions=None):
+        if (descriptions is None):
+            self.rings = {}
+            for ringName, columnTypes in headsetColumnTypes().items():
+                rowsPerSecond = SAMPLING_RATE if ringName == "raw" else OTHER_ROWS_PER_SECOND
+                self.rings[ringName] = MindwaveSharedRingBuffer(columnTypes, int(capacitySeconds * rowsPerSecond))
+        else:
+            self.rings = {ringName: MindwaveSharedRingBuffer(*description)
+                          for ringName, description in descriptions.items()}
+
+    def descriptions(self):
+        return {ringName: ring.description() for ringName, ring in self.rings.items()}
+
+    def write(self, columns):
+        for ringName, ring in self.rings.items():
+            ringColumns = {columnName: columns[columnName] for columnName, dtype, shape in ring.columnTypes}
+            if (len(ringColumns[ringName]) > 0):
+                ring.write(ringColumns)
+
+    def markEnded(self):
+        for ring in self.rings.values():
+            ring.markEnded()
+
+    def close(self):
+        for ring in self.rings.values():
+            ring.close()
+
+
+def acquireIntoSharedMemory(descriptions, address=None, byteSource=None):
+    # Runs in an acquisition process: decodes the headset's byte stream chunk
+    # by chunk into the MindwaveSharedHeadset of descriptions until it ends.
+    headset = MindwaveSharedHeadset(descriptions=descriptions)
+    mindwaveMobileRawReader = MindwaveMobileRawReader(address=address, byteSource=byteSource)
+    packetFramer = MindwavePacketFramer()
+    sampleClock = MindwaveSampleClock()
+    unframedBytes = b''
+    try:
+        mindwaveMobileRawReader.connectToMindWaveMobile()
+        while (True):
+            try:
+                chunk = mindwaveMobileRawReader.getAvailableBytesView()
+            except EOFError:
+                break
+            arrivalTime = time.monotonic()
+            payloads, unframed = packetFramer.framePackets(unframedBytes + chunk)
+            unframedBytes = bytes(unframed)
+            mindwaveMobileRawReader.clearAlreadyReadBuffer()
+            columns = decodePayloadColumns(payloads, arrivalTime)
+            columns["rawSampleTimes"] = sampleClock.sampleTimes(columns["rawTimestamps"])
+            headset.write(columns)
+    finally:
+        headset.markEnded()
+        mindwaveMobileRawReader.close()
+        headset.close()
+
+
+def _extractFeaturesFromBlocks(extractFeatures, headsetNumbers, descriptions, blockLength, resultQueue):
+    # Runs in a worker process: calls extractFeatures for every full block of
+    # blockLength raw values of its headsets and puts the results in the queue,
+    # None when all their streams ended.
+    headsets = [MindwaveSharedHeadset(descriptions=headsetDescriptions) for headsetDescriptions in descriptions]
+    sequences = [0] * len(headsets)
+    activeHeadsets = list(range(len(headsets)))
+    try:
+        while (activeHeadsets):
+            foundBlock = False
+            for headsetIndex in list(activeHeadsets):
+                rawRing = headsets[headsetIndex].rings["raw"]
+                hasEnded = rawRing.hasEnded()
+                if (rawRing.writtenRows() < sequences[headsetIndex] + blockLength):
+                    if (hasEnded):
+                        activeHeadsets.remove(headsetIndex)
+                    continue
+                sequence, rawColumns = rawRing.read(sequences[headsetIndex])
+                if (sequence % blockLength != 0):
+                    # fell behind, continue at the next block still available
+                    sequence += blockLength - sequence % blockLength
+                    sequence, rawColumns = rawRing.read(sequence)
+                sequences[headsetIndex] = sequence
+                if (len(rawColumns["raw"]) < blockLength):
+                    continue
+                rawColumns = {columnName: column[:blockLength] for columnName, column in rawColumns.items()}
+                result = extractFeatures(headsets[headsetIndex], sequence, rawColumns)
+                if (result is not None and not rawRing.isOverwritten(sequence)):
+                    resultQueue.put((headsetNumbers[headsetIndex], sequence, result))
+                sequences[headsetIndex] = sequence + blockLength
+                foundBlock = True
+                del rawColumns
+            if (not foundBlock):
+                time.sleep(POLL_INTERVAL)
+    finally:
+        resultQueue.put(None)
+        for headset in headsets:
+            headset.close()
+
+
+class MindwaveSharedMemoryPipeline:
+    # Decodes every headset in an acquisition process of its own into a
+    # MindwaveSharedHeadset, and extracts features in a pool of worker
+    # processes reading the shared memory, so neither shares a GIL with the
+    # others. Only the results of extractFeatures(headset, sequence, rawColumns)
+    # are pickled; it is called with views of every full block of blockLength
+    # raw values ("raw", "rawTimestamps", "rawSampleTimes") starting at raw
+    # sequence number sequence, and can read the other rings of the headset.
+    # Headsets are assigned to the worker processes in turn, so each block of
+    # a headset is processed by the same process, in order. Blocks
+    # overwritten before they were processed are skipped.
+    # The processes attach to the shared memory by the name and layout of
+    # every ring, so any startMethod of multiprocessing works (by default the
+    # platform's). Except with "fork", extractFeatures and the byte sources
+    # are pickled to the processes: extractFeatures has to be a module-level
+    # function and the byte sources unconnected, e.g. BytesByteSource or
+    # ReplayByteSource, and the main module has to guard starting the
+    # pipeline with if __name__ == '__main__'.
+    def __init__(self, extractFeatures, addresses=(), byteSources=(), processes=None,
+                 blockLength=512, capacitySeconds=DEFAULT_CAPACITY_SECONDS, startMethod=None):
+        self._extractFeatures = extractFeatures
+        self._startMethod = startMethod
+        self._sources = [{"address": address} for address in addresses] + \
+            [{"byteSource": byteSource} for byteSource in byteSources]
+        self._processes = min(processes or os.cpu_count(), len(self._sources))
+        self._blockLength = blockLength
+        # blocks do not wrap around the end of the raw ring
+        capacity = -(-int(capacitySeconds * SAMPLING_RATE) // blockLength) * blockLength
+        self._capacitySeconds = capacity / SAMPLING_RATE
+        self._headsets = []
+        self._acquisitionProcesses = []
+        self._workerProcesses = []
+        self._resultQueue = None
+        self._runningWorkers = 0
+
+    def start(self):
+        context = multiprocessing.get_context(self._startMethod)
+        self._resultQueue = context.Queue()
+        for source in self._sources:
+            headset = MindwaveSharedHeadset(self._capacitySeconds)
+            self._headsets.append(headset)
+            self._acquisitionProcesses.append(context.Process(
+                target=acquireIntoSharedMemory, args=(headset.descriptions(),), kwargs=source, daemon=True))
+        for workerNumber in range(self._processes):
+            headsetNumbers = list(range(workerNumber, len(self._headsets), self._processes))
+            self._workerProcesses.append(context.Process(
+                target=_extractFeaturesFromBlocks,
+                args=(self._extractFeatures, headsetNumbers,
+                      [self._headsets[headsetNumber].descriptions() for headsetNumber in headsetNumbers],
+                      self._blockLength, self._resultQueue), daemon=True))
+        self._runningWorkers = len(self._workerProcesses)
+        try:
+            for process in self._acquisitionProcesses + self._workerProcesses:
+                process.start()
+        except Exception:
+            # e.g. arguments that can not be pickled
+            self.stop()
+            raise
+
+    def headset(self, headsetNumber):
+        # the shared columns of a headset, numbered addresses first, then byte sources
+        return self._headsets[headsetNumber]
+
+    def readResult(self, timeout=None):
+        # (headset number, raw sequence number, result), None when all streams
+        # ended and their blocks were processed; queue.Empty on timeout
+        while (self._runningWorkers > 0):
+            result = self._resultQueue.get(timeout=timeout)
+            if (result is not None):
+                return result
+            self._runningWorkers -= 1
+        return None
+
+    def results(self):
+        while (True):
+            result = self.readResult()
+            if (result is None):
+                return
+            yield result
+
+    def stop(self, timeout=1.0):
+        for process in self._acquisitionProcesses + self._workerProcesses:
+            if (process.pid is None):
+                # not started
+                continue
+            process.join(timeout)
+            if (process.is_alive()):
+                process.terminate()
+                process.join()
+        for headset in self._headsets:
+            headset.close()
+        self._headsets = []
+        self._acquisitionProcesses = []
+        self._workerProcesses = []
@@ -0,0 +1,212 @@
+import collections
+import itertools
+import time
+
+from .MindwavePacketFramer import MindwavePacketFramer, MAXIMUM_PACKET_LENGTH
+from .MindwavePacketPayloadParser import MindwavePacketPayloadParser, DATA_POINT_CLASSES
+from .MindwaveRawBatchDecoder import MindwaveRawBatchDecoder
+
+
+class MindwaveStreamDecoder:
+    # Turns received chunks of the byte stream into data points or raw batches.
+    # Holds no connection, so the blocking and the asyncio reader share it.
+    # Subscribers are called by dispatchDataPoints right where a row is
+    # decoded, rows of other types are skipped without being decoded.
+    def __init__(self, maximumScanLength=None, metrics=None):
+        self._packetFramer = MindwavePacketFramer(maximumScanLength)
+        self._unframedBytes = b''
+        self._lastArrivalTime = None
+        self._payloadQueue = collections.deque()
+        self._payloadArrivalTimes = collections.deque()
+        self._dataPointQueue = collections.deque()
+        self._dataPointArrivalTimes = collections.deque()
+        self._lastDataPointArrivalTime = None
+        self._rawBatchDecoder = MindwaveRawBatchDecoder()
+        self._payloadParser = MindwavePacketPayloadParser()
+        self._subscriptions = []
+        self._createDispatchingParser()
+        if (metrics is not None):
+            self._instrument(metrics)
+
+    def _instrument(self, metrics):
+        # see MindwaveMetrics, without metrics the stages stay unmeasured
+        self.feedBytes = metrics.timed("framingSeconds", self.feedBytes)
+        self._readDataPointsFromPayload = metrics.timed("payloadParseSeconds",
+                                                        self._readDataPointsFromPayload)
+        self._rawBatchDecoder.decodePayload = metrics.timed("payloadParseSeconds",
+                                                            self._rawBatchDecoder.decodePayload)
+        getDataPointFromQueue = self._getDataPointFromQueue
+        def getMeasuredDataPointFromQueue():
+            # dispatch latency is the time from the arrival of the chunk
+            # until its data point is handed out
+            dataPoint = getDataPointFromQueue()
+            metrics.increment("dispatchedDataPoints")
+            metrics.observe("dispatchLatencySeconds",
+                            time.monotonic() - self._lastDataPointArrivalTime)
+            return dataPoint
+        self._getDataPointFromQueue = getMeasuredDataPointFromQueue
+        dispatchDataPoints = self.dispatchDataPoints
+        def dispatchCountedDataPoints():
+            dispatchedAmount = dispatchDataPoints()
+            metrics.increment("dispatchedDataPoints", dispatchedAmount)
+            return dispatchedAmount
+        self.dispatchDataPoints = dispatchCountedDataPoints
+        readRawBatch = self.readRawBatch
+        def readMeasuredRawBatch(amountOfSamples):
+            rawBatch = readRawBatch(amountOfSamples)
+            if (rawBatch is not None):
+                metrics.increment("dispatchedRawSamples", amountOfSamples)
+            return rawBatch
+        self.readRawBatch = readMeasuredRawBatch
+        metrics.registerCounters(self._packetFramer.statistics)
+        metrics.registerCounters(lambda: {"lostSamples": self.lostSamples()})
+        metrics.registerGauge("unframedBytes", lambda: len(self._unframedBytes))
+        metrics.registerGauge("queuedPayloads", lambda: len(self._payloadQueue))
+
+    def feedBytes(self, chunk, arrivalTime):
+        self._lastArrivalTime = arrivalTime
+        if (len(self._unframedBytes) > 0):
+            chunk = self._unframedBytes + chunk
+        payloads, unframedBytes = self._packetFramer.framePackets(chunk)
+        # the framer returns views on its own copy of the chunk,
+        # so the caller may reuse the chunk's memory right away
+        self._unframedBytes = bytes(unframedBytes)
+        self._payloadQueue.extend(payloads)
+        self._payloadArrivalTimes.extend(itertools.repeat(arrivalTime, len(payloads)))
+
+    def framingStatistics(self):
+        return self._packetFramer.statistics()
+
+    def lostSamples(self):
+        return self._rawBatchDecoder.sampleClock.lostSamples
+
+    def lastDataPointArrivalTime(self):
+        return self._lastDataPointArrivalTime
+
+    def discardUnframedBytes(self):
+        # after a reconnect the incomplete packet will never be completed
+        self._unframedBytes = b''
+
+    def readNextDataPoint(self):
+        # returns None if more bytes have to be fed first
+        while (not self._moreDataPointsInQueue()):
+            if (not self._morePayloadsInQueue()):
+                return None
+            self._putNextDataPointsInQueue()
+        return self._getDataPointFromQueue()
+
+    def putBackDataPoints(self, dataPoints):
+        # data points taken out too early, e.g. by a stopped acquisition
+        # thread, are returned first by readNextDataPoint again, with the
+        # arrival time of the last chunk
+        self._dataPointQueue.extendleft(reversed(dataPoints))
+        self._dataPointArrivalTimes.extendleft(itertools.repeat(self._lastArrivalTime, len(dataPoints)))
+
+    def readAvailableDataPoints(self, maximumAmount=None):
+        dataPoints = []
+        while (maximumAmount is None or len(dataPoints) < maximumAmount):
+            dataPoint = self.readNextDataPoint()
+            if (dataPoint is None):
+                break
+            dataPoints.append(dataPoint)
+        return dataPoints
+
+    def subscribe(self, callback, dataPointTypes):
+        # callback(dataPoint) for the data rows of dataPointTypes, data point
+        # classes (e.g. AttentionDataPoint) or data row codes (e.g. 0x04)
+        dataRowCodes = set()
+        for dataPointType in dataPointTypes:
+            if (isinstance(dataPointType, int)):
+                if (self._payloadParser.decoderOf(dataPointType) is None):
+                    raise ValueError("no decoder for data row code {:#04x}".format(dataPointType))
+                dataRowCodes.add(dataPointType)
+                continue
+            classDataRowCodes = [dataRowCode for dataRowCode, dataPointClass
+                                 in DATA_POINT_CLASSES.items() if dataPointClass is dataPointType]
+            if (len(classDataRowCodes) == 0):
+                raise ValueError("no data row code decodes to {}".format(dataPointType))
+            dataRowCodes.update(classDataRowCodes)
+        self._subscriptions.append((callback, dataRowCodes))
+        self._createDispatchingParser()
+
+    def unsubscribe(self, callback):
+        self._subscriptions = [(subscribedCallback, dataRowCodes) for subscribedCallback, dataRowCodes
+                               in self._subscriptions if subscribedCallback != callback]
+        self._createDispatchingParser()
+
+    def dispatchDataPoints(self):
+        # parses all framed payloads and calls the subscribers, returns the
+        # amount of dispatched data points
+        dispatchedAmount = 0
+        parseDataPoints = self._dispatchingParser.parseDataPoints
+        while (self._morePayloadsInQueue()):
+            self._lastDataPointArrivalTime, payloadBytes = self._getNextPayload()
+            # the decoders of the dispatching parser call the subscribers,
+            # their return values are one entry per dispatched data point
+            dispatchedAmount += len(parseDataPoints(payloadBytes))
+        return dispatchedAmount
+
+    def _createDispatchingParser(self):
+        callbacksOfDataRowCode = collections.defaultdict(list)
+        for callback, dataRowCodes in self._subscriptions:
+            for dataRowCode in dataRowCodes:
+                callbacksOfDataRowCode[dataRowCode].append(callback)
+        dispatchingParser = MindwavePacketPayloadParser()
+        for dataRowCode, callbacks in callbacksOfDataRowCode.items():
+            dispatchingParser.registerDecoder(dataRowCode, self._dispatchingDecoder(
+                self._payloadParser.decoderOf(dataRowCode), callbacks))
+        dispatchingParser.selectDataRowCodes(callbacksOfDataRowCode.keys())
+        self._dispatchingParser = dispatchingParser
+
+    def _dispatchingDecoder(self, decoder, callbacks):
+        if (len(callbacks) == 1):
+            callback = callbacks[0]
+            return lambda valueBytes: callback(decoder(valueBytes))
+        def decodeAndDispatch(valueBytes):
+            dataPoint = decoder(valueBytes)
+            for callback in callbacks:
+                callback(dataPoint)
+        return decodeAndDispatch
+
+    def readRawBatch(self, amountOfSamples):
+        # returns None if more bytes have to be fed first
+        while (self._rawBatchDecoder.amountOfSamples() < amountOfSamples):
+            if (not self._morePayloadsInQueue()):
+                return None
+            arrivalTime, payloadBytes = self._getNextPayload()
+            self._rawBatchDecoder.decodePayload(payloadBytes, arrivalTime)
+        return self._rawBatchDecoder.takeBatch(amountOfSamples)
+
+    def readRemainingRawBatch(self):
+        # all raw values decoded so far, e.g. at the end of the stream, None if there are none
+        while (self._morePayloadsInQueue()):
+            arrivalTime, payloadBytes = self._getNextPayload()
+            self._rawBatchDecoder.decodePayload(payloadBytes, arrivalTime)
+        if (self._rawBatchDecoder.amountOfSamples() == 0):
+            return None
+        return self._rawBatchDecoder.takeBatch(self._rawBatchDecoder.amountOfSamples())
+
+    def _moreDataPointsInQueue(self):
+        return len(self._dataPointQueue) > 0
+
+    def _getDataPointFromQueue(self):
+        self._lastDataPointArrivalTime = self._dataPointArrivalTimes.popleft()
+        return self._dataPointQueue.popleft();
+
+    def _putNextDataPointsInQueue(self):
+        arrivalTime, payloadBytes = self._getNextPayload()
+        dataPoints = self._readDataPointsFromPayload(payloadBytes)
+        self._dataPointQueue.extend(dataPoints)
+        self._dataPointArrivalTimes.extend(itertools.repeat(arrivalTime, len(dataPoints)))
+
+    def _morePayloadsInQueue(self):
+        if (len(self._payloadQueue) == 0 and len(self._unframedBytes) > MAXIMUM_PACKET_LENGTH):
+            # the framer stopped at its scan budget, resume where it stopped
+            self.feedBytes(b'', self._lastArrivalTime)
+        return len(self._payloadQueue) > 0
+
+    def _getNextPayload(self):
+        return self._payloadArrivalTimes.popleft(), self._payloadQueue.popleft()
+
+    def _readDataPointsFromPayload(self, payloadBytes):
+        return self._payloadParser.parseDataPoints(payloadBytes);
@@ -0,0 +1,84 @@
+import math
+import random
+
+from .MindwaveDataPoints import SAMPLING_RATE
+
+
+def createPacket(payload):
+    checkSum = (~sum(payload)) & 0xff
+    return bytes([0xaa, 0xaa, len(payload)]) + bytes(payload) + bytes([checkSum])
+
+
+def corruptStream(stream, corruptedByteRatio=0.02, seed=1):
+    # flips random bytes and inserts false sync bytes
+    randomGenerator = random.Random(seed)
+    corruptedStream = bytearray(stream)
+    for _ in range(int(len(stream) * corruptedByteRatio)):
+        position = randomGenerator.randrange(len(corruptedStream))
+        if (randomGenerator.random() < 0.5):
+            corruptedStream[position] ^= 1 << randomGenerator.randrange(8)
+        else:
+            corruptedStream[position:position] = b'\xaa\xaa'
+    return bytes(corruptedStream)
+
+
+class MindwaveStreamGenerator:
+    # Generates a synthetic ThinkGear byte stream like the one of the headset:
+    # one raw value packet per sample at 512 Hz and once per second a packet
+    # with poor signal level, EEG powers, attention and meditation.
+    # Blink packets and corrupted packets appear with the given probabilities.
+    def __init__(self, seed=0, corruptionProbability=0.0, blinkProbability=0.01):
+        self._random = random.Random(seed)
+        self._corruptionProbability = corruptionProbability
+        self._blinkProbability = blinkProbability
+        self.sampleNumber = 0
+        self.generatedPackets = 0
+        self.corruptedPackets = 0
+
+    def generate(self, seconds):
+        return b''.join(self.nextPacket() for _ in range(int(seconds * SAMPLING_RATE)))
+
+    def nextPacket(self):
+        # one raw value packet, followed by the other packets that are due
+        packet = createPacket(self._rawValuePayload())
+        self.sampleNumber += 1
+        if (self.sampleNumber % SAMPLING_RATE == 0):
+            packet += createPacket(self._eSensePayload())
+        if (self._random.random() < self._blinkProbability):
+            packet += createPacket([0x16, self._random.randint(0, 255)])
+        if (self._random.random() < self._corruptionProbability):
+            packet = self._corrupt(packet)
+        self.generatedPackets += 1
+        return packet
+
+    def rawValue(self, sampleNumber):
+        time = sampleNumber / SAMPLING_RATE
+        return int(400 * math.sin(2 * math.pi * 10 * time) +
+                   150 * math.sin(2 * math.pi * 3 * time) +
+                   60 * math.sin(2.4 * sampleNumber))
+
+    def _rawValuePayload(self):
+        rawValue = self.rawValue(self.sampleNumber) & 0xffff
+        return [0x80, 0x02, rawValue >> 8, rawValue & 0xff]
+
+    def _eSensePayload(self):
+        eegPowerBytes = []
+        for _ in range(8):
+            eegPower = self._random.randint(0, 1 << 20)
+            eegPowerBytes.extend([eegPower >> 16, (eegPower >> 8) & 0xff, eegPower & 0xff])
+        return ([0x02, self._random.choice([0, 0, 0, 26, 51, 200])] +
+                [0x83, 0x18] + eegPowerBytes +
+                [0x04, self._random.randint(0, 100), 0x05, self._random.randint(0, 100)])
+
+    def _corrupt(self, packet):
+        self.corruptedPackets += 1
+        corruptedPacket = bytearray(packet)
+        corruption = self._random.random()
+        position = self._random.randrange(len(corruptedPacket))
+        if (corruption < 0.5):
+            corruptedPacket[position] ^= 1 << self._random.randrange(8)
+        elif (corruption < 0.8):
+            del corruptedPacket[position:]
+        else:
+            corruptedPacket.insert(position, 0xaa)
+        return bytes(corruptedPacket)
@@ -0,0 +1,119 @@
+import asyncio
+import socket
+import unittest
+from mindwavemobile.AsyncMindwaveDataPointReader import AsyncMindwaveDataPointReader
+from mindwavemobile.MindwaveDataPoints import AttentionDataPoint, RawDataPoint
+from mindwavemobile.MindwaveStreamGenerator import createPacket
+
+
+class AsyncReaderTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self._connections = 0
+        self._silence = asyncio.Event()
+        self._server = await asyncio.start_server(self._sendPackets, "127.0.0.1", 0)
+        address = self._server.sockets[0].getsockname()
+        self._reader = AsyncMindwaveDataPointReader(address=address, family=socket.AF_INET,
+                                                    reconnectDelay=0.01)
+        await self._reader.start()
+
+    async def asyncTearDown(self):
+        self._reader.close()
+        self._silence.set()
+        self._server.close()
+        await self._server.wait_closed()
+
+    async def _sendPackets(self, streamReader, streamWriter):
+        # first connection is closed after some packets to test reconnecting
+        self._connections += 1
+        streamWriter.write(createPacket([0x04, 0x25]) + createPacket([0x80, 0x02, 0x60, 0x00]) * 4)
+        await streamWriter.drain()
+        if (self._connections > 1):
+            await self._silence.wait()
+        streamWriter.close()
+
+    async def testIteratingDataPoints(self):
+        dataPoints = []
+        async for dataPoint in self._reader:
+            dataPoints.append(dataPoint)
+            if (len(dataPoints) == 5):
+                break
+        self.assertIs(dataPoints[0].__class__, AttentionDataPoint, "should read attention first")
+        self.assertTrue(all(dataPoint.__class__ is RawDataPoint for dataPoint in dataPoints[1:]),
+                        "should read raw values afterwards")
+
+    async def testReadingRawBatchAcrossReconnect(self):
+        rawBatch = await self._reader.readRawBatch(6)
+        self.assertEqual(rawBatch.samples.tolist(), [0x6000] * 6,
+                         "should read samples from both connections")
+        self.assertEqual(self._reader.reconnects, 1, "should have reconnected once")
+
+
+class AsyncCloseAndTimeoutTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        # sends one packet per connection and stays silent afterwards
+        self._connections = 0
+        self._server = await asyncio.start_server(self._sendPacket, "127.0.0.1", 0)
+        self._address = "tcp:{}:{}".format(*self._server.sockets[0].getsockname())
+        self._silence = asyncio.Event()
+
+    async def asyncTearDown(self):
+        self._silence.set()
+        self._server.close()
+        await self._server.wait_closed()
+
+    async def _sendPacket(self, streamReader, streamWriter):
+        self._connections += 1
+        streamWriter.write(createPacket([0x04, 0x25]))
+        await streamWriter.drain()
+        await self._silence.wait()
+        streamWriter.close()
+
+    async def testClosingDuringPendingRead(self):
+        reader = AsyncMindwaveDataPointReader(address=self._address)
+        await reader.start()
+        await reader.readNextDataPoint()
+        pendingRead = asyncio.ensure_future(reader.readNextDataPoint())
+        await asyncio.sleep(0.05)
+        reader.close()
+        with self.assertRaises(EOFError):
+            await asyncio.wait_for(pendingRead, 1)
+        with self.assertRaises(EOFError):
+            await reader.readNextDataPoint()
+        self.assertFalse(reader.isConnected())
+
+    async def testReconnectingSilentHeadset(self):
+        reader = AsyncMindwaveDataPointReader(address=self._address, receiveTimeout=0.1, reconnectDelay=0.01)
+        await reader.start()
+        dataPoints = [await asyncio.wait_for(reader.readNextDataPoint(), 1) for _ in range(2)]
+        self.assertEqual([dataPoint.attentionValue for dataPoint in dataPoints], [0x25, 0x25],
+                         "should read the packet of the second connection")
+        self.assertEqual(reader.reconnects, 1, "should reconnect when the headset is silent")
+        reader.close()
+
+    async def testClosingDuringBackoff(self):
+        self._server.close()
+        await self._server.wait_closed()
+        reader = AsyncMindwaveDataPointReader(address=self._address, reconnectDelay=10)
+        connecting = asyncio.ensure_future(reader.start())
+        await asyncio.sleep(0.05)
+        reader.close()
+        with self.assertRaises(EOFError):
+            await asyncio.wait_for(connecting, 1)
+
+
+class BluetoothFamilyTest(unittest.TestCase):
+    def testRequiringFamilyWithoutBluetooth(self):
+        # as on platforms without socket.AF_BLUETOOTH
+        bluetoothFamily = getattr(socket, "AF_BLUETOOTH", None)
+        if (bluetoothFamily is not None):
+            del socket.AF_BLUETOOTH
+        try:
+            with self.assertRaises(ValueError):
+                AsyncMindwaveDataPointReader(address="9C:B7:0D:72:CD:02")
+        finally:
+            if (bluetoothFamily is not None):
+                socket.AF_BLUETOOTH = bluetoothFamily
+
+
+if __name__ == '__main__':
+    unittest.main()
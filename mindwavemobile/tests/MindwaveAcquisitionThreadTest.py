@@ -0,0 +1,110 @@
+import socket
+import threading
+import unittest
+from mindwavemobile.MindwaveAcquisitionThread import MindwaveAcquisitionThread,\
+    DROP_OLDEST, DROP_NEWEST, BLOCK
+from mindwavemobile.MindwaveByteSources import BytesByteSource, ConnectedSocketByteSource
+from mindwavemobile.MindwaveDataPointReader import MindwaveDataPointReader
+from mindwavemobile.MindwaveDataPoints import AttentionDataPoint
+from mindwavemobile.MindwaveStreamGenerator import MindwaveStreamGenerator, createPacket
+
+
+class AcquisitionThreadTest(unittest.TestCase):
+    def _startThread(self, overflowPolicy, chunks):
+        # hands off the given chunks of numbers after allChunksRead was set
+        self._allChunksRead = threading.Event()
+        remainingChunks = list(chunks)
+        def readDataPoints():
+            if (len(remainingChunks) == 0):
+                self._allChunksRead.set()
+                raise EOFError("no more chunks")
+            return remainingChunks.pop(0)
+        acquisitionThread = MindwaveAcquisitionThread(readDataPoints, maximumQueueLength=3,
+                                                      overflowPolicy=overflowPolicy)
+        acquisitionThread.start()
+        return acquisitionThread
+
+    def testDroppingOldest(self):
+        acquisitionThread = self._startThread(DROP_OLDEST, [[1, 2], [3, 4, 5]])
+        self._allChunksRead.wait(1)
+        self.assertEqual(acquisitionThread.readDataPoints(10), [3, 4, 5], "should keep newest")
+        self.assertEqual(acquisitionThread.droppedDataPoints, 2, "should count dropped points")
+
+    def testDroppingNewest(self):
+        acquisitionThread = self._startThread(DROP_NEWEST, [[1, 2], [3, 4, 5]])
+        self._allChunksRead.wait(1)
+        self.assertEqual(acquisitionThread.readDataPoints(10), [1, 2, 3], "should keep oldest")
+        self.assertEqual(acquisitionThread.droppedDataPoints, 2, "should count dropped points")
+
+    def testBlocking(self):
+        acquisitionThread = self._startThread(BLOCK, [[1, 2], [3, 4, 5]])
+        dataPoints = [acquisitionThread.readNextDataPoint(timeout=1) for _ in range(5)]
+        self.assertEqual(dataPoints, [1, 2, 3, 4, 5], "should not drop anything")
+        self.assertEqual(acquisitionThread.droppedDataPoints, 0, "nothing should be dropped")
+        self.assertRaises(EOFError, acquisitionThread.readNextDataPoint)
+
+    def testStoppingWithoutStarting(self):
+        acquisitionThread = MindwaveAcquisitionThread(lambda: [1], maximumQueueLength=3)
+        self.assertTrue(acquisitionThread.stop(), "nothing should be left running")
+        with self.assertRaises(EOFError):
+            acquisitionThread.readNextDataPoint(timeout=1)
+        mindwaveDataPointReader = MindwaveDataPointReader(byteSource=BytesByteSource(b""))
+        mindwaveDataPointReader.stopAcquisitionThread()
+
+    def testStartingTwice(self):
+        readingSocket, headsetSocket = socket.socketpair()
+        mindwaveDataPointReader = MindwaveDataPointReader(byteSource=ConnectedSocketByteSource(readingSocket))
+        mindwaveDataPointReader.start()
+        mindwaveDataPointReader.startAcquisitionThread()
+        with self.assertRaises(RuntimeError):
+            mindwaveDataPointReader.startAcquisitionThread()
+        headsetSocket.sendall(createPacket([0x04, 0x25]))
+        mindwaveDataPointReader.stopAcquisitionThread()
+        readingSocket.close()
+        headsetSocket.close()
+
+    def testReadingInBackgroundThread(self):
+        stream = MindwaveStreamGenerator(blinkProbability=0).generate(1)
+        mindwaveDataPointReader = MindwaveDataPointReader(byteSource=BytesByteSource(stream, 100))
+        mindwaveDataPointReader.start()
+        mindwaveDataPointReader.startAcquisitionThread(maximumQueueLength=10000)
+        dataPoints = []
+        try:
+            while (True):
+                dataPoints.extend(mindwaveDataPointReader.readDataPoints(100))
+        except EOFError:
+            pass
+        self.assertEqual(len(dataPoints), 512 + 4, "should read all data points")
+        self.assertEqual(mindwaveDataPointReader.droppedDataPoints(), 0, "nothing should be dropped")
+
+    def testKeepingQueuedDataPointsAfterStopping(self):
+        stream = MindwaveStreamGenerator(blinkProbability=0).generate(1)
+        mindwaveDataPointReader = MindwaveDataPointReader(byteSource=BytesByteSource(stream, 100))
+        mindwaveDataPointReader.start()
+        mindwaveDataPointReader.startAcquisitionThread(maximumQueueLength=10000)
+        dataPoints = mindwaveDataPointReader.readDataPoints(10)
+        mindwaveDataPointReader.stopAcquisitionThread()
+        try:
+            while (True):
+                dataPoints.append(mindwaveDataPointReader.readNextDataPoint())
+        except EOFError:
+            pass
+        self.assertEqual(len(dataPoints), 512 + 4, "queued data points should be read after stopping")
+
+    def testStoppingWhileWaitingForBytes(self):
+        readingSocket, headsetSocket = socket.socketpair()
+        mindwaveDataPointReader = MindwaveDataPointReader(byteSource=ConnectedSocketByteSource(readingSocket))
+        mindwaveDataPointReader.start()
+        mindwaveDataPointReader.startAcquisitionThread()
+        with self.assertRaises(RuntimeError):
+            mindwaveDataPointReader.stopAcquisitionThread(timeout=0.1)
+        headsetSocket.sendall(createPacket([0x04, 0x25]))
+        mindwaveDataPointReader.stopAcquisitionThread()
+        dataPoint = mindwaveDataPointReader.readNextDataPoint()
+        self.assertIs(dataPoint.__class__, AttentionDataPoint, "should keep the data point read by the thread")
+        readingSocket.close()
+        headsetSocket.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,40 @@
+import unittest
+import numpy as np
+from mindwavemobile.MindwaveBandPowerEstimator import MindwaveBandPowerEstimator
+
+
+class BandPowerEstimatorTest(unittest.TestCase):
+    def setUp(self):
+        time = np.arange(2048) / 512.0
+        self._samples = 300 * np.sin(2 * np.pi * 10.5 * time) + 50 * np.sin(2 * np.pi * 5 * time)
+
+    def testFindingDominantBand(self):
+        estimator = MindwaveBandPowerEstimator()
+        bandPowers = estimator.addSamples(self._samples)
+        self.assertEqual(bandPowers.shape, ((2048 - 256) // 32 + 1, 8), "one estimate per hop")
+        latestBandPowers = estimator.latestBandPowers()
+        self.assertEqual(max(latestBandPowers, key=latestBandPowers.get), "highAlpha",
+                         "10.5 Hz should be in the high alpha band")
+        self.assertGreater(latestBandPowers["theta"], latestBandPowers["delta"],
+                           "5 Hz should be in the theta band")
+
+    def testIncrementalUpdatesEqualOneBlock(self):
+        estimator = MindwaveBandPowerEstimator()
+        blockBandPowers = estimator.addSamples(self._samples)
+        estimator = MindwaveBandPowerEstimator()
+        incrementalBandPowers = np.concatenate([estimator.addSamples(self._samples[start:start + 20])
+                                                for start in range(0, 2048, 20)])
+        np.testing.assert_allclose(incrementalBandPowers, blockBandPowers)
+
+    def testAveragingLastSegments(self):
+        estimator = MindwaveBandPowerEstimator(segmentLength=256, hopLength=64, averagedSegments=3)
+        bandPowers = estimator.addSamples(self._samples[:512])
+        singleSegmentEstimator = MindwaveBandPowerEstimator(segmentLength=256, hopLength=64,
+                                                            averagedSegments=1)
+        segmentBandPowers = singleSegmentEstimator.addSamples(self._samples[:512])
+        np.testing.assert_allclose(bandPowers[-1], segmentBandPowers[-3:].mean(axis=0))
+        np.testing.assert_allclose(bandPowers[0], segmentBandPowers[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,122 @@
+import os
+import socket
+import tempfile
+import unittest
+from mindwavemobile.MindwaveByteSources import SocketByteSource, RecordingByteSource,\
+    ReplayByteSource, BytesByteSource, CAPTURE_FILE_HEADER, CAPTURE_RECORD_HEADER
+from mindwavemobile.MindwaveDataPointReader import MindwaveDataPointReader
+from mindwavemobile.MindwaveDataPoints import AttentionDataPoint
+from mindwavemobile.MindwaveStreamGenerator import createPacket
+
+
+class RecordAndReplayTest(unittest.TestCase):
+    def setUp(self):
+        self._captureDirectory = tempfile.TemporaryDirectory()
+        self._capturePath = os.path.join(self._captureDirectory.name, "capture.mwc")
+        self._stream = createPacket([0x04, 0x25]) + b''.join(
+            createPacket([0x80, 0x02, sampleNumber, 0x01]) for sampleNumber in range(100))
+        self._recordStream()
+
+    def tearDown(self):
+        self._captureDirectory.cleanup()
+
+    def _recordStream(self):
+        server = socket.create_server(("127.0.0.1", 0))
+        byteSource = RecordingByteSource(SocketByteSource(server.getsockname()),
+                                         self._capturePath)
+        mindwaveDataPointReader = MindwaveDataPointReader(byteSource=byteSource)
+        mindwaveDataPointReader.start()
+        headsetSocket, _ = server.accept()
+        headsetSocket.sendall(self._stream[:50])
+        self._firstDataPoint = mindwaveDataPointReader.readNextDataPoint()
+        headsetSocket.sendall(self._stream[50:])
+        headsetSocket.close()
+        server.close()
+        # read until the end so everything is recorded
+        self.assertEqual(len(list(mindwaveDataPointReader.iterRawBatches(1))), 100,
+                         "should read all samples while recording")
+        byteSource.close()
+
+    def testReadingWhileRecording(self):
+        self.assertIs(self._firstDataPoint.__class__, AttentionDataPoint,
+                      "should read data points from the recorded source")
+
+    def testReplayingCapture(self):
+        mindwaveDataPointReader = MindwaveDataPointReader(
+            byteSource=ReplayByteSource(self._capturePath))
+        mindwaveDataPointReader.start()
+        rawBatches = list(mindwaveDataPointReader.iterRawBatches(10))
+        samples = [sample for rawBatch in rawBatches for sample in rawBatch.samples.tolist()]
+        self.assertEqual(samples, [(sampleNumber << 8) | 0x01 for sampleNumber in range(100)],
+                         "should replay all recorded samples")
+
+    def testReplayingTrailingPartialBatch(self):
+        mindwaveDataPointReader = MindwaveDataPointReader(
+            byteSource=ReplayByteSource(self._capturePath))
+        mindwaveDataPointReader.start()
+        batchLengths = [len(rawBatch.samples) for rawBatch in mindwaveDataPointReader.iterRawBatches(30)]
+        self.assertEqual(batchLengths, [30, 30, 30, 10], "should end with the remaining samples")
+        mindwaveDataPointReader = MindwaveDataPointReader(
+            byteSource=ReplayByteSource(self._capturePath))
+        mindwaveDataPointReader.start()
+        batchLengths = [len(rawBatch.samples)
+                        for rawBatch in mindwaveDataPointReader.iterRawBatches(30, dropPartialBatch=True)]
+        self.assertEqual(batchLengths, [30, 30, 30], "should drop the remaining samples")
+
+    def testReplayingInRealTime(self):
+        byteSource = ReplayByteSource(self._capturePath, realTime=True)
+        byteSource.connect()
+        replayedBytes = b''
+        buffer = bytearray(1000)
+        receivedAmount = byteSource.recv_into(buffer)
+        while (receivedAmount > 0):
+            replayedBytes += buffer[:receivedAmount]
+            receivedAmount = byteSource.recv_into(buffer)
+        byteSource.close()
+        self.assertEqual(replayedBytes, self._stream, "should replay the recorded bytes")
+
+    def testAppendingAfterReconnect(self):
+        byteSource = RecordingByteSource(BytesByteSource(b'more'), self._capturePath)
+        byteSource.connect()
+        buffer = bytearray(10)
+        byteSource.recv_into(buffer)
+        byteSource.close()
+        # a reader reconnecting closes and connects again
+        byteSource.connect()
+        byteSource.recv_into(buffer)
+        byteSource.close()
+        self.assertEqual(self._replayAll(), self._stream + b'moremore', "should keep everything recorded")
+
+    def testReplayingInterruptedRecording(self):
+        with open(self._capturePath, "wb") as captureFile:
+            captureFile.write(CAPTURE_FILE_HEADER + CAPTURE_RECORD_HEADER.pack(1.0, 100) + bytes(range(10)))
+        self.assertEqual(self._replayAll(), bytes(range(10)), "should replay the recorded part of the record")
+
+    def testClosingWithoutConnecting(self):
+        RecordingByteSource(BytesByteSource(b''), self._capturePath).close()
+        ReplayByteSource(self._capturePath).close()
+        replaySource = ReplayByteSource(os.path.join(self._captureDirectory.name, "missing.mwc"))
+        self.assertRaises(OSError, replaySource.connect)
+        replaySource.close()
+
+    def _replayAll(self):
+        byteSource = ReplayByteSource(self._capturePath)
+        byteSource.connect()
+        replayedBytes = b''
+        buffer = bytearray(1000)
+        receivedAmount = byteSource.recv_into(buffer)
+        while (receivedAmount > 0):
+            replayedBytes += buffer[:receivedAmount]
+            receivedAmount = byteSource.recv_into(buffer)
+        byteSource.close()
+        return replayedBytes
+
+    def testReplayingOtherFileFails(self):
+        with open(self._capturePath, "wb") as captureFile:
+            captureFile.write(b"no capture")
+        self.assertRaises(ValueError, ReplayByteSource(self._capturePath).connect)
+        self.assertRaises(ValueError, RecordingByteSource(BytesByteSource(b''), self._capturePath).connect)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+import os
+import random
+import tempfile
+import unittest
+import numpy as np
+from mindwavemobile.MindwaveByteSources import CAPTURE_FILE_HEADER, CAPTURE_RECORD_HEADER
+from mindwavemobile.MindwaveCaptureDecoder import decodeCapture, decodeCaptures, writeColumns
+from mindwavemobile.MindwaveDataPoints import RawDataPoint, AttentionDataPoint, EEGPowersDataPoint
+from mindwavemobile.MindwaveStreamDecoder import MindwaveStreamDecoder
+from mindwavemobile.MindwaveStreamGenerator import MindwaveStreamGenerator, corruptStream
+
+
+def writeCapture(capturePath, stream, seed):
+    # records of random length, arriving every 10 ms
+    randomGenerator = random.Random(seed)
+    records = []
+    position = 0
+    while (position < len(stream)):
+        chunkLength = randomGenerator.randint(1, 300)
+        records.append((position * 0.0001, stream[position:position + chunkLength]))
+        position += chunkLength
+    with open(capturePath, "wb") as captureFile:
+        captureFile.write(CAPTURE_FILE_HEADER)
+        for arrivalTime, chunk in records:
+            captureFile.write(CAPTURE_RECORD_HEADER.pack(arrivalTime, len(chunk)))
+            captureFile.write(chunk)
+    return records
+
+
+def decodeSequentially(records):
+    streamDecoder = MindwaveStreamDecoder()
+    raw, rawTimestamps, attention, eegPowers = [], [], [], []
+    for arrivalTime, chunk in records:
+        streamDecoder.feedBytes(chunk, arrivalTime)
+        for dataPoint in streamDecoder.readAvailableDataPoints():
+            if (isinstance(dataPoint, RawDataPoint)):
+                raw.append(dataPoint.rawValue)
+                rawTimestamps.append(streamDecoder.lastDataPointArrivalTime())
+            elif (isinstance(dataPoint, AttentionDataPoint)):
+                attention.append(dataPoint.attentionValue)
+            elif (isinstance(dataPoint, EEGPowersDataPoint)):
+                eegPowers.append([dataPoint.delta, dataPoint.theta, dataPoint.lowAlpha,
+                                  dataPoint.highAlpha, dataPoint.lowBeta, dataPoint.highBeta,
+                                  dataPoint.lowGamma, dataPoint.midGamma])
+    return raw, rawTimestamps, attention, eegPowers
+
+
+class DecodeCaptureTest(unittest.TestCase):
+    def setUp(self):
+        self._captureDirectory = tempfile.TemporaryDirectory()
+        self._capturePaths = []
+        self._records = []
+        for captureNumber in range(2):
+            stream = MindwaveStreamGenerator(seed=captureNumber, corruptionProbability=0.05).generate(4)
+            capturePath = os.path.join(self._captureDirectory.name, "{}.mwc".format(captureNumber))
+            self._records.append(writeCapture(capturePath, corruptStream(stream, seed=captureNumber),
+                                              captureNumber))
+            self._capturePaths.append(capturePath)
+
+    def tearDown(self):
+        self._captureDirectory.cleanup()
+
+    def _assertColumnsEqualSequentialDecoding(self, columns, records):
+        raw, rawTimestamps, attention, eegPowers = decodeSequentially(records)
+        self.assertEqual(columns["raw"].tolist(), raw, "should decode the same raw values")
+        self.assertEqual(columns["rawTimestamps"].tolist(), rawTimestamps,
+                         "should use the arrival times of the records")
+        self.assertEqual(columns["attention"].tolist(), attention)
+        self.assertEqual(columns["eegPowers"].tolist(), eegPowers)
+
+    def testDecodingInOneProcess(self):
+        columns = decodeCapture(self._capturePaths[0], processes=1)
+        self._assertColumnsEqualSequentialDecoding(columns, self._records[0])
+
+    def testStitchingSmallRegions(self):
+        # region boundaries in the middle of packets and of false syncs
+        for regionLength in [173, 500, 1009]:
+            columns = decodeCapture(self._capturePaths[0], processes=1, regionLength=regionLength)
+            self._assertColumnsEqualSequentialDecoding(columns, self._records[0])
+
+    def testDecodingWithProcessPool(self):
+        allColumns = decodeCaptures(self._capturePaths, processes=2, regionLength=4096)
+        for columns, records in zip(allColumns, self._records):
+            self._assertColumnsEqualSequentialDecoding(columns, records)
+
+    def testWritingColumns(self):
+        columns = decodeCapture(self._capturePaths[1], processes=1)
+        outputPath = os.path.join(self._captureDirectory.name, "columns.npz")
+        writeColumns(columns, outputPath)
+        with np.load(outputPath) as writtenColumns:
+            self.assertEqual(sorted(writtenColumns.files), sorted(columns.keys()))
+            self.assertTrue(np.array_equal(writtenColumns["eegPowers"], columns["eegPowers"]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,114 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+from mindwavemobile.MindwaveByteSources import BytesByteSource
+from mindwavemobile.MindwaveColumnStore import MindwaveColumnStoreWriter, MindwaveColumnStoreReader
+from mindwavemobile.MindwaveDataPointReader import MindwaveDataPointReader
+from mindwavemobile.MindwaveDataPoints import RawDataPoint, AttentionDataPoint, EEGPowersDataPoint
+from mindwavemobile.MindwaveStreamGenerator import MindwaveStreamGenerator
+
+
+def readAllDataPoints(stream):
+    # data points with their arrival times
+    mindwaveDataPointReader = MindwaveDataPointReader(byteSource=BytesByteSource(stream, chunkSize=64))
+    mindwaveDataPointReader.start()
+    dataPoints = []
+    try:
+        while (True):
+            dataPoint = mindwaveDataPointReader.readNextDataPoint()
+            dataPoints.append((dataPoint, mindwaveDataPointReader.lastArrivalTime()))
+    except EOFError:
+        pass
+    return dataPoints
+
+
+class ColumnStoreTest(unittest.TestCase):
+    def setUp(self):
+        self._storeDirectory = tempfile.TemporaryDirectory()
+        self._dataPoints = readAllDataPoints(MindwaveStreamGenerator(seed=2).generate(4))
+
+    def tearDown(self):
+        self._storeDirectory.cleanup()
+
+    def _writeStore(self, compress):
+        writer = MindwaveColumnStoreWriter(self._storeDirectory.name, chunkRows=500, compress=compress)
+        for dataPoint, timestamp in self._dataPoints:
+            writer.appendDataPoint(dataPoint, timestamp)
+        writer.close()
+        return MindwaveColumnStoreReader(self._storeDirectory.name)
+
+    def _expectedRows(self, dataPointClass, startTime, endTime):
+        return [(dataPoint, timestamp) for dataPoint, timestamp in self._dataPoints
+                if dataPoint.__class__ is dataPointClass and startTime <= timestamp < endTime]
+
+    def _assertTimeRangesAreRead(self, reader):
+        rawTimestamps = [timestamp for dataPoint, timestamp in self._dataPoints
+                         if dataPoint.__class__ is RawDataPoint]
+        for startTime, endTime in [(rawTimestamps[0], rawTimestamps[-1] + 1),
+                                   (rawTimestamps[700], rawTimestamps[1300]),
+                                   (rawTimestamps[10], rawTimestamps[20])]:
+            rows = reader.read("raw", startTime, endTime)
+            expectedRows = self._expectedRows(RawDataPoint, startTime, endTime)
+            self.assertEqual(rows.values.tolist(), [dataPoint.rawValue for dataPoint, timestamp in expectedRows])
+            self.assertEqual(rows.timestamps.tolist(), [timestamp for dataPoint, timestamp in expectedRows])
+        eegPowers = reader.read("eegPowers")
+        self.assertEqual(eegPowers.values.tolist(), [
+            [dataPoint.delta, dataPoint.theta, dataPoint.lowAlpha, dataPoint.highAlpha,
+             dataPoint.lowBeta, dataPoint.highBeta, dataPoint.lowGamma, dataPoint.midGamma]
+            for dataPoint, timestamp in self._expectedRows(EEGPowersDataPoint, 0, float("inf"))])
+        self.assertEqual(reader.read("attention").values.tolist(), [
+            dataPoint.attentionValue
+            for dataPoint, timestamp in self._expectedRows(AttentionDataPoint, 0, float("inf"))])
+
+    def testReadingTimeRanges(self):
+        reader = self._writeStore(compress=False)
+        self.assertEqual(reader.rowCount("raw"), 4 * 512)
+        self._assertTimeRangesAreRead(reader)
+        rows = reader.read("raw", *reader.timeRange("raw"))
+        self.assertIsInstance(reader.read("raw", 0, rows.timestamps[100]).values, np.memmap,
+                              "rows of one chunk should be mapped, not loaded")
+
+    def testReadingCompressedChunks(self):
+        reader = self._writeStore(compress=True)
+        self._assertTimeRangesAreRead(reader)
+        plainSize = 4 * 512 * (2 + 8)
+        compressedSize = sum(os.path.getsize(os.path.join(self._storeDirectory.name, "raw", fileName))
+                             for fileName in os.listdir(os.path.join(self._storeDirectory.name, "raw")))
+        self.assertLess(compressedSize, plainSize / 2, "should compress raw values and timestamps")
+
+    def testAppendingToExistingStore(self):
+        half = len(self._dataPoints) // 2
+        for dataPoints in [self._dataPoints[:half], self._dataPoints[half:]]:
+            writer = MindwaveColumnStoreWriter(self._storeDirectory.name, chunkRows=300)
+            for dataPoint, timestamp in dataPoints:
+                writer.appendDataPoint(dataPoint, timestamp)
+            writer.close()
+        self._assertTimeRangesAreRead(MindwaveColumnStoreReader(self._storeDirectory.name))
+
+    def testWritingSlowColumnsBeforeClosing(self):
+        # chunks of one second of raw values, attention arrives once per second;
+        # timestamps as if the stream arrived in real time
+        rawValues = 0
+        retimedDataPoints = []
+        for dataPoint, timestamp in self._dataPoints:
+            retimedDataPoints.append((dataPoint, rawValues / 512))
+            rawValues += dataPoint.__class__ is RawDataPoint
+        self._dataPoints = retimedDataPoints
+        writer = MindwaveColumnStoreWriter(self._storeDirectory.name, chunkRows=512)
+        for dataPoint, timestamp in self._dataPoints:
+            writer.appendDataPoint(dataPoint, timestamp)
+        reader = MindwaveColumnStoreReader(self._storeDirectory.name)
+        self.assertGreater(reader.rowCount("attention"), 0, "should write attention rows of the first seconds")
+        writer.close()
+        reader.refresh()
+        self._assertTimeRangesAreRead(reader)
+
+    def testReadingEmptyRange(self):
+        reader = self._writeStore(compress=False)
+        rows = reader.read("eegPowers", 0, 1)
+        self.assertEqual(rows.values.shape, (0, 8))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+import unittest
+import numpy as np
+from mindwavemobile.MindwaveByteSources import BytesByteSource
+from mindwavemobile.MindwaveDataPointReader import MindwaveDataPointReader
+from mindwavemobile.MindwaveRawBatchDecoder import MindwaveRawBatch
+from mindwavemobile.MindwaveDecimator import MindwaveDecimator
+from mindwavemobile.MindwaveStreamGenerator import MindwaveStreamGenerator
+
+
+def sine(frequency, amountOfSamples, samplingRate=512):
+    return 1000 * np.sin(2 * np.pi * frequency * np.arange(amountOfSamples) / samplingRate)
+
+
+class DecimatorTest(unittest.TestCase):
+    def testFilteringLikeConvolution(self):
+        decimator = MindwaveDecimator(factor=4)
+        samples = np.random.RandomState(0).randint(-2000, 2000, 5000)
+        expectedSamples = np.convolve(samples, decimator.taps)[:len(samples)][::4]
+        np.testing.assert_allclose(decimator.decimate(samples), expectedSamples, atol=1e-9)
+
+    def testKeepingStateAcrossBlocks(self):
+        samples = np.random.RandomState(1).randint(-2000, 2000, 3000)
+        decimatedAtOnce = MindwaveDecimator(factor=4).decimate(samples)
+        decimator = MindwaveDecimator(factor=4)
+        blockEnds = [1, 2, 7, 100, 101, 555, 1024, 3000]
+        decimatedInBlocks = np.concatenate([decimator.decimate(samples[blockStart:blockEnd])
+                                            for blockStart, blockEnd in zip([0] + blockEnds, blockEnds)])
+        np.testing.assert_allclose(decimatedInBlocks, decimatedAtOnce, atol=1e-9)
+
+    def testRemovingAliasedFrequencies(self):
+        for factor in [2, 4]:
+            decimator = MindwaveDecimator(factor)
+            passed = decimator.decimate(sine(20, 8192))[len(decimator.taps):]
+            aliased = MindwaveDecimator(factor).decimate(sine(0.75 * 512 / factor, 8192))[len(decimator.taps):]
+            self.assertGreater(np.max(np.abs(passed)), 990, "should pass EEG frequencies")
+            self.assertLess(np.max(np.abs(aliased)), 1000 * 10 ** (-70 / 20),
+                            "should remove frequencies that would alias")
+
+
+class DecimatedRawBatchesTest(unittest.TestCase):
+    def testIteratingDecimatedRawBatches(self):
+        stream = MindwaveStreamGenerator(seed=0).generate(4)
+        mindwaveDataPointReader = MindwaveDataPointReader(byteSource=BytesByteSource(stream))
+        mindwaveDataPointReader.start()
+        rawBatches = list(mindwaveDataPointReader.iterRawBatches(128, decimationFactor=4))
+        self.assertEqual([len(rawBatch.samples) for rawBatch in rawBatches], [128] * 4)
+        self.assertEqual(rawBatches[0].samples.dtype, np.int16)
+        self.assertTrue(all(len(rawBatch.sampleTimes) == len(rawBatch.timestamps) == 128
+                            for rawBatch in rawBatches), "should keep the times of kept samples")
+
+    def testDelayingSampleTimes(self):
+        decimator = MindwaveDecimator(4)
+        sampleTimes = np.arange(512) / 512.0
+        rawBatch = MindwaveRawBatch(np.zeros(512, dtype=np.int16), sampleTimes,
+                                    np.zeros(512, dtype=np.uint8), sampleTimes)
+        decimatedBatch = decimator.decimateBatch(rawBatch)
+        np.testing.assert_allclose(decimatedBatch.sampleTimes, sampleTimes[::4] - decimator.delay / 512.0,
+                                   err_msg="should move sample times back by the filter delay")
+
+    def testDelayingSampleTimesOfReadBatches(self):
+        # batches of 100 raw values start at every phase of the decimation; they are
+        # decimated after reading, so the result does not depend on arrival times
+        stream = MindwaveStreamGenerator(seed=0).generate(4)
+        mindwaveDataPointReader = MindwaveDataPointReader(byteSource=BytesByteSource(stream))
+        mindwaveDataPointReader.start()
+        rawBatches = list(mindwaveDataPointReader.iterRawBatches(100))
+        decimator = MindwaveDecimator(4)
+        decimatedBatches = [decimator.decimateBatch(rawBatch) for rawBatch in rawBatches]
+        sampleTimes = np.concatenate([rawBatch.sampleTimes for rawBatch in rawBatches])
+        np.testing.assert_allclose(np.concatenate([decimatedBatch.sampleTimes for decimatedBatch in decimatedBatches]),
+                                   sampleTimes[::4] - decimator.delay / 512.0,
+                                   err_msg="should keep every 4th sample time, moved back by the filter delay")
+
+
+if __name__ == '__main__':
+    unittest.main()
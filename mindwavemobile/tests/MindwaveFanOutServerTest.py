@@ -0,0 +1,114 @@
+import os
+import socket
+import tempfile
+import threading
+import time
+import unittest
+import numpy as np
+from mindwavemobile.MindwaveByteSources import BytesByteSource, ConnectedSocketByteSource
+from mindwavemobile.MindwaveDataPointReader import MindwaveDataPointReader
+from mindwavemobile.MindwaveFanOutServer import MindwaveFanOutServer, MindwaveFanOutByteSource,\
+    MindwaveFanOutBatchReader, FORMAT_RAW
+from mindwavemobile.MindwaveStreamGenerator import MindwaveStreamGenerator
+
+
+def readAllRawSamples(mindwaveDataPointReader):
+    return np.concatenate([rawBatch.samples for rawBatch in mindwaveDataPointReader.iterRawBatches(64)])
+
+
+class FanOutTest(unittest.TestCase):
+    def setUp(self):
+        self._headsetSocket, self._streamSocket = socket.socketpair()
+        self._stream = MindwaveStreamGenerator().generate(4)
+
+    def tearDown(self):
+        self._server.stop()
+        self._streamSocket.close()
+
+    def _startServer(self, listenAddress=("127.0.0.1", 0), family=socket.AF_INET, **arguments):
+        self._server = MindwaveFanOutServer(byteSource=ConnectedSocketByteSource(self._headsetSocket),
+                                            listenAddress=listenAddress, family=family, **arguments)
+        self.assertTrue(self._server.start(), "should connect the headset")
+
+    def _waitForClients(self, amountOfClients):
+        deadline = time.monotonic() + 5
+        while (self._server.clientCount() < amountOfClients and time.monotonic() < deadline):
+            time.sleep(0.01)
+        self.assertEqual(self._server.clientCount(), amountOfClients, "clients should connect")
+
+    def _sendStream(self):
+        self._streamSocket.sendall(self._stream)
+        self._streamSocket.close()
+
+    def testBroadcastingToRawAndBatchClients(self):
+        self._startServer()
+        byteSources = [MindwaveFanOutByteSource(self._server.listenAddress()) for _ in range(3)]
+        rawReaders = [MindwaveDataPointReader(byteSource=byteSource) for byteSource in byteSources]
+        batchReader = MindwaveFanOutBatchReader(self._server.listenAddress())
+        for rawReader in rawReaders:
+            rawReader.start()
+        batchReader.start()
+        self._waitForClients(4)
+        threading.Thread(target=self._sendStream, daemon=True).start()
+        directReader = MindwaveDataPointReader(byteSource=BytesByteSource(self._stream))
+        directReader.start()
+        expectedSamples = readAllRawSamples(directReader)
+        for rawReader in rawReaders:
+            self.assertEqual(readAllRawSamples(rawReader).tolist(), expectedSamples.tolist(),
+                             "raw clients should decode the whole stream")
+        batchSamples = readAllRawSamples(batchReader)
+        self.assertEqual(batchSamples.tolist(), expectedSamples.tolist(),
+                         "batch client should receive all raw values")
+        batchReader.close()
+        for byteSource in byteSources:
+            byteSource.close()
+
+    def testSlowClientDoesNotStallOthers(self):
+        # a stalled client on a UNIX socket, whose buffers are soon full
+        self._stream = MindwaveStreamGenerator().generate(120)
+        with tempfile.TemporaryDirectory() as directory:
+            listenAddress = os.path.join(directory, "mindwave")
+            self._startServer(listenAddress, socket.AF_UNIX, maximumQueuedBytes=65536)
+            stalledSocket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            stalledSocket.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4096)
+            stalledSocket.connect(listenAddress)
+            stalledSocket.sendall(FORMAT_RAW)
+            batchReader = MindwaveFanOutBatchReader(listenAddress, socket.AF_UNIX)
+            batchReader.start()
+            self._waitForClients(2)
+            threading.Thread(target=self._sendStream, daemon=True).start()
+            self.assertEqual(len(readAllRawSamples(batchReader)), 120 * 512,
+                             "fast client should receive everything")
+            self.assertGreater(self._server.droppedBytes, 0, "should drop for the stalled client")
+            batchReader.close()
+            stalledSocket.close()
+
+
+class FanOutStartAndStopTest(unittest.TestCase):
+    def testStoppingAfterFailedStart(self):
+        occupyingSocket = socket.socket()
+        occupyingSocket.bind(("127.0.0.1", 0))
+        occupyingSocket.listen()
+        headsetSocket, streamSocket = socket.socketpair()
+        server = MindwaveFanOutServer(byteSource=ConnectedSocketByteSource(headsetSocket),
+                                      listenAddress=occupyingSocket.getsockname())
+        with self.assertRaises(OSError):
+            server.start()
+        self.assertEqual(headsetSocket.fileno(), -1, "should close the headset again")
+        server.stop()
+        server.stop()
+        streamSocket.close()
+        occupyingSocket.close()
+
+    def testClosingSocketOfFailedConnect(self):
+        closedSocket = socket.socket()
+        closedSocket.bind(("127.0.0.1", 0))
+        byteSource = MindwaveFanOutByteSource(closedSocket.getsockname())
+        with self.assertRaises(OSError):
+            byteSource.connect()
+        self.assertEqual(byteSource.socket.fileno(), -1, "should close the socket that did not connect")
+        closedSocket.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+import collections
+import socket
+import time
+import unittest
+from mindwavemobile.MindwaveByteSources import createByteSource
+from mindwavemobile.MindwaveDataPointReader import MindwaveDataPointReader
+from mindwavemobile.MindwaveHeadsetEmulator import MindwaveHeadsetEmulator, MindwaveStreamLoop
+from mindwavemobile.MindwaveHub import MindwaveHub
+
+
+class StreamLoopTest(unittest.TestCase):
+    def testServingOverAndOver(self):
+        streamLoop = MindwaveStreamLoop(seconds=1)
+        self.assertEqual(streamLoop.bytesOf(0, 512), streamLoop.stream)
+        self.assertEqual(streamLoop.bytesOf(500, 1024 + 10), streamLoop.stream[streamLoop.sampleStarts[500]:] +
+                         streamLoop.stream + streamLoop.stream[:streamLoop.sampleStarts[10]])
+
+
+class HeadsetEmulatorTest(unittest.TestCase):
+    def tearDown(self):
+        self._emulator.stop()
+
+    def _startEmulator(self, amountOfHeadsets=1, **options):
+        self._emulator = MindwaveHeadsetEmulator(amountOfHeadsets, **options)
+        self._emulator.start()
+
+    def _readSamples(self, mindwaveDataPointReader, amountOfSamples):
+        mindwaveDataPointReader.start()
+        startTime = time.monotonic()
+        samples = mindwaveDataPointReader.readRawBatch(amountOfSamples).samples
+        return samples, time.monotonic() - startTime
+
+    def testPacingHeadsetsOverUnixSockets(self):
+        self._startEmulator(3, family=socket.AF_UNIX)
+        byteSources = [createByteSource(address) for address in self._emulator.addresses()]
+        for byteSource in byteSources:
+            mindwaveDataPointReader = MindwaveDataPointReader(byteSource=byteSource)
+            samples, duration = self._readSamples(mindwaveDataPointReader, 256)
+            self.assertEqual(mindwaveDataPointReader.framingStatistics()["checkSumFailures"], 0)
+        self.assertGreater(duration, 0.3, "should send at the pace of a headset")
+        self.assertEqual(self._emulator.statistics()["connectedHeadsets"], 3)
+        for byteSource in byteSources:
+            byteSource.close()
+
+    def testDriftingClockOverSocketPair(self):
+        self._startEmulator(clockDrift=1.0)
+        byteSource = self._emulator.connectSocketPair(0)
+        samples, duration = self._readSamples(MindwaveDataPointReader(byteSource=byteSource), 768)
+        self.assertLess(duration, 1.2, "should send 1024 samples per second")
+        byteSource.close()
+
+    def testListingNoAddressesWithoutFamily(self):
+        self._startEmulator(family=None)
+        self.assertEqual(self._emulator.addresses(), [], "should only serve socket pairs")
+
+    def testCorruptingAndDisconnecting(self):
+        self._startEmulator(corruptionProbability=0.05, meanSecondsBetweenDisconnects=0.1)
+        byteSource = createByteSource(self._emulator.addresses()[0])
+        mindwaveDataPointReader = MindwaveDataPointReader(byteSource=byteSource, reconnect=True)
+        self._readSamples(mindwaveDataPointReader, 512)
+        self.assertGreater(mindwaveDataPointReader.reconnects(), 0, "should reconnect")
+        self.assertGreater(mindwaveDataPointReader.framingStatistics()["checkSumFailures"], 0,
+                           "should find corrupted packets")
+        byteSource.close()
+
+    def testServingHub(self):
+        self._startEmulator(20)
+        hub = MindwaveHub()
+        for address in self._emulator.addresses():
+            hub.connectDevice(address)
+        dataPointCounts = collections.Counter()
+        deadline = time.monotonic() + 5
+        while (min(dataPointCounts[address] for address in hub.addresses()) < 64 and time.monotonic() < deadline):
+            hubDataPoint = hub.readNextDataPoint(timeout=0.1)
+            if (hubDataPoint is not None):
+                dataPointCounts[hubDataPoint.address] += 1
+        self.assertEqual(len(dataPointCounts), 20, "every headset should stream")
+        self.assertGreaterEqual(min(dataPointCounts.values()), 64)
+        hub.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
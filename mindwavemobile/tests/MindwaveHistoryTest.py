@@ -0,0 +1,89 @@
+import threading
+import unittest
+import numpy as np
+from mindwavemobile.MindwaveByteSources import BytesByteSource
+from mindwavemobile.MindwaveDataPointReader import MindwaveDataPointReader
+from mindwavemobile.MindwaveDataPoints import AttentionDataPoint, EEGPowersDataPoint, UnknownDataPoint
+from mindwavemobile.MindwaveHistory import MindwaveHistory
+from mindwavemobile.MindwaveRawBatchDecoder import MindwaveRawBatch
+from mindwavemobile.MindwaveStreamGenerator import MindwaveStreamGenerator
+
+
+def rawBatch(firstSample, amountOfSamples):
+    # samples numbered like their timestamps, 512 per second
+    samples = np.arange(firstSample, firstSample + amountOfSamples)
+    timestamps = samples / 512.0
+    return MindwaveRawBatch(samples.astype(np.int16), timestamps,
+                            np.zeros(amountOfSamples, dtype=np.uint8), timestamps)
+
+
+class HistoryTest(unittest.TestCase):
+    def setUp(self):
+        # 1024 raw values
+        self._history = MindwaveHistory(retentionSeconds=2)
+
+    def testReadingTimeRange(self):
+        self._history.appendRawBatch(rawBatch(0, 600))
+        rows = self._history.read("raw", 1.0, 1.0 + 10 / 512.0)
+        self.assertEqual(rows.values.tolist(), list(range(512, 522)), "start inclusive, end exclusive")
+        self.assertEqual(self._history.timeRange("raw"), (0.0, 599 / 512.0))
+        self.assertIsNone(self._history.timeRange("attention"), "nothing appended")
+
+    def testWrappingAround(self):
+        memoryBytes = self._history.memoryBytes()
+        for firstSample in range(0, 3000, 100):
+            self._history.appendRawBatch(rawBatch(firstSample, 100))
+        self.assertEqual(self._history.memoryBytes(), memoryBytes, "memory is fixed")
+        self.assertEqual(self._history.rowCount("raw"), 1024, "keeps the retained rows")
+        self.assertEqual(self._history.timeRange("raw"), (1976 / 512.0, 2999 / 512.0))
+        rows = self._history.read("raw")
+        self.assertEqual(rows.values.tolist(), list(range(1976, 3000)), "wrapped rows are joined")
+        lastRows = self._history.readLast("raw", 0.5)
+        self.assertEqual(lastRows.values.tolist(), list(range(2743, 3000)), "start inclusive")
+        self.assertTrue(np.shares_memory(lastRows.values, self._history.read("raw", 2800 / 512.0).values),
+                        "rows not wrapping are views")
+
+    def testAppendingDataPoints(self):
+        self.assertTrue(self._history.appendDataPoint(AttentionDataPoint([40]), 1.0))
+        eegPowers = EEGPowersDataPoint(bytes(range(24)))
+        self.assertTrue(self._history.appendDataPoint(eegPowers, 2.0))
+        self.assertFalse(self._history.appendDataPoint(UnknownDataPoint([1]), 3.0), "no column")
+        self.assertEqual(self._history.read("attention").values.tolist(), [40])
+        self.assertEqual(self._history.read("eegPowers").values[0].tolist(),
+                         [eegPowers.delta, eegPowers.theta, eegPowers.lowAlpha, eegPowers.highAlpha,
+                          eegPowers.lowBeta, eegPowers.highBeta, eegPowers.lowGamma, eegPowers.midGamma])
+
+    def testSnapshotWhileAppending(self):
+        isAppending = True
+        def appendRawBatches():
+            firstSample = 0
+            while (isAppending):
+                self._history.appendRawBatch(rawBatch(firstSample % 30000, 37))
+                firstSample += 37
+        appendingThread = threading.Thread(target=appendRawBatches)
+        appendingThread.start()
+        try:
+            for _ in range(200):
+                rows = self._history.snapshot(names=["raw"])["raw"]
+                self.assertTrue(np.array_equal(rows.values, (rows.timestamps * 512).astype(np.int16)),
+                                "values should belong to their timestamps")
+        finally:
+            isAppending = False
+            appendingThread.join()
+
+    def testAttachingToReader(self):
+        stream = MindwaveStreamGenerator(seed=0).generate(3)
+        mindwaveDataPointReader = MindwaveDataPointReader(byteSource=BytesByteSource(stream))
+        mindwaveDataPointReader.start()
+        self._history.attachTo(mindwaveDataPointReader)
+        mindwaveDataPointReader.dispatchDataPoints()
+        expectedReader = MindwaveDataPointReader(byteSource=BytesByteSource(stream))
+        expectedReader.start()
+        expectedSamples = np.concatenate([batch.samples for batch in expectedReader.iterRawBatches(512)])
+        self.assertEqual(self._history.read("raw").values.tolist(), expectedSamples[-1024:].tolist(),
+                         "should keep the last raw values")
+        self.assertEqual(self._history.rowCount("attention"), 3, "one attention value per second")
+
+
+if __name__ == '__main__':
+    unittest.main()
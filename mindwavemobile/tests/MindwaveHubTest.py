@@ -0,0 +1,127 @@
+import socket
+import unittest
+from mindwavemobile.MindwaveByteSources import BluetoothByteSource
+from mindwavemobile.MindwaveHub import MindwaveHub
+from mindwavemobile.MindwaveDataPoints import AttentionDataPoint, RawDataPoint
+from mindwavemobile.MindwaveStreamGenerator import createPacket
+
+NUMBER_OF_DEVICES = 30
+
+
+class RecvOnlySocket:
+    # like PyBluez sockets, which do not always provide recv_into
+    def __init__(self, wrappedSocket):
+        self._socket = wrappedSocket
+
+    def fileno(self):
+        return self._socket.fileno()
+
+    def setblocking(self, flag):
+        self._socket.setblocking(flag)
+
+    def recv(self, amountOfBytes):
+        return self._socket.recv(amountOfBytes)
+
+    def shutdown(self, how):
+        self._socket.shutdown(how)
+
+    def close(self):
+        self._socket.close()
+
+
+class HubTest(unittest.TestCase):
+    def setUp(self):
+        self._headsetSockets = {}
+        self._hubSockets = {}
+        for deviceNumber in range(NUMBER_OF_DEVICES):
+            address = "00:00:00:00:00:{:02X}".format(deviceNumber)
+            self._headsetSockets[address], self._hubSockets[address] = socket.socketpair()
+
+    def tearDown(self):
+        self._hub.close()
+        for headsetSocket in self._headsetSockets.values():
+            headsetSocket.close()
+
+    def _createHub(self, **hubArguments):
+        self._hub = MindwaveHub(**hubArguments)
+        for address, hubSocket in self._hubSockets.items():
+            self._hub.addDevice(address, hubSocket)
+        return self._hub
+
+    def testGivingUpConnecting(self):
+        self._hub = MindwaveHub()
+        closedSocket = socket.socket()
+        closedSocket.bind(("127.0.0.1", 0))
+        address = "tcp:127.0.0.1:{}".format(closedSocket.getsockname()[1])
+        self.assertIsNone(self._hub.connectDevice(address, maximumAttempts=2), "should give up")
+        self.assertEqual(self._hub.addresses(), [])
+        closedSocket.close()
+
+    def testMergingDataPointsOfAllDevices(self):
+        hub = self._createHub()
+        for headsetSocket in self._headsetSockets.values():
+            headsetSocket.sendall(createPacket([0x04, 0x25]))
+        hubDataPoints = [hub.readNextDataPoint(timeout=1) for _ in range(NUMBER_OF_DEVICES)]
+        self.assertEqual(set(hubDataPoint.address for hubDataPoint in hubDataPoints),
+                         set(self._headsetSockets.keys()), "should read from every device")
+        self.assertTrue(all(hubDataPoint.dataPoint.__class__ is AttentionDataPoint
+                            for hubDataPoint in hubDataPoints), "should read attention values")
+        self.assertIsNone(hub.readNextDataPoint(timeout=0.01), "no more data points were sent")
+
+    def testSeparateBoundedQueuesPerDevice(self):
+        hub = self._createHub(mergeQueues=False, maximumQueueLength=2)
+        address = "00:00:00:00:00:05"
+        self._headsetSockets[address].sendall(createPacket([0x80, 0x02, 0x60, 0x00]) * 3)
+        hubDataPoint = hub.readNextDataPointOf(address, timeout=1)
+        self.assertIs(hubDataPoint.dataPoint.__class__, RawDataPoint, "should read raw value")
+        self.assertEqual(hub.throughput()[address]["droppedDataPoints"], 1,
+                         "oldest data point should be dropped from the full queue")
+        self.assertEqual(hub.throughput()[address]["receivedBytes"], 3 * 8,
+                         "should count received bytes")
+
+    def testReadingSeparateQueuesInTurn(self):
+        hub = self._createHub(mergeQueues=False)
+        for headsetSocket in self._headsetSockets.values():
+            headsetSocket.sendall(createPacket([0x04, 0x25]) * 2)
+        hubDataPoints = [hub.readNextDataPoint(timeout=1) for _ in range(2 * NUMBER_OF_DEVICES)]
+        self.assertEqual(set(hubDataPoint.address for hubDataPoint in hubDataPoints[:NUMBER_OF_DEVICES]),
+                         set(self._headsetSockets.keys()), "should read every device before reading one again")
+        self.assertIsNone(hub.readNextDataPoint(timeout=0.01), "no more data points were sent")
+
+    def testReadingOneDeviceNeedsSeparateQueues(self):
+        hub = self._createHub()
+        with self.assertRaises(RuntimeError):
+            hub.readNextDataPointOf("00:00:00:00:00:05", timeout=0)
+
+    def testReadingQueuedDataPointsOfRemovedDevice(self):
+        hub = self._createHub(mergeQueues=False)
+        address = "00:00:00:00:00:07"
+        self._headsetSockets[address].sendall(createPacket([0x04, 0x25]) * 2)
+        self._headsetSockets[address].close()
+        while (address in hub.addresses()):
+            hub.poll(timeout=1)
+        self.assertIsNotNone(hub.readNextDataPointOf(address), "should keep the queued data points")
+        self.assertIsNotNone(hub.readNextDataPoint(timeout=0), "should read them in turn as well")
+        self.assertIsNone(hub.readNextDataPointOf(address), "queue is drained")
+
+    def testReadingThroughByteSource(self):
+        hub = self._createHub()
+        headsetSocket, hubSocket = socket.socketpair()
+        byteSource = BluetoothByteSource("00:00:00:00:00:FF")
+        byteSource.socket = RecvOnlySocket(hubSocket)
+        hub.addDevice(byteSource.address, byteSource.socket, byteSource)
+        headsetSocket.sendall(createPacket([0x04, 0x25]))
+        hubDataPoint = hub.readNextDataPoint(timeout=1)
+        self.assertIs(hubDataPoint.dataPoint.__class__, AttentionDataPoint, "should read without recv_into")
+        headsetSocket.close()
+
+    def testRemovingDisconnectedDevice(self):
+        hub = self._createHub()
+        address = "00:00:00:00:00:07"
+        self._headsetSockets[address].close()
+        hub.poll(timeout=1)
+        self.assertNotIn(address, hub.addresses(), "disconnected device should be removed")
+
+
+if __name__ == '__main__':
+    unittest.main()
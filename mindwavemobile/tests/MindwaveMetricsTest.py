@@ -0,0 +1,145 @@
+import os
+import socket
+import sys
+import tempfile
+import threading
+import unittest
+import urllib.request
+from mindwavemobile.MindwaveByteSources import BytesByteSource
+from mindwavemobile.MindwaveDataPointReader import MindwaveDataPointReader
+from mindwavemobile.MindwaveHub import MindwaveHub
+from mindwavemobile.MindwaveMetrics import (MindwaveMetrics, MindwaveHistogram, prometheusText,
+                                            writePrometheusFile, startPrometheusServer)
+from mindwavemobile.MindwaveStreamGenerator import MindwaveStreamGenerator
+
+
+class HistogramTest(unittest.TestCase):
+    def testCountingValuesInBuckets(self):
+        histogram = MindwaveHistogram((1, 10, 100))
+        for value in [0.5, 1, 5, 50, 500]:
+            histogram.observe(value)
+        self.assertEqual(histogram.snapshot()["buckets"], [(1, 2), (10, 3), (100, 4)],
+                         "buckets should count cumulatively up to their bound")
+        self.assertEqual(histogram.count, 5)
+        self.assertEqual(histogram.quantile(0.5), 10, "median should be in the second bucket")
+
+
+class ReaderMetricsTest(unittest.TestCase):
+    def setUp(self):
+        self._stream = MindwaveStreamGenerator(seed=0, corruptionProbability=0.01).generate(2)
+
+    def _readAllDataPoints(self, metrics):
+        reader = MindwaveDataPointReader(byteSource=BytesByteSource(self._stream, chunkSize=512),
+                                         metrics=metrics)
+        reader.start()
+        dataPoints = 0
+        try:
+            while (True):
+                reader.readNextDataPoint()
+                dataPoints += 1
+        except EOFError:
+            pass
+        return reader, dataPoints
+
+    def testMeasuringAllStages(self):
+        metrics = MindwaveMetrics()
+        reader, dataPoints = self._readAllDataPoints(metrics)
+        snapshot = metrics.snapshot()
+        self.assertEqual(snapshot["counters"]["receivedBytes"], len(self._stream))
+        self.assertEqual(snapshot["counters"]["dispatchedDataPoints"], dataPoints)
+        self.assertEqual(snapshot["counters"]["checkSumFailures"],
+                         reader.framingStatistics()["checkSumFailures"])
+        for stage in ["socketReadSeconds", "framingSeconds", "payloadParseSeconds",
+                      "dispatchLatencySeconds"]:
+            self.assertGreater(snapshot["histograms"][stage]["count"], 0,
+                               "should measure {}".format(stage))
+
+    def testExportingPrometheusText(self):
+        metrics = MindwaveMetrics()
+        self._readAllDataPoints(metrics.withLabels(address="00:00:00:00:00:01"))
+        text = prometheusText(metrics)
+        self.assertIn("# TYPE mindwave_received_bytes_total counter\n", text)
+        self.assertIn('mindwave_received_bytes_total{{address="00:00:00:00:00:01"}} {}\n'.format(
+            len(self._stream)), text)
+        self.assertIn('mindwave_framing_seconds_bucket{address="00:00:00:00:00:01",le="+Inf"}', text)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "mindwave.prom")
+            writePrometheusFile(metrics, path)
+            with open(path) as prometheusFile:
+                self.assertEqual(prometheusFile.read(), text)
+
+    def testExportingWhileUpdating(self):
+        metrics = MindwaveMetrics()
+        child = metrics.withLabels(address="00:00:00:00:00:01")
+        def observeNewHistograms():
+            for number in range(20000):
+                child.observe("histogram{}".format(number), 0.001)
+        switchInterval = sys.getswitchinterval()
+        # switch threads often, also in the middle of iterating a dict
+        sys.setswitchinterval(1e-6)
+        updatingThread = threading.Thread(target=observeNewHistograms)
+        updatingThread.start()
+        try:
+            while (updatingThread.is_alive()):
+                prometheusText(metrics)
+        finally:
+            updatingThread.join()
+            sys.setswitchinterval(switchInterval)
+
+    def testServingPrometheusText(self):
+        metrics = MindwaveMetrics()
+        metrics.increment("reconnects")
+        server = startPrometheusServer(metrics, port=0)
+        try:
+            url = "http://127.0.0.1:{}/metrics".format(server.server_address[1])
+            with urllib.request.urlopen(url) as response:
+                self.assertIn("mindwave_reconnects_total 1\n", response.read().decode())
+        finally:
+            server.shutdown()
+            server.server_close()
+
+
+class HubMetricsTest(unittest.TestCase):
+    def testLabelingDevices(self):
+        metrics = MindwaveMetrics()
+        hub = MindwaveHub(metrics=metrics)
+        headsetSocket, hubSocket = socket.socketpair()
+        hub.addDevice("00:00:00:00:00:02", hubSocket)
+        stream = MindwaveStreamGenerator(seed=1).generate(0.5)
+        headsetSocket.sendall(stream)
+        headsetSocket.close()
+        while (len(hub.addresses()) > 0):
+            hub.poll(1.0)
+        self.assertEqual(metrics.snapshot()["counters"]["disconnects"], 1)
+        self.assertEqual(metrics.snapshot()["children"], [],
+                         "should remove metrics of removed devices")
+        hub.close()
+
+    def testGaugingQueuedDataPointsPerDevice(self):
+        for mergeQueues in (True, False):
+            metrics = MindwaveMetrics()
+            hub = MindwaveHub(mergeQueues=mergeQueues, metrics=metrics)
+            headsetSockets = []
+            for deviceNumber in range(2):
+                headsetSocket, hubSocket = socket.socketpair()
+                hub.addDevice("00:00:00:00:00:0{}".format(deviceNumber), hubSocket)
+                headsetSockets.append(headsetSocket)
+            headsetSockets[0].sendall(MindwaveStreamGenerator(seed=1).generate(0.5))
+            while (hub.poll(0.1) > 0):
+                pass
+            snapshot = metrics.snapshot()
+            queuedDataPoints = [childSnapshot["gauges"].get("queuedDataPoints")
+                                for childSnapshot in snapshot["children"]]
+            if (mergeQueues):
+                self.assertGreater(snapshot["gauges"]["queuedDataPoints"], 0, "should gauge the merged queue")
+                self.assertEqual(queuedDataPoints, [None, None], "devices share the merged queue")
+            else:
+                self.assertGreater(queuedDataPoints[0], 0)
+                self.assertEqual(queuedDataPoints[1], 0, "should gauge the queue of each device")
+            hub.close()
+            for headsetSocket in headsetSockets:
+                headsetSocket.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
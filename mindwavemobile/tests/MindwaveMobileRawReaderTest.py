@@ -0,0 +1,323 @@
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from mindwavemobile.MindwaveByteSources import SocketByteSource, ConnectedSocketByteSource, BytesByteSource,\
+    readCachedAddress, writeCachedAddress
+from mindwavemobile.MindwaveDataPointReader import MindwaveDataPointReader
+from mindwavemobile.MindwaveMetrics import MindwaveMetrics
+from mindwavemobile.MindwaveMobileRawReader import MindwaveMobileRawReader
+from mindwavemobile.MindwaveStreamGenerator import createPacket
+
+
+def rawPackets(firstValue, amountOfValues):
+    return b"".join(createPacket([0x80, 0x02, 0x00, value]) for value in range(firstValue, firstValue + amountOfValues))
+
+
+class HeadsetStandIn:
+    # Local TCP stand-in for the headset. Every connection gets the next of
+    # the given streams; it is closed after it was sent, unless silentSeconds
+    # is given, then it stays open and silent that long.
+    def __init__(self, streams, silentSeconds=None):
+        self._listenSocket = socket.create_server(("127.0.0.1", 0))
+        self.address = self._listenSocket.getsockname()
+        self._streams = list(streams)
+        self._silentSeconds = silentSeconds
+        self._isClosed = threading.Event()
+        self._servingThread = threading.Thread(target=self._serve, daemon=True)
+        self._servingThread.start()
+
+    def _serve(self):
+        while (self._streams and not self._isClosed.is_set()):
+            try:
+                headsetSocket, address = self._listenSocket.accept()
+            except OSError:
+                # the listening socket was shut down by close()
+                return
+            stream = self._streams.pop(0)
+            threading.Thread(target=self._sendStream, args=(headsetSocket, stream, len(self._streams) == 0),
+                             daemon=True).start()
+
+    def _sendStream(self, headsetSocket, stream, isLastStream):
+        headsetSocket.sendall(stream)
+        if (self._silentSeconds is not None or isLastStream):
+            # the last connection stays open until the test ends
+            self._isClosed.wait(self._silentSeconds)
+        headsetSocket.close()
+
+    def close(self):
+        self._isClosed.set()
+        try:
+            # wakes up the accept of _serve
+            self._listenSocket.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self._servingThread.join()
+        self._listenSocket.close()
+
+
+class ReconnectTest(unittest.TestCase):
+    def tearDown(self):
+        self._headset.close()
+
+    def _readSamples(self, mindwaveDataPointReader, amountOfSamples):
+        mindwaveDataPointReader.start()
+        return mindwaveDataPointReader.readRawBatch(amountOfSamples).samples.tolist()
+
+    def testReconnectingAtEndOfStream(self):
+        # the incomplete packet at the end of the first connection is discarded
+        self._headset = HeadsetStandIn([rawPackets(0, 10) + rawPackets(10, 1)[:5], rawPackets(20, 10)])
+        mindwaveDataPointReader = MindwaveDataPointReader(byteSource=SocketByteSource(self._headset.address),
+                                                          reconnect=True)
+        self.assertEqual(self._readSamples(mindwaveDataPointReader, 20),
+                         list(range(10)) + list(range(20, 30)), "should continue after reconnecting")
+        self.assertEqual(mindwaveDataPointReader.reconnects(), 1, "should count the reconnect")
+
+    def testReconnectingAfterTimeout(self):
+        self._headset = HeadsetStandIn([rawPackets(0, 10), rawPackets(10, 10)], silentSeconds=5)
+        byteSource = SocketByteSource(self._headset.address, timeout=0.1)
+        mindwaveDataPointReader = MindwaveDataPointReader(byteSource=byteSource, reconnect=True)
+        startTime = time.monotonic()
+        self.assertEqual(self._readSamples(mindwaveDataPointReader, 20), list(range(20)),
+                         "should reconnect when the headset is silent")
+        self.assertLess(time.monotonic() - startTime, 2, "should not wait for the silence to end")
+
+    def testEndingWithoutReconnect(self):
+        self._headset = HeadsetStandIn([rawPackets(0, 10), rawPackets(10, 10)])
+        mindwaveDataPointReader = MindwaveDataPointReader(byteSource=SocketByteSource(self._headset.address))
+        with self.assertRaises(EOFError):
+            self._readSamples(mindwaveDataPointReader, 20)
+
+    def testClosingDuringBlockedRead(self):
+        self._headset = HeadsetStandIn([rawPackets(0, 10), rawPackets(10, 10)], silentSeconds=5)
+        rawReader = MindwaveMobileRawReader(byteSource=SocketByteSource(self._headset.address), reconnect=True)
+        rawReader.connectToMindWaveMobile()
+        errors = []
+        def readMoreThanSent():
+            try:
+                rawReader.getBytes(1000)
+            except EOFError as error:
+                errors.append(error)
+        readingThread = threading.Thread(target=readMoreThanSent)
+        readingThread.start()
+        time.sleep(0.2)
+        rawReader.close()
+        readingThread.join(2)
+        self.assertFalse(readingThread.is_alive(), "should stop reading")
+        self.assertEqual(len(errors), 1, "should end with an EOFError")
+        self.assertEqual(rawReader.reconnects, 0, "should not reconnect")
+        self.assertFalse(rawReader.isConnected())
+
+    def testClosingDuringBackoff(self):
+        closedSocket = socket.create_server(("127.0.0.1", 0))
+        closedAddress = closedSocket.getsockname()
+        closedSocket.close()
+        self._headset = HeadsetStandIn([])
+        rawReader = MindwaveMobileRawReader(byteSource=SocketByteSource(closedAddress), reconnectDelay=10)
+        errors = []
+        def connect():
+            try:
+                rawReader.connectToMindWaveMobile()
+            except EOFError as error:
+                errors.append(error)
+        connectingThread = threading.Thread(target=connect)
+        connectingThread.start()
+        time.sleep(0.2)
+        rawReader.close()
+        connectingThread.join(2)
+        self.assertFalse(connectingThread.is_alive(), "should not wait for the next attempt")
+        self.assertEqual(len(errors), 1, "should end with an EOFError")
+
+    def testRetryingWithBackoff(self):
+        self._headset = HeadsetStandIn([rawPackets(0, 10)])
+        closedSocket = socket.create_server(("127.0.0.1", 0))
+        closedAddress = closedSocket.getsockname()
+        closedSocket.close()
+        class FailingByteSource(SocketByteSource):
+            # refused four times before the stand-in is reached
+            attempts = 0
+            def connect(self):
+                FailingByteSource.attempts += 1
+                if (FailingByteSource.attempts <= 4):
+                    SocketByteSource(closedAddress).connect()
+                SocketByteSource.connect(self)
+        rawReader = MindwaveMobileRawReader(byteSource=FailingByteSource(self._headset.address),
+                                            reconnectDelay=0.01, maximumReconnectDelay=0.02)
+        startTime = time.monotonic()
+        rawReader.connectToMindWaveMobile()
+        self.assertTrue(rawReader.isConnected(), "should connect eventually")
+        self.assertEqual(FailingByteSource.attempts, 5, "should retry until connected")
+        self.assertGreaterEqual(time.monotonic() - startTime, 0.01 + 0.02 * 3, "should wait between attempts")
+        rawReader.close()
+
+
+class LowLatencyReadTest(unittest.TestCase):
+    def setUp(self):
+        readingSocket, self._headsetSocket = socket.socketpair()
+        self._metrics = MindwaveMetrics()
+        self._rawReader = MindwaveMobileRawReader(byteSource=ConnectedSocketByteSource(readingSocket),
+                                                  metrics=self._metrics)
+        self._rawReader.connectToMindWaveMobile()
+
+    def tearDown(self):
+        self._rawReader.close()
+        self._headsetSocket.close()
+
+    def _readSize(self):
+        return self._metrics.snapshot()["gauges"]["readSizeBytes"]
+
+    def testGettingBytesAsSoonAsTheyArrived(self):
+        # a short packet must not wait for more bytes to follow
+        packet = createPacket([0x04, 0x30])
+        self._headsetSocket.sendall(packet)
+        receivedBytes = [self._rawReader.getByte() for _ in range(len(packet))]
+        self.assertEqual(bytes(receivedBytes), packet, "should return the buffered packet")
+
+    def testAdaptingReadSize(self):
+        self._headsetSocket.sendall(rawPackets(0, 100) * 20)
+        for _ in range(100 * 8 * 20):
+            self._rawReader.getByte()
+        self.assertGreater(self._readSize(), 512, "should read more when bytes queued up")
+        for _ in range(20):
+            self._headsetSocket.sendall(rawPackets(0, 1))
+            for _ in range(8):
+                self._rawReader.getByte()
+        self.assertEqual(self._readSize(), MindwaveMobileRawReader.MINIMUM_READ_SIZE,
+                         "should read less when bytes trickle in")
+
+    def testKeepingReadSizeAtEndOfBuffer(self):
+        # the next receive after these bytes only fills the last 10 bytes of the ring buffer
+        bufferCapacity = self._metrics.snapshot()["gauges"]["bufferCapacityBytes"]
+        sendingThread = threading.Thread(target=self._headsetSocket.sendall, args=(bytes(bufferCapacity - 10),))
+        sendingThread.start()
+        receivedAmount = 0
+        while (receivedAmount < bufferCapacity - 10):
+            receivedAmount += len(self._rawReader.getAvailableBytes())
+        sendingThread.join()
+        readSize = self._readSize()
+        self._headsetSocket.sendall(bytes(1000))
+        self.assertEqual(len(self._rawReader.getAvailableBytes()), 10, "should receive up to the end of the buffer")
+        self.assertEqual(self._readSize(), readSize, "a receive cut short by the buffer's end should not count")
+
+    def testRequestingMaximumReadSize(self):
+        requestedAmounts = []
+        class RequestRecordingByteSource(BytesByteSource):
+            def recv_into(self, buffer):
+                requestedAmounts.append(len(buffer))
+                return BytesByteSource.recv_into(self, buffer)
+        rawReader = MindwaveMobileRawReader(byteSource=RequestRecordingByteSource(bytes(1 << 20), chunkSize=1 << 20))
+        rawReader.connectToMindWaveMobile()
+        receivedAmount = 0
+        while (receivedAmount < 1 << 20):
+            receivedAmount += len(rawReader.getAvailableBytes())
+            rawReader.clearAlreadyReadBuffer()
+        self.assertEqual(max(requestedAmounts), MindwaveMobileRawReader.MAXIMUM_READ_SIZE,
+                         "should ask for the grown read size")
+        rawReader.close()
+
+
+class ConnectedSocketReconnectTest(unittest.TestCase):
+    def testBackingOffAfterEndOfStream(self):
+        readingSocket, headsetSocket = socket.socketpair()
+        connects = []
+        class CountingByteSource(ConnectedSocketByteSource):
+            def connect(self):
+                connects.append(time.monotonic())
+                ConnectedSocketByteSource.connect(self)
+        rawReader = MindwaveMobileRawReader(byteSource=CountingByteSource(readingSocket), reconnect=True,
+                                            reconnectDelay=0.1)
+        rawReader.connectToMindWaveMobile()
+        errors = []
+        def readUntilClosed():
+            try:
+                rawReader.getBytes(1)
+            except EOFError as error:
+                errors.append(error)
+        readingThread = threading.Thread(target=readUntilClosed)
+        readingThread.start()
+        headsetSocket.close()
+        time.sleep(0.35)
+        rawReader.close()
+        readingThread.join(2)
+        self.assertFalse(readingThread.is_alive(), "should stop reading once closed")
+        self.assertEqual(len(errors), 1, "should end with an EOFError")
+        # the first connect and at most one attempt per delay after the end of the stream
+        self.assertLessEqual(len(connects), 4, "should wait between attempts to reconnect")
+        self.assertGreater(len(connects), 1, "should try to reconnect")
+
+
+class CachedAddressTest(unittest.TestCase):
+    def setUp(self):
+        self._directory = tempfile.TemporaryDirectory()
+        self._cachePath = os.path.join(self._directory.name, "mindwave", "address")
+        self._headset = HeadsetStandIn([rawPackets(0, 10)])
+
+    def tearDown(self):
+        self._headset.close()
+        self._directory.cleanup()
+
+    def _createRawReader(self, discoveredAddress):
+        headsetAddress = self._headset.address
+        closedSocket = socket.create_server(("127.0.0.1", 0))
+        closedAddress = closedSocket.getsockname()
+        closedSocket.close()
+        discoveries = []
+        class StandInRawReader(MindwaveMobileRawReader):
+            # the address "standIn" reaches the stand-in, any other is refused
+            def _findMindwaveMobileAddress(self):
+                discoveries.append(discoveredAddress)
+                return discoveredAddress
+            def _createByteSource(self, address):
+                return SocketByteSource(headsetAddress if address == "standIn" else closedAddress)
+        rawReader = StandInRawReader(addressCachePath=self._cachePath, reconnectDelay=0.01)
+        return rawReader, discoveries
+
+    def testCachingAddress(self):
+        self.assertIsNone(readCachedAddress(self._cachePath), "nothing cached yet")
+        writeCachedAddress("9C:B7:0D:72:CD:02", self._cachePath)
+        self.assertEqual(readCachedAddress(self._cachePath), "9C:B7:0D:72:CD:02", "should read cached address")
+
+    def testSkippingDiscovery(self):
+        writeCachedAddress("standIn", self._cachePath)
+        rawReader, discoveries = self._createRawReader("other")
+        rawReader.connectToMindWaveMobile()
+        self.assertTrue(rawReader.isConnected(), "should connect to cached address")
+        self.assertEqual(discoveries, [], "should not discover")
+        rawReader.close()
+
+    def testDiscoveringWhenCachedAddressFails(self):
+        writeCachedAddress("gone", self._cachePath)
+        rawReader, discoveries = self._createRawReader("standIn")
+        rawReader.connectToMindWaveMobile()
+        self.assertTrue(rawReader.isConnected(), "should connect to discovered address")
+        self.assertEqual(rawReader.getAddress(), "standIn", "should use discovered address")
+        self.assertEqual(readCachedAddress(self._cachePath), "standIn", "should cache discovered address")
+        rawReader.close()
+
+
+class DeferredTransportImportTest(unittest.TestCase):
+    def testDecodingWithoutPyBluez(self):
+        # bluetooth is made unimportable, decoding must neither import nor need it
+        script = "\n".join([
+            "import sys",
+            "sys.modules['bluetooth'] = None",
+            "from mindwavemobile.MindwaveByteSources import BytesByteSource",
+            "from mindwavemobile.MindwaveDataPointReader import MindwaveDataPointReader",
+            "from mindwavemobile.MindwaveHub import MindwaveHub",
+            "from mindwavemobile.AsyncMindwaveDataPointReader import AsyncMindwaveDataPointReader",
+            "from mindwavemobile.MindwaveStreamGenerator import MindwaveStreamGenerator",
+            "reader = MindwaveDataPointReader(byteSource=BytesByteSource(MindwaveStreamGenerator().generate(1)))",
+            "reader.start()",
+            "print(len(reader.readRawBatch(512).samples))",
+        ])
+        packageDirectory = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        output = subprocess.check_output([sys.executable, "-c", script], cwd=packageDirectory)
+        self.assertEqual(output.strip(), b"512", "should decode without bluetooth")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+import unittest
+from mindwavemobile.MindwavePacketFramer import MindwavePacketFramer
+from mindwavemobile.MindwaveStreamGenerator import createPacket
+
+
+class FramePacketsTest(unittest.TestCase):
+    def setUp(self):
+        self._framer = MindwavePacketFramer()
+
+    def testFramingSeveralPackets(self):
+        chunk = (b'\x01\x02' + createPacket([0x80, 0x02, 0x60, 0x00]) +
+                 createPacket([0x04, 0x25]) + createPacket([0x05, 0x35]))
+        payloads, tail = self._framer.framePackets(chunk)
+        self.assertEqual([list(payload) for payload in payloads],
+                         [[0x80, 0x02, 0x60, 0x00], [0x04, 0x25], [0x05, 0x35]],
+                         "should frame all packets in order")
+        self.assertEqual(len(tail), 0, "should consume the whole chunk")
+
+    def testKeepingIncompletePacketAsTail(self):
+        packet = createPacket([0x80, 0x02, 0x13, 0x12])
+        payloads, tail = self._framer.framePackets(createPacket([0x04, 0x25]) + packet[:5])
+        self.assertEqual(len(payloads), 1, "should only frame the complete packet")
+        self.assertEqual(bytes(tail), packet[:5], "should return the incomplete packet")
+        payloads, tail = self._framer.framePackets(bytes(tail) + packet[5:])
+        self.assertEqual(list(payloads[0]), [0x80, 0x02, 0x13, 0x12],
+                         "should frame the packet once it is complete")
+
+    def testKeepingSingleTrailingSyncByte(self):
+        payloads, tail = self._framer.framePackets(createPacket([0x04, 0x25]) + b'\xaa')
+        self.assertEqual(bytes(tail), b'\xaa', "a trailing sync byte might start a packet")
+
+    def testDiscardingPacketWithWrongCheckSum(self):
+        brokenPacket = bytearray(createPacket([0x04, 0x25]))
+        brokenPacket[-1] ^= 0xff
+        payloads, tail = self._framer.framePackets(bytes(brokenPacket) + createPacket([0x05, 0x35]))
+        self.assertEqual([list(payload) for payload in payloads], [[0x05, 0x35]],
+                         "should only return packets with correct checksum")
+        self.assertEqual(self._framer.checkSumFailures, 1, "should count checksum failures")
+
+    def testSkippingAdditionalSyncBytes(self):
+        payloads, tail = self._framer.framePackets(b'\xaa' + createPacket([0x04, 0x25]))
+        self.assertEqual([list(payload) for payload in payloads], [[0x04, 0x25]],
+                         "should start the packet after the last sync byte")
+
+
+class ResynchronizeTest(unittest.TestCase):
+    def setUp(self):
+        self._framer = MindwavePacketFramer()
+
+    def testFindingPacketInsideRejectedPacket(self):
+        # false sync whose length covers the following valid packet
+        chunk = b'\xaa\xaa\x08\x01' + createPacket([0x04, 0x25]) + b'\x00' * 10
+        payloads, tail = self._framer.framePackets(chunk)
+        self.assertEqual([list(payload) for payload in payloads], [[0x04, 0x25]],
+                         "should find the packet inside the rejected one")
+        self.assertEqual(self._framer.checkSumFailures, 1, "should count checksum failure")
+        self.assertEqual(self._framer.resyncs, 1, "should count resync")
+        self.assertEqual(self._framer.discardedBytes, 4 + 10, "should count discarded bytes")
+
+    def testRejectingTooLongPayloads(self):
+        chunk = b'\xaa\xaa\xaa\xaa\xc8' + createPacket([0x05, 0x35])
+        payloads, tail = self._framer.framePackets(chunk)
+        self.assertEqual([list(payload) for payload in payloads], [[0x05, 0x35]],
+                         "should skip sync with too long payload length")
+        self.assertEqual(self._framer.invalidPayloadLengths, 1, "should count invalid length")
+
+    def testResumingAfterScanBudget(self):
+        framer = MindwavePacketFramer(maximumScanLength=200)
+        chunk = b'\x00' * 300 + createPacket([0x04, 0x25])
+        payloads, tail = framer.framePackets(chunk)
+        self.assertEqual(len(payloads), 0, "should stop scanning after the budget")
+        payloads, tail = framer.framePackets(tail)
+        self.assertEqual([list(payload) for payload in payloads], [[0x04, 0x25]],
+                         "should find packet when resuming")
+        self.assertEqual(framer.discardedBytes, 300, "should count discarded bytes once")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,6 +1,6 @@
 import unittest
-from MindwavePacketPayloadParser import MindwavePacketPayloadParser
-from MindwaveDataPoints import RawDataPoint, PoorSignalLevelDataPoint,\
+from mindwavemobile.MindwavePacketPayloadParser import MindwavePacketPayloadParser, iterDataRows
+from mindwavemobile.MindwaveDataPoints import RawDataPoint, PoorSignalLevelDataPoint,\
     MeditationDataPoint, AttentionDataPoint, EEGPowersDataPoint, BlinkDataPoint
 
 
@@ -71,7 +71,70 @@ class ParseRawValueTest(unittest.TestCase):
         self.assertEqual(dataPoint.highBeta, (0x9 << 16) | (0x8 << 8) | 0x5, "highBeta should be parsed correctly")
         self.assertEqual(dataPoint.lowGamma, (0xaf << 16) | (0x13 << 8) | 0xbf, "lowGamma should be parsed correctly")
         self.assertEqual(dataPoint.midGamma, (0x0 << 16) | (0x1 << 8) | 0x0, "midGamma should be parsed correctly")
-        
-        
+
+
+class ParseUnknownDataRowsTest(unittest.TestCase):
+    def setUp(self):
+        self._payloadParser = MindwavePacketPayloadParser()
+
+    def testSkippingUnknownDataRows(self):
+        payload = [0x03, 0x11, 0x90, 0x03, 0x1, 0x2, 0x3, 0x4, 0x25]
+        dataPoints = self._payloadParser.parseDataPoints(payload)
+        self.assertEqual(len(dataPoints), 1, "should skip unknown rows")
+        self.assertEqual(dataPoints[0].attentionValue, 0x25, "should parse row after unknown rows")
+        self.assertEqual(self._payloadParser.unknownDataRowCodes(), {0x03: 1, 0x90: 1},
+                         "should count unknown data row codes")
+
+    def testReusingParser(self):
+        firstDataPoints = self._payloadParser.parseDataPoints([0x04, 0x25])
+        secondDataPoints = self._payloadParser.parseDataPoints([0x05, 0x35])
+        self.assertEqual(firstDataPoints[0].attentionValue, 0x25, "should parse first payload")
+        self.assertEqual(secondDataPoints[0].meditationValue, 0x35, "should parse second payload")
+
+    def testStoppingAtTruncatedDataRow(self):
+        dataPoints = self._payloadParser.parseDataPoints([0x04, 0x25, 0x83, 0x18, 0x1])
+        self.assertEqual(len(dataPoints), 1, "should only parse the complete row")
+        self.assertEqual(self._payloadParser.truncatedDataRows, 1, "should count truncated rows")
+
+    def testSkippingRowsOfWrongLength(self):
+        payload = [0x80, 0x01, 0x05, 0x83, 0x03, 0x1, 0x2, 0x3, 0x04, 0x25]
+        dataPoints = self._payloadParser.parseDataPoints(payload)
+        self.assertEqual(len(dataPoints), 1, "should skip the short raw value and EEG powers")
+        self.assertEqual(dataPoints[0].attentionValue, 0x25, "should parse the row after them")
+        self.assertEqual(self._payloadParser.malformedDataRows, 2, "should count the skipped rows")
+        self.assertEqual(self._payloadParser.parseDataPoints([0x80, 0x00]), [], "should skip an empty raw value")
+
+    def testDataPointsKeepOnlyDecodedValues(self):
+        dataPoints = self._payloadParser.parseDataPoints([0x80, 0x02, 0xff, 0xfe])
+        self.assertEqual(dataPoints[0].rawValue, -2, "should parse negative raw value")
+        self.assertFalse(hasattr(dataPoints[0], "__dict__"), "data points should use slots")
+
+    def testSkippingUnselectedDataRows(self):
+        self._payloadParser.selectDataRowCodes([0x04])
+        dataPoints = self._payloadParser.parseDataPoints([0x80, 0x02, 0x60, 0x00, 0x04, 0x25, 0x05, 0x35])
+        self.assertEqual(len(dataPoints), 1, "should only decode selected rows")
+        self.assertEqual(dataPoints[0].attentionValue, 0x25, "should skip over unselected rows")
+        self.assertEqual(self._payloadParser.unknownDataRowCodes(), {}, "unselected rows are not unknown")
+        self._payloadParser.selectDataRowCodes()
+        self.assertEqual(len(self._payloadParser.parseDataPoints([0x80, 0x02, 0x60, 0x00, 0x04, 0x25])), 2,
+                         "should decode all rows again")
+
+    def testSkippingUnselectedRawValue(self):
+        self._payloadParser.selectDataRowCodes([0x04])
+        self.assertEqual(self._payloadParser.parseDataPoints([0x80, 0x02, 0x60, 0x00]), [],
+                         "should skip a single unselected raw value")
+
+    def testIteratingDataRows(self):
+        dataRows = list(iterDataRows([0x55, 0x04, 0x25, 0x80, 0x02, 0x60, 0x00, 0x83, 0x18, 0x1]))
+        self.assertEqual(dataRows, [(0x04, 2, 3), (0x80, 5, 7), (0x83, 9, None)],
+                         "should skip extended code bytes and end with the truncated row")
+
+    def testRegisteringDecoder(self):
+        self._payloadParser.registerDecoder(0x07, lambda valueBytes: list(valueBytes), valueLength=2)
+        dataPoints = self._payloadParser.parseDataPoints([0x07, 0x1, 0x2, 0x04, 0x25])
+        self.assertEqual(dataPoints[0], [0x1, 0x2], "should use registered decoder and length")
+        self.assertEqual(dataPoints[1].attentionValue, 0x25, "should parse following row")
+
+
 if __name__ == '__main__':
-    unittest.main()
\ No newline at end of file
+    unittest.main()
@@ -0,0 +1,36 @@
+import unittest
+import numpy as np
+from mindwavemobile.MindwaveRawBatchDecoder import MindwaveRawBatchDecoder
+
+
+class DecodeRawBatchTest(unittest.TestCase):
+    def setUp(self):
+        self._decoder = MindwaveRawBatchDecoder()
+        self._decoder.decodePayload([0x80, 0x02, 0x60, 0x00], 1.0)
+        self._decoder.decodePayload([0x02, 0x55, 0x80, 0x02, 0xff, 0xfe,
+                                     0x04, 0x25, 0x80, 0x02, 0x13, 0x12], 2.0)
+
+    def testDecodingSamples(self):
+        batch = self._decoder.takeBatch(3)
+        self.assertEqual(batch.samples.dtype, np.int16, "samples should be int16")
+        self.assertEqual(batch.samples.tolist(), [(0x60 << 8), -2, (0x13 << 8) | 0x12],
+                         "should decode signed raw values")
+
+    def testTimestampsAndPoorSignalLevels(self):
+        batch = self._decoder.takeBatch(3)
+        self.assertEqual(batch.timestamps.tolist(), [1.0, 2.0, 2.0],
+                         "each sample should have the arrival time of its packet")
+        self.assertEqual(batch.poorSignalLevels.tolist(), [200, 0x55, 0x55],
+                         "each sample should have the latest poor signal level")
+
+    def testKeepingRemainingSamplesForNextBatch(self):
+        firstBatch = self._decoder.takeBatch(2)
+        secondBatch = self._decoder.takeBatch(2)
+        self.assertEqual(len(firstBatch.samples), 2, "should return requested amount")
+        self.assertEqual(secondBatch.samples.tolist(), [(0x13 << 8) | 0x12],
+                         "should return remaining samples")
+        self.assertEqual(self._decoder.amountOfSamples(), 0, "all samples should be taken")
+
+
+if __name__ == '__main__':
+    unittest.main()
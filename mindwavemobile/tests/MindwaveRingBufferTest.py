@@ -0,0 +1,68 @@
+import socket
+import unittest
+from mindwavemobile.MindwaveRingBuffer import MindwaveRingBuffer, writeCircularRows
+
+
+class RingBufferTest(unittest.TestCase):
+    def setUp(self):
+        self._sendingSocket, self._receivingSocket = socket.socketpair()
+
+    def tearDown(self):
+        self._sendingSocket.close()
+        self._receivingSocket.close()
+
+    def testFillingFromSocket(self):
+        ringBuffer = MindwaveRingBuffer(16)
+        self._sendingSocket.sendall(bytes([0xaa, 0xaa, 0x04, 0x80, 0x02, 0x60, 0x00]))
+        receivedAmount = 0
+        while (receivedAmount < 7):
+            receivedAmount += ringBuffer.fillFrom(self._receivingSocket)
+        self.assertEqual(ringBuffer.availableBytes(), 7, "should have all sent bytes available")
+        self.assertEqual(ringBuffer.peekByte(), 0xaa, "peek should return first byte")
+        self.assertEqual(ringBuffer.getByte(), 0xaa, "get should return first byte")
+        self.assertEqual(ringBuffer.getByte(), 0xaa, "get should return second byte")
+        self.assertEqual(list(ringBuffer.getBytes(5)), [0x04, 0x80, 0x02, 0x60, 0x00],
+                         "should return remaining bytes")
+        self.assertEqual(ringBuffer.availableBytes(), 0, "all bytes should be read")
+
+    def testReadingAcrossWrapAround(self):
+        ringBuffer = MindwaveRingBuffer(8)
+        ringBuffer.write(bytes(range(6)))
+        ringBuffer.getBytes(6)
+        ringBuffer.release()
+        ringBuffer.write(bytes(range(10, 16)))
+        self.assertEqual(list(ringBuffer.getBytes(6)), list(range(10, 16)),
+                         "bytes wrapping around the end should be read in order")
+
+    def testReturnsViewsWithoutCopying(self):
+        ringBuffer = MindwaveRingBuffer(8)
+        ringBuffer.write(bytes([1, 2, 3, 4]))
+        view = ringBuffer.getBytes(4)
+        self.assertIsInstance(view, memoryview, "contiguous reads should be views")
+
+    def testUnreleasedBytesAreNotOverwritten(self):
+        ringBuffer = MindwaveRingBuffer(8)
+        ringBuffer.write(bytes([1, 2, 3, 4, 5, 6]))
+        payload = ringBuffer.getBytes(6)
+        ringBuffer.write(bytes([7, 8, 9, 10]))
+        self.assertEqual(list(payload), [1, 2, 3, 4, 5, 6],
+                         "bytes read before release should stay valid")
+        self.assertEqual(list(ringBuffer.getBytes(4)), [7, 8, 9, 10],
+                         "new bytes should be appended after growing")
+
+
+
+class CircularRowsTest(unittest.TestCase):
+    def testWritingAroundTheEnd(self):
+        column = [0] * 4
+        writeCircularRows([(column, [1, 2, 3])], 2, 3)
+        self.assertEqual(column, [3, 0, 1, 2], "should continue at the start")
+
+    def testKeepingLastRows(self):
+        column = [0] * 4
+        writeCircularRows([(column, [1, 2, 3, 4, 5, 6])], 1, 6)
+        self.assertEqual(column, [4, 5, 6, 3], "should keep the last capacity rows in place")
+
+
+if __name__ == '__main__':
+    unittest.main()
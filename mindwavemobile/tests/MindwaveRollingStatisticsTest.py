@@ -0,0 +1,76 @@
+import random
+import unittest
+import numpy as np
+from mindwavemobile.MindwaveByteSources import BytesByteSource
+from mindwavemobile.MindwaveDataPointReader import MindwaveDataPointReader
+from mindwavemobile.MindwaveDataPoints import AttentionDataPoint, EEGPowersDataPoint
+from mindwavemobile.MindwaveRollingStatistics import MindwaveRollingStatistics, MindwaveRollingWindow
+from mindwavemobile.MindwaveStreamGenerator import MindwaveStreamGenerator
+
+
+class RollingWindowTest(unittest.TestCase):
+    def testMatchingRescannedWindows(self):
+        randomGenerator = random.Random(0)
+        window = MindwaveRollingWindow(2.5)
+        timestamps = []
+        values = []
+        timestamp = 0.0
+        for _ in range(3000):
+            # irregular spacing with a few gaps longer than the window
+            timestamp += randomGenerator.choice([0.01, 0.1, 0.5, 3.0])
+            value = randomGenerator.randint(0, 16777215)
+            window.add(value, timestamp)
+            timestamps.append(timestamp)
+            values.append(value)
+            inWindow = np.array(values)[np.array(timestamps) > timestamp - 2.5]
+            self.assertEqual(window.count(), len(inWindow))
+            self.assertEqual(window.minimum(), inWindow.min())
+            self.assertEqual(window.maximum(), inWindow.max())
+            self.assertAlmostEqual(window.mean(), inWindow.mean(), delta=1e-6 * inWindow.mean())
+            self.assertAlmostEqual(window.variance(), inWindow.var(), delta=1e-6 * 16777215 ** 2)
+
+    def testEmptyWindow(self):
+        window = MindwaveRollingWindow(1)
+        self.assertEqual(window.count(), 0)
+        self.assertTrue(np.isnan(window.mean()), "no mean without values")
+        self.assertTrue(np.isnan(window.minimum()), "no minimum without values")
+
+
+class RollingStatisticsTest(unittest.TestCase):
+    def testSeveralWindowsPerMetric(self):
+        statistics = MindwaveRollingStatistics(windowSeconds=(2, 4))
+        for second, attention in enumerate([10, 20, 30, 40, 50]):
+            statistics.addDataPoint(AttentionDataPoint([attention]), float(second))
+        self.assertEqual(statistics.mean("attention", 2), 45, "last two values")
+        self.assertEqual(statistics.mean("attention", 4), 35, "last four values")
+        self.assertEqual(statistics.minimum("attention", 4), 20)
+        self.assertEqual(statistics.summary("attention", 2)["maximum"], 50)
+
+    def testBandRatio(self):
+        statistics = MindwaveRollingStatistics(windowSeconds=(10,))
+        eegPowerValues = [1, 6, 0, 0, 3, 0, 0, 0]
+        eegPowers = EEGPowersDataPoint(b"".join(value.to_bytes(3, "big") for value in eegPowerValues))
+        statistics.addDataPoint(eegPowers, 0.0)
+        self.assertEqual(statistics.ratio("theta", "lowBeta", 10), 2, "ratio of the mean powers")
+
+    def testAttachingToReader(self):
+        stream = MindwaveStreamGenerator(seed=0).generate(20)
+        mindwaveDataPointReader = MindwaveDataPointReader(byteSource=BytesByteSource(stream))
+        mindwaveDataPointReader.start()
+        statistics = MindwaveRollingStatistics(windowSeconds=(3600,))
+        statistics.attachTo(mindwaveDataPointReader)
+        mindwaveDataPointReader.dispatchDataPoints()
+
+        expectedReader = MindwaveDataPointReader(byteSource=BytesByteSource(stream))
+        expectedReader.start()
+        attentionValues = []
+        expectedReader.subscribe(lambda dataPoint: attentionValues.append(dataPoint.attentionValue),
+                                 [AttentionDataPoint])
+        expectedReader.dispatchDataPoints()
+        self.assertEqual(statistics.count("attention", 3600), len(attentionValues))
+        self.assertAlmostEqual(statistics.mean("attention", 3600), np.mean(attentionValues))
+        self.assertIn("midGamma", statistics.metricNames(), "should add EEG powers")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+import random
+import unittest
+import numpy as np
+from mindwavemobile.MindwaveSampleClock import MindwaveSampleClock
+from mindwavemobile.MindwaveStreamDecoder import MindwaveStreamDecoder
+from mindwavemobile.MindwaveDataPoints import AttentionDataPoint, MeditationDataPoint
+from mindwavemobile.MindwaveStreamGenerator import createPacket
+
+
+def burstArrivalTimes(samplingRate, seconds, burstLength, jitter, seed=0):
+    # samples arrive in bursts, each burst up to jitter seconds late
+    randomGenerator = random.Random(seed)
+    arrivalTimes = []
+    for burstEnd in range(burstLength, int(seconds * samplingRate) + 1, burstLength):
+        arrivalTime = 100.0 + (burstEnd - 1) / samplingRate + randomGenerator.uniform(0, jitter)
+        arrivalTimes.extend([arrivalTime] * burstLength)
+    return np.array(arrivalTimes)
+
+
+class SampleClockTest(unittest.TestCase):
+    def testTrackingDriftingSamplingRate(self):
+        clock = MindwaveSampleClock()
+        arrivalTimes = burstArrivalTimes(513.0, 60, 16, jitter=0.03)
+        sampleTimes = np.concatenate([clock.sampleTimes(arrivalTimes[start:start + 512])
+                                      for start in range(0, len(arrivalTimes), 512)])
+        self.assertAlmostEqual(clock.samplePeriod, 1 / 513.0, delta=1e-6,
+                               msg="should track the actual sample period")
+        intervals = np.diff(sampleTimes[-5000:])
+        self.assertLess(np.max(np.abs(intervals - 1 / 513.0)), 1e-3,
+                        "reconstructed sample times should be smooth")
+        self.assertEqual(clock.lostSamples, 0, "jitter is no gap")
+
+    def testDetectingLostSamples(self):
+        clock = MindwaveSampleClock()
+        arrivalTimes = burstArrivalTimes(512.0, 10, 16, jitter=0.0)
+        arrivalTimes[2048:] += 1.0
+        clock.sampleTimes(arrivalTimes)
+        self.assertEqual(clock.lostSamples, 512, "should count samples of one second")
+        self.assertEqual(clock.gaps, [(2048, 512)], "should report where the gap was")
+        self.assertEqual(clock.sampleNumber, len(arrivalTimes) + 512,
+                         "lost samples should advance the sample number")
+
+    def testContinuingChunkSplitBetweenBatches(self):
+        clock = MindwaveSampleClock()
+        arrivalTimes = burstArrivalTimes(512.0, 1, 16, jitter=0.0)
+        first = clock.sampleTimes(arrivalTimes[:8])
+        second = clock.sampleTimes(arrivalTimes[8:16])
+        self.assertAlmostEqual(second[0] - first[-1], 1 / 512.0, places=9,
+                               msg="rest of the chunk should continue the sample times")
+
+
+class StreamDecoderTimingTest(unittest.TestCase):
+    def testDeliveringDataPointsOfPacketInOrder(self):
+        decoder = MindwaveStreamDecoder()
+        decoder.feedBytes(createPacket([0x04, 0x25, 0x05, 0x35]), 5.0)
+        decoder.feedBytes(createPacket([0x04, 0x26]), 6.0)
+        dataPoints = decoder.readAvailableDataPoints()
+        self.assertEqual([type(dataPoint) for dataPoint in dataPoints],
+                         [AttentionDataPoint, MeditationDataPoint, AttentionDataPoint],
+                         "should deliver data points in stream order")
+        self.assertEqual(decoder.lastDataPointArrivalTime(), 6.0,
+                         "should know when the last data point arrived")
+
+    def testAddingSampleTimesToRawBatch(self):
+        decoder = MindwaveStreamDecoder()
+        for chunkNumber in range(32):
+            packets = b''.join(createPacket([0x80, 0x02, 0x00, sampleNumber])
+                               for sampleNumber in range(16))
+            decoder.feedBytes(packets, chunkNumber * 16 / 512.0)
+        batch = decoder.readRawBatch(512)
+        self.assertEqual(batch.sampleTimes.shape, (512,), "should have one time per sample")
+        np.testing.assert_allclose(np.diff(batch.sampleTimes), 1 / 512.0, rtol=1e-6)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,93 @@
+import os
+import unittest
+import numpy as np
+from mindwavemobile.MindwaveByteSources import BytesByteSource
+from mindwavemobile.MindwaveDataPointReader import MindwaveDataPointReader
+from mindwavemobile.MindwaveSharedMemoryPipeline import MindwaveSharedMemoryPipeline, MindwaveSharedRingBuffer
+from mindwavemobile.MindwaveStreamGenerator import MindwaveStreamGenerator
+
+COLUMN_TYPES = [("values", "int16", ()), ("rows", "uint32", (2,))]
+
+
+def firstRawValueAndSum(headset, sequence, rawColumns):
+    return int(rawColumns["raw"][0]), int(rawColumns["raw"].sum()), len(rawColumns["rawSampleTimes"])
+
+
+def listSharedMemory():
+    # without the semaphores of queues
+    return set(name for name in os.listdir("/dev/shm") if not name.startswith("sem."))
+
+
+class SharedRingBufferTest(unittest.TestCase):
+    def setUp(self):
+        self._ring = MindwaveSharedRingBuffer(COLUMN_TYPES, 8)
+        self._attachedRing = MindwaveSharedRingBuffer(*self._ring.description())
+
+    def tearDown(self):
+        self._attachedRing.close()
+        self._ring.close()
+
+    def _write(self, start, end):
+        self._ring.write({"values": np.arange(start, end, dtype=np.int16),
+                          "rows": np.arange(start, end).repeat(2).reshape(-1, 2)})
+
+    def testReadingWrittenRows(self):
+        self._write(0, 5)
+        sequence, columns = self._attachedRing.read(0)
+        self.assertEqual(sequence, 0)
+        self.assertEqual(columns["values"].tolist(), [0, 1, 2, 3, 4], "should read through the shared memory")
+        self.assertEqual(columns["rows"][4].tolist(), [4, 4])
+        self.assertFalse(self._attachedRing.isOverwritten(sequence))
+
+    def testWrappingAround(self):
+        self._write(0, 6)
+        self._write(6, 12)
+        sequence, columns = self._attachedRing.read(0)
+        self.assertEqual(sequence, 4, "oldest rows were overwritten")
+        self.assertEqual(columns["values"].tolist(), [4, 5, 6, 7], "up to the end of the buffer")
+        sequence, columns = self._attachedRing.read(8)
+        self.assertEqual(columns["values"].tolist(), [8, 9, 10, 11], "continues at the start")
+        self._write(12, 15)
+        self.assertTrue(self._attachedRing.isOverwritten(4), "rows read before were overwritten")
+
+    def testEndingStream(self):
+        self._write(0, 2)
+        self._ring.markEnded()
+        self.assertFalse(self._attachedRing.waitForRows(0, 4), "should not wait at the end of the stream")
+        self.assertTrue(self._attachedRing.waitForRows(0, 2))
+
+
+class SharedMemoryPipelineTest(unittest.TestCase):
+    def testExtractingFeaturesOfAllBlocks(self, startMethod=None):
+        streams = [MindwaveStreamGenerator(seed=seed).generate(3) for seed in range(3)]
+        pipeline = MindwaveSharedMemoryPipeline(firstRawValueAndSum,
+                                                byteSources=[BytesByteSource(stream) for stream in streams],
+                                                processes=2, blockLength=256, startMethod=startMethod)
+        pipeline.start()
+        results = list(pipeline.results())
+        pipeline.stop()
+        for headsetNumber, stream in enumerate(streams):
+            mindwaveDataPointReader = MindwaveDataPointReader(byteSource=BytesByteSource(stream))
+            mindwaveDataPointReader.start()
+            expectedResults = [(headsetNumber, 256 * blockNumber,
+                                (int(rawBatch.samples[0]), int(rawBatch.samples.sum()), 256))
+                               for blockNumber, rawBatch in enumerate(mindwaveDataPointReader.iterRawBatches(256))]
+            self.assertEqual([result for result in results if result[0] == headsetNumber], expectedResults,
+                             "should process every block of the headset in order")
+
+    def testExtractingFeaturesInSpawnedProcesses(self):
+        self.testExtractingFeaturesOfAllBlocks(startMethod="spawn")
+
+    @unittest.skipUnless(os.path.isdir("/dev/shm"), "lists shared memory in /dev/shm")
+    def testStoppingAfterFailedStart(self):
+        # a lambda can not be pickled to a spawned process
+        pipeline = MindwaveSharedMemoryPipeline(lambda headset, sequence, rawColumns: None,
+                                                byteSources=[BytesByteSource(b"")], startMethod="spawn")
+        sharedMemoryNames = listSharedMemory()
+        with self.assertRaises(Exception):
+            pipeline.start()
+        self.assertEqual(listSharedMemory(), sharedMemoryNames, "should free the shared memory")
+
+
+if __name__ == '__main__':
+    unittest.main()
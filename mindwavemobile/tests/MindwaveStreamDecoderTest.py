@@ -0,0 +1,88 @@
+import unittest
+from mindwavemobile.MindwaveStreamDecoder import MindwaveStreamDecoder
+from mindwavemobile.MindwaveDataPoints import RawDataPoint, AttentionDataPoint, MeditationDataPoint
+from mindwavemobile.MindwaveStreamGenerator import createPacket
+
+
+class DecodeStreamTest(unittest.TestCase):
+    def setUp(self):
+        self._streamDecoder = MindwaveStreamDecoder()
+
+    def testNeedingMoreBytes(self):
+        self.assertIsNone(self._streamDecoder.readNextDataPoint(), "nothing fed yet")
+        self.assertIsNone(self._streamDecoder.readRawBatch(1), "nothing fed yet")
+
+    def testReadingDataPointsFromSplitPackets(self):
+        stream = createPacket([0x80, 0x02, 0x60, 0x00]) + createPacket([0x04, 0x25])
+        self._streamDecoder.feedBytes(stream[:5], 1.0)
+        self.assertIsNone(self._streamDecoder.readNextDataPoint(), "packet is incomplete")
+        self._streamDecoder.feedBytes(stream[5:], 2.0)
+        dataPoint = self._streamDecoder.readNextDataPoint()
+        self.assertIs(dataPoint.__class__, RawDataPoint, "should read raw value first")
+        dataPoint = self._streamDecoder.readNextDataPoint()
+        self.assertIs(dataPoint.__class__, AttentionDataPoint, "should read attention second")
+        self.assertEqual(dataPoint.attentionValue, 0x25, "should read attention value")
+
+    def testSkippingMalformedRow(self):
+        # checksums are valid, but the first raw value has a single byte
+        self._streamDecoder.feedBytes(createPacket([0x80, 0x01, 0x05, 0x04, 0x25]) +
+                                      createPacket([0x80, 0x02, 0x60, 0x00]), 1.0)
+        dataPoint = self._streamDecoder.readNextDataPoint()
+        self.assertEqual(dataPoint.attentionValue, 0x25, "should skip the malformed row only")
+        dataPoint = self._streamDecoder.readNextDataPoint()
+        self.assertEqual(dataPoint.rawValue, 0x6000, "should continue with the next packet")
+        self.assertIsNone(self._streamDecoder.readNextDataPoint(), "nothing left")
+
+    def testReadingRawBatch(self):
+        self._streamDecoder.feedBytes(createPacket([0x80, 0x02, 0x60, 0x00]) * 3, 1.0)
+        self.assertIsNone(self._streamDecoder.readRawBatch(4), "only three samples fed")
+        rawBatch = self._streamDecoder.readRawBatch(3)
+        self.assertEqual(rawBatch.samples.tolist(), [0x6000] * 3, "should read all samples")
+
+
+class DispatchDataPointsTest(unittest.TestCase):
+    def setUp(self):
+        self._streamDecoder = MindwaveStreamDecoder()
+        self._stream = createPacket([0x80, 0x02, 0x60, 0x00, 0x04, 0x25]) + createPacket([0x05, 0x35, 0x04, 0x26])
+
+    def testDispatchingSubscribedDataPoints(self):
+        attentionValues = []
+        meditationValues = []
+        self._streamDecoder.subscribe(lambda dataPoint: attentionValues.append(dataPoint.attentionValue),
+                                      [AttentionDataPoint])
+        self._streamDecoder.subscribe(lambda dataPoint: meditationValues.append(dataPoint.meditationValue),
+                                      [0x05])
+        self._streamDecoder.feedBytes(self._stream, 1.0)
+        self.assertEqual(self._streamDecoder.dispatchDataPoints(), 3, "should skip raw values")
+        self.assertEqual(attentionValues, [0x25, 0x26], "should dispatch by data point class")
+        self.assertEqual(meditationValues, [0x35], "should dispatch by data row code")
+        self.assertEqual(self._streamDecoder.lastDataPointArrivalTime(), 1.0, "should set arrival time")
+
+    def testDispatchingPastMalformedRow(self):
+        rawValues = []
+        self._streamDecoder.subscribe(lambda dataPoint: rawValues.append(dataPoint.rawValue), [RawDataPoint])
+        self._streamDecoder.feedBytes(createPacket([0x80, 0x00]) + createPacket([0x80, 0x02, 0x60, 0x00]), 1.0)
+        self.assertEqual(self._streamDecoder.dispatchDataPoints(), 1, "should skip the empty raw value")
+        self.assertEqual(rawValues, [0x6000], "should dispatch the next packet")
+
+    def testUnsubscribing(self):
+        dataPoints = []
+        self._streamDecoder.subscribe(dataPoints.append, [AttentionDataPoint, MeditationDataPoint])
+        self._streamDecoder.subscribe(dataPoints.append, [AttentionDataPoint])
+        self._streamDecoder.feedBytes(self._stream[:12], 1.0)
+        self._streamDecoder.dispatchDataPoints()
+        self.assertEqual(len(dataPoints), 2, "should call every subscription")
+        self._streamDecoder.unsubscribe(dataPoints.append)
+        self._streamDecoder.feedBytes(self._stream[12:], 2.0)
+        self.assertEqual(self._streamDecoder.dispatchDataPoints(), 0, "should decode nothing")
+        self.assertEqual(len(dataPoints), 2, "should not call unsubscribed callback")
+
+    def testRejectingTypesWithoutDecoder(self):
+        with self.assertRaises(ValueError):
+            self._streamDecoder.subscribe(print, [0x07])
+        with self.assertRaises(ValueError):
+            self._streamDecoder.subscribe(print, [str])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+import unittest
+from mindwavemobile.MindwaveByteSources import BytesByteSource
+from mindwavemobile.MindwaveDataPointReader import MindwaveDataPointReader
+from mindwavemobile.MindwaveDataPoints import AttentionDataPoint, EEGPowersDataPoint
+from mindwavemobile.MindwaveStreamGenerator import MindwaveStreamGenerator
+
+
+class GenerateStreamTest(unittest.TestCase):
+    def _readAllDataPoints(self, stream):
+        mindwaveDataPointReader = MindwaveDataPointReader(byteSource=BytesByteSource(stream, 100))
+        mindwaveDataPointReader.start()
+        dataPoints = []
+        try:
+            while (True):
+                dataPoints.append(mindwaveDataPointReader.readNextDataPoint())
+        except EOFError:
+            return dataPoints
+
+    def testDecodingGeneratedStream(self):
+        generator = MindwaveStreamGenerator(blinkProbability=0)
+        dataPoints = self._readAllDataPoints(generator.generate(2))
+        rawValues = [dataPoint.rawValue for dataPoint in dataPoints if hasattr(dataPoint, "rawValue")]
+        self.assertEqual(rawValues, [generator.rawValue(sampleNumber) for sampleNumber in range(1024)],
+                         "should decode all generated raw values")
+        self.assertEqual(sum(dataPoint.__class__ is EEGPowersDataPoint for dataPoint in dataPoints), 2,
+                         "should generate EEG powers once per second")
+        self.assertEqual(sum(dataPoint.__class__ is AttentionDataPoint for dataPoint in dataPoints), 2,
+                         "should generate attention once per second")
+
+    def testDispatchingSubscribedDataPoints(self):
+        generator = MindwaveStreamGenerator(blinkProbability=0)
+        mindwaveDataPointReader = MindwaveDataPointReader(byteSource=BytesByteSource(generator.generate(3), 100))
+        mindwaveDataPointReader.start()
+        dataPoints = []
+        def appendAndStop(dataPoint):
+            dataPoints.append(dataPoint)
+            if (len(dataPoints) == 2):
+                mindwaveDataPointReader.stopDispatching()
+        mindwaveDataPointReader.subscribe(appendAndStop, [AttentionDataPoint])
+        mindwaveDataPointReader.dispatchDataPoints()
+        self.assertEqual([dataPoint.__class__ for dataPoint in dataPoints], [AttentionDataPoint] * 2,
+                         "should dispatch attention until stopped")
+        mindwaveDataPointReader.dispatchDataPoints()
+        self.assertEqual(len(dataPoints), 3, "should dispatch until the end of the stream")
+
+    def testCorruptingPackets(self):
+        generator = MindwaveStreamGenerator(corruptionProbability=0.1)
+        dataPoints = self._readAllDataPoints(generator.generate(2))
+        self.assertGreater(generator.corruptedPackets, 0, "should corrupt some packets")
+        self.assertLess(len(dataPoints), 1024 + 6, "corrupted packets should be lost")
+
+
+if __name__ == '__main__':
+    unittest.main()
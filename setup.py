@@ -9,5 +9,6 @@ setup(name='mindwavemobile',
       packages=['mindwavemobile'],
       install_requires=[
           'pybluez',
+          'numpy',
       ],
       zip_safe=False)